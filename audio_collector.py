@@ -1,131 +1,18 @@
+import itertools
 import os
-import pyautogui
-import time
-
-from os import path
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.common.exceptions import TimeoutException
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+
+from contextlib import contextmanager
 
 from core.config import PROJECT_SETTING
 from core.database import SQLiteDB
-from core.metadata_editor import edit_mp3_metadata
-from core.update_chromedriver import ChromeDriverUpdater
-
-class WebsiteDriver(webdriver.Chrome):
-    def __init__(self, driver_path=PROJECT_SETTING.DRIVER_PATH, teardown=False, base_path=PROJECT_SETTING.JACKSON, title=None) -> None:
-        self.mp3_urls = []
-        self.default_path = PROJECT_SETTING.DEFAULT_PATH
-
-        download_path = f"{base_path}\\{title}"
-        os.makedirs(download_path, exist_ok=True)
-
-        # Set the download directory
-        chrome_options = Options()
-        chrome_options.add_argument("--start-maximized")
-        chrome_options.add_argument("--log-level=0")
-        chrome_options.add_argument("--dns-prefetch-disable")
-        chrome_options.add_experimental_option('excludeSwitches', ['enable-logging', 'enable-automation'])
-        chrome_options.add_experimental_option('useAutomationExtension', False)
-        chrome_options.add_experimental_option("prefs", {
-            "download.default_directory": self.default_path,
-            "download.prompt_for_download": True,
-            "download.directory_upgrade": True,
-            "safebrowsing.enabled": True
-        })
-
-        self.driver_path = driver_path
-        self.chrome_service = Service(self.driver_path)
-        self.teardown = teardown
-        self.download_path = download_path
-        super(WebsiteDriver, self).__init__(service=self.chrome_service, options=chrome_options)
-        self.implicitly_wait(5)
-
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        if self.teardown:
-            self.quit()
-
-    def scrape_website(self, url):
-        self.get(url)
-
-        # Wait for the "plList" class to be visible
-        wait = WebDriverWait(self, 100)
-        pl_list = wait.until(EC.visibility_of_element_located((By.ID, "plList")))
-
-        # Count the number of items in the list
-        num_items = len(pl_list.find_elements(By.TAG_NAME, "li"))
-
-        # Find the "btnNext" button
-        btn_next = wait.until(EC.visibility_of_element_located((By.ID, "btnNext")))
-
-        # Scroll the element into view
-        self.execute_script("arguments[0].scrollIntoView(true);", btn_next)
-
-        # Click the "btnNext" button for each item in the list
-        for i in range(num_items):
-
-            if i > 0:
-                # Trigger the click event manually using JavaScript
-                self.execute_script("arguments[0].click();", btn_next)
-            
-            # Wait for the "audio1" element to be present
-            audio1_element = wait.until(EC.presence_of_element_located((By.XPATH, "//*[@id='audio1']")))
-            # Get the "src" attribute value
-            mp3_url = audio1_element.get_attribute("src")
-            self.mp3_urls.append(mp3_url)
-
-
-    def download_mp3_files(self, title) -> None:
-
-        wait = WebDriverWait(self, 20)
-
-        for ind, mp3_url in enumerate(self.mp3_urls):
-            self.execute_script("window.open('');")
-            self.switch_to.window(self.window_handles[-1])
-            self.get(mp3_url)
-            current_chapter_name = f"Chapter {ind} - {title}.mp3"
-            num_attempts = 0
-            max_attempts = 3
-            
-            # Wait for the page to load                 
-            wait.until(EC.visibility_of_all_elements_located((By.TAG_NAME, "body")))
-            
-            time.sleep(2.5)
-            pyautogui.press('tab', presses=5, interval=.1)
-            
-            time.sleep(.5)
-            pyautogui.press('enter', presses=2)
-            
-            time.sleep(1)
-            pyautogui.write(message=current_chapter_name, interval=.1)
-            
-            time.sleep(2)
-            pyautogui.press('enter', presses=1)
-            
-            # Wait for files to finish downloading
-            while num_attempts < max_attempts:
-                try:
-                    wait.until(lambda driver: self.filename_matches(current_chapter_name))
-                    new_path = os.path.join(self.download_path, current_chapter_name)
-                    os.rename(os.path.join(self.default_path, current_chapter_name), new_path)
-                    break  # Success
-
-                except TimeoutException:
-                    num_attempts += 1
-                    if num_attempts == max_attempts:
-                        print(f"Download failed after {max_attempts} attempts for URL: {mp3_url}")
-            
-            # Close the current tab
-            self.close()
-            self.switch_to.window(self.window_handles[0])
-
-    def filename_matches(self, current_chapter_name) -> bool: # Helper function for wait.until
-        file_path = os.path.join(self.default_path, current_chapter_name)
-        return path.exists(file_path) is True and file_path.endswith(".mp3")
+from core.metrics import TRACER
+from core.batch_tagger import BatchTagger
+
+# - Selenium, the download pipeline and the ChromeDriver updater are imported inside the
+#   functions that use them, so database and tagging work doesn't pay for loading them.
+
+# - Books handed to BatchTagger at a time by edit_books, so a large backlog isn't held in memory at once.
+TAG_BATCH_BOOKS = 200
 
 
 def get_user_path(user_name):
@@ -137,52 +24,156 @@ def get_user_path(user_name):
         print(f"Audiobook doesn't have a set user for path: {user_name}")
         return None
 
+def with_user_paths(audiobooks):
+    """Yields (audiobook, user_path) for each audiobook whose user has a path set."""
+    for audiobook in audiobooks:
+        user_path = get_user_path(audiobook.user)
+        if user_path:
+            yield audiobook, user_path
+
 def check_and_add_audiobooks(db, audiobooks_to_add) -> None:
-    books_to_add = []
-    
-    # Check each audiobook in the list
-    for audiobook in audiobooks_to_add:
-        title, author, series_name, book_number, url, user = audiobook
-        
-        # Check if the audiobook already exists in the database by title and author
-        existing_books = db.get_audiobooks(column_name="title", value=title)
-        
-        # If no existing book with the same title and author is found, add it to the list to be added
-        if not any(book for book in existing_books if book[2] == author):  # book[2] is author field
-            books_to_add.append(audiobook)
-    
-    # If there are books to add, call the add_audiobooks method
-    if books_to_add:
-        db.add_audiobooks(books_to_add)
+    # Books already in the database (same title and author) are skipped by the insert itself
+    added = db.add_audiobooks(audiobooks_to_add) if audiobooks_to_add else 0
+
+    if added:
+        print(f"Added {added} new book(s)")
     else:
         print("No new books to add")
 
 
 def download_books(db) -> None:
-    audiobooks = db.get_audiobooks(column_name='downloaded', value=0)  # Get books from the database
-    for audiobook in audiobooks:
-        user_path = get_user_path(audiobook[6])
-        if user_path:
-            with WebsiteDriver(teardown=True, base_path=user_path, title=audiobook[1]) as driver:  # Index for 'title'
-                driver.scrape_website(url=audiobook[5])  # Index for 'url'
-                driver.download_mp3_files(title=audiobook[1])
-            db.mark_audiobook_bool(column_name='downloaded', audiobook_id=audiobook[0])
+    audiobooks = db.iter_audiobooks(column_name='downloaded', value=0)  # Streamed from the database a page at a time
+
+    if PROJECT_SETTING.DOWNLOAD_MODE == "gui":
+        from core.website_driver import WebsiteDriver
+
+        # The "Save As" flow drives the desktop, so books have to go one at a time
+        for audiobook, user_path in with_user_paths(audiobooks):
+            with WebsiteDriver(teardown=True, base_path=user_path, title=audiobook.title) as driver:
+                with TRACER.span("scrape", book=audiobook.title):
+                    driver.scrape_website(url=audiobook.url)
+                with TRACER.span("download_book", book=audiobook.title):
+                    failed = driver.download_mp3_files(title=audiobook.title)
+            if not failed:
+                db.mark_audiobook_bool(column_name='downloaded', audiobook_id=audiobook.id)
+        return
+
+    # The pipeline pulls books from the generator as it has room for them
+    with download_pipeline(db) as pipeline:
+        pipeline.run(with_user_paths(audiobooks))
+
+
+@contextmanager
+def download_pipeline(db):
+    """Yields a DownloadPipeline backed by a pool of headless Chrome sessions, closing them afterwards."""
+    from core.content_store import ContentStore
+    from core.driver_pool import DriverPool, print_lease
+    from core.pipeline import DownloadPipeline
+    from core.website_driver import WebsiteDriver
+
+    driver_pool = DriverPool(
+        factory=lambda: WebsiteDriver(headless=True, block_resources=PROJECT_SETTING.BLOCK_RESOURCES),
+        size=PROJECT_SETTING.BOOKS_IN_FLIGHT,
+        stats_hook=print_lease,
+    )
+    with driver_pool:
+        yield DownloadPipeline(
+            db=db,
+            driver_pool=driver_pool,
+            books_in_flight=PROJECT_SETTING.BOOKS_IN_FLIGHT,
+            per_host_connections=PROJECT_SETTING.PER_HOST_CONNECTIONS,
+            chapter_concurrency=PROJECT_SETTING.CHAPTER_CONCURRENCY,
+            content_store=ContentStore(PROJECT_SETTING.CONTENT_STORE_DIR) if PROJECT_SETTING.CONTENT_STORE_DIR else None,
+            tag_on_download=PROJECT_SETTING.TAG_ON_DOWNLOAD,
+        )
+    print(f"Chrome session pool: {driver_pool.stats.as_dict()}")
 
-def edit_books(db) -> None:
-    audiobooks = db.get_audiobooks(column_name='edited', value=0)  # Get books from the database
-    for audiobook in audiobooks:
-        user_path = get_user_path(audiobook[6])
-        if user_path:
-            book_path = os.path.join(user_path, audiobook[1])
-            print(f"book is: {audiobook}")
 
-            edit_mp3_metadata(folder_path=book_path, audiobook_data=audiobook, db=db)
-            db.mark_audiobook_bool(column_name='edited', audiobook_id=audiobook[0])
+def edit_books(db) -> None:
+    audiobooks = db.iter_audiobooks(column_name='edited', value=0)  # Streamed from the database a page at a time
+    folders = (
+        (os.path.join(user_path, audiobook.title), audiobook)
+        for audiobook, user_path in with_user_paths(audiobooks)
+    )
+    books = (book for book in folders if os.path.isdir(book[0]))
+
+    tagger = BatchTagger(db=db)
+    with TRACER.span("tagging"):
+        while True:
+            batch = list(itertools.islice(books, TAG_BATCH_BOOKS))
+            if not batch:
+                break
+            counts = tagger.run(batch)
+            for book_path, audiobook in batch:
+                if book_path not in counts["failed_folders"]:
+                    db.mark_audiobook_bool(column_name='edited', audiobook_id=audiobook.id)
+
+def join_books(db, output_dir, force=False) -> None:
+    """Joins every downloaded book into one chaptered MP3 under ``output_dir``/<user>/."""
+    from core.book_joiner import BookJoiner
+
+    joiner = BookJoiner(db)
+    for audiobook in db.iter_audiobooks(column_name='downloaded', value=1):
+        user_path = get_user_path(audiobook.user)
+        book_path = os.path.join(user_path, audiobook.title) if user_path else None
+        output_path = os.path.join(output_dir, audiobook.user, f"{audiobook.title}.mp3")
+        if not book_path or not os.path.isdir(book_path) or (os.path.exists(output_path) and not force):
+            continue
+        try:
+            joiner.join(book_path, audiobook, output_path)
+        except (OSError, ValueError) as e:
+            print(f"Couldn't join '{audiobook.title}': {e}")
+
+
+def validate_books(db, book_id=None, workers=None) -> dict:
+    """Checks the audio of every downloaded chapter, or one book's, and queues bad chapters for re-download."""
+    from core.mp3_validator import MP3Validator
+
+    validator = MP3Validator(db, workers=workers)
+    with TRACER.span("validation"):
+        return validator.run(validator.plan(db.get_chapters_to_validate(book_id), get_user_path))
+
+
+def run_worker(db, kind, daemon=False, poll_seconds=10.0) -> dict:
+    """Works through the "download" or "tag" job queue, alongside any other workers sharing the database."""
+    from core.job_queue import JobFailed, JobWorker
+
+    def user_path_for(audiobook):
+        user_path = get_user_path(audiobook.user)
+        if not user_path:
+            raise JobFailed(f"No library path for user {audiobook.user}")
+        return user_path
+
+    # The worker marks the book edited or downloaded once it still holds the job's lease at the end
+    if kind == "tag":
+        def tag_book(audiobook, lease_lost):
+            book_path = os.path.join(user_path_for(audiobook), audiobook.title)
+            if not os.path.isdir(book_path):
+                raise JobFailed(f"{book_path} doesn't exist")
+            counts = BatchTagger(db=db).run([(book_path, audiobook)])
+            if counts["failed_folders"]:
+                raise JobFailed(f"{counts['failed']} file(s) couldn't be tagged")
+
+        return JobWorker(db, "tag", tag_book).run(daemon=daemon, poll_seconds=poll_seconds)
+
+    if PROJECT_SETTING.DOWNLOAD_MODE == "gui":
+        raise ValueError("Download workers need DOWNLOAD_MODE=http, the \"Save As\" flow can't run unattended")
+
+    with download_pipeline(db) as pipeline:
+        def download_book(audiobook, lease_lost):
+            pipeline.run([(audiobook, user_path_for(audiobook))], stop=lease_lost)
+            if not db.all_chapters_verified(audiobook.id):
+                raise JobFailed("Some chapters didn't download")
+
+        return JobWorker(db, "download", download_book).run(daemon=daemon, poll_seconds=poll_seconds)
 
 
 def check_chromedriver() -> None:
+    from core.update_chromedriver import ChromeDriverUpdater
+
     # Initialize the updater with the ChromeDriver path and download directory
-    updater = ChromeDriverUpdater(driver_path=PROJECT_SETTING.DRIVER_PATH, download_dir=PROJECT_SETTING.DEFAULT_PATH)
+    updater = ChromeDriverUpdater(driver_path=PROJECT_SETTING.DRIVER_PATH, download_dir=PROJECT_SETTING.DEFAULT_PATH,
+                                  base_url=PROJECT_SETTING.CHROMEDRIVER_MANIFEST_URL)
     
     # Update the ChromeDriver if needed
     updater.update_chromedriver()
@@ -202,11 +193,15 @@ if __name__ == "__main__":
     ]
 
     db = SQLiteDB()  # Create a database instance
-    db.create_audiobook_table()  # Ensure the audiobooks table exists
+    db.migrate()  # Ensure the tables exist and are up to date
     check_and_add_audiobooks(db=db, audiobooks_to_add=audiobooks_to_add)
     check_chromedriver()
 
     def main() -> None:
         download_books(db=db)
         edit_books(db=db)
+        if PROJECT_SETTING.JOINED_BOOKS_DIR:
+            join_books(db=db, output_dir=PROJECT_SETTING.JOINED_BOOKS_DIR)
+        report_path = TRACER.export(PROJECT_SETTING.METRICS_DIR)
+        print(f"Run report written to {report_path}")
     main()
\ No newline at end of file
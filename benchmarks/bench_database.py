@@ -0,0 +1,117 @@
+"""Per-operation latency of SQLiteDB, before and after the persistent connection.
+
+Run from the project root:
+
+    python -m benchmarks.bench_database --books 2000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from contextlib import contextmanager
+
+from core.database import MIGRATIONS, SQLiteDB
+
+
+class LegacySQLiteDB(SQLiteDB):
+    """Opens, commits and closes the database file for every query, like SQLiteDB used to.
+
+    It also keeps the original schema, without the indexes or the UNIQUE constraint.
+    """
+
+    def migrate(self) -> int:
+        with self._cursor() as cursor:
+            cursor.executescript(MIGRATIONS[0])
+        return 1
+
+    def add_audiobooks(self, audiobooks) -> int:
+        with self._cursor() as cursor:
+            cursor.executemany("""
+                INSERT INTO audiobooks (title, author, series_name, book_number, url, user, downloaded, edited) VALUES (?, ?, ?, ?, ?, ?, 0, 0)
+            """, audiobooks)
+            return cursor.rowcount
+
+    @contextmanager
+    def _cursor(self, operation=None):
+        with self._lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            try:
+                yield cursor
+                conn.commit()
+            finally:
+                conn.close()
+
+    def check_and_add_audiobooks(self, audiobooks) -> None:
+        """The old per-candidate lookup, filtering authors in Python."""
+        books_to_add = []
+        for audiobook in audiobooks:
+            existing_books = self.get_audiobooks(column_name="title", value=audiobook[0])
+            if not any(book for book in existing_books if book[2] == audiobook[1]):
+                books_to_add.append(audiobook)
+        if books_to_add:
+            self.add_audiobooks(books_to_add)
+
+
+def make_books(count):
+    return [
+        (f"Book {i}", f"Author {i % 50}", f"Series {i % 200}", i % 10 + 1, f"https://example.com/book-{i}", "Jackson")
+        for i in range(count)
+    ]
+
+
+def timed(operation, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        operation(i)
+    return (time.perf_counter() - start) / repeat * 1e6  # Microseconds per call
+
+
+def run(db, books, lookups):
+    db.migrate()
+    results = {}
+
+    start = time.perf_counter()
+    db.add_audiobooks(books)
+    results["add_audiobooks (batch)"] = (time.perf_counter() - start) * 1e6
+
+    results["get_audiobooks(title)"] = timed(lambda i: db.get_audiobooks("title", f"Book {i}"), lookups)
+    results["get_audiobooks(downloaded)"] = timed(lambda i: db.get_audiobooks("downloaded", 0), 20)
+    results["iter_audiobooks(downloaded)"] = timed(lambda i: sum(1 for _ in db.iter_audiobooks("downloaded", 0)), 20)
+    results["get_last_book_number_in_series"] = timed(
+        lambda i: db.get_last_book_number_in_series(f"Series {i % 200}"), lookups
+    )
+    results["mark_audiobook_bool"] = timed(lambda i: db.mark_audiobook_bool("edited", i + 1), lookups)
+
+    candidates = make_books(len(books) + lookups)[-2 * lookups:]  # Half known, half new
+    start = time.perf_counter()
+    if isinstance(db, LegacySQLiteDB):
+        db.check_and_add_audiobooks(candidates)
+    else:
+        db.add_audiobooks(candidates)
+    results["check_and_add (per candidate)"] = (time.perf_counter() - start) / len(candidates) * 1e6
+
+    db.disconnect()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=2000, help="rows loaded before timing lookups")
+    parser.add_argument("--lookups", type=int, default=500, help="calls timed per operation")
+    args = parser.parse_args()
+
+    books = make_books(args.books)
+    with tempfile.TemporaryDirectory() as tmp:
+        before = run(LegacySQLiteDB(db_path=os.path.join(tmp, "legacy.sql")), books, args.lookups)
+        after = run(SQLiteDB(db_path=os.path.join(tmp, "current.sql")), books, args.lookups)
+
+    print(f"{'operation':34} {'before (us)':>12} {'after (us)':>12} {'speedup':>8}")
+    for name in before:
+        print(f"{name:34} {before[name]:12.1f} {after[name]:12.1f} {before[name] / after[name]:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Runs download_books -> edit_books against the local stand-in site.
+
+Reports books/hour, chapters/s, MB/s and peak RSS for the download and tagging
+stages, all offline. Chrome is only started if static extraction fails, which
+``--no-embedded-tracks`` forces. Chapters are tagged as they download unless
+``--tag-pass`` asks for the separate tagging pass instead.
+
+Run from the project root:
+
+    python -m benchmarks.bench_end_to_end --books 5 --chapters 20 --chapter-mb 2
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.stand_in_site import StandInSite
+from core.config import PROJECT_SETTING
+from core.database import SQLiteDB
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process and its finished children, where the OS reports it."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KB elsewhere
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / scale
+
+
+def report(stage, seconds, books, chapters, size):
+    print(
+        f"{stage:9} {seconds:8.2f}s  {books / seconds * 3600:10.1f} books/h  "
+        f"{chapters / seconds:8.1f} chapters/s  {size / seconds / 1e6:8.1f} MB/s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=5)
+    parser.add_argument("--chapters", type=int, default=20)
+    parser.add_argument("--chapter-mb", type=float, default=2.0)
+    parser.add_argument("--no-embedded-tracks", action="store_true", help="force the Chrome fallback")
+    parser.add_argument("--tag-pass", action="store_true", help="tag in edit_books instead of while downloading")
+    args = parser.parse_args()
+
+    # Imported here so the settings below are in place before the pipeline reads them
+    import audio_collector
+
+    with tempfile.TemporaryDirectory() as tmp, \
+            StandInSite(args.books, args.chapters, int(args.chapter_mb * 1024 * 1024),
+                        embed_tracks=not args.no_embedded_tracks) as site:
+        PROJECT_SETTING.JACKSON = os.path.join(tmp, "library")
+        PROJECT_SETTING.CONTENT_STORE_DIR = os.path.join(tmp, "content_store")
+        PROJECT_SETTING.TAG_ON_DOWNLOAD = not args.tag_pass
+
+        db = SQLiteDB(db_path=os.path.join(tmp, "bench.sql"))
+        db.migrate()
+        db.add_audiobooks([
+            (f"Bench Book {book}", "Bench Author", "Bench Series", book + 1, site.book_url(book), "Jackson")
+            for book in range(args.books)
+        ])
+
+        total_chapters = args.books * args.chapters
+        total_bytes = total_chapters * len(site.chapter)
+
+        start = time.perf_counter()
+        audio_collector.download_books(db=db)
+        download_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        audio_collector.edit_books(db=db)
+        tag_seconds = time.perf_counter() - start
+
+        missing = len(db.get_audiobooks("downloaded", 0)) + len(db.get_audiobooks("edited", 0))
+        db.disconnect()
+
+    print()
+    print(f"{args.books} book(s) x {args.chapters} chapter(s) x {args.chapter_mb} MB")
+    report("download", download_seconds, args.books, total_chapters, total_bytes)
+    report("tag", tag_seconds, args.books, total_chapters, total_bytes)
+    report("total", download_seconds + tag_seconds, args.books, total_chapters, total_bytes)
+    rss = peak_rss_mb()
+    print(f"peak RSS  {rss:.1f} MB" if rss is not None else "peak RSS  unavailable on this platform")
+    if missing:
+        print(f"WARNING: {missing} book stage(s) didn't finish")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Compares the in-place ID3 writer against the old MP3(file).save() path.
+
+Each file is tagged once (first write) and then retagged with a new title,
+the way a library-wide retag touches files that already have tags.
+
+Run from the project root:
+
+    python -m benchmarks.bench_id3_writer --files 20 --size-mb 30
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from mutagen.mp3 import MP3
+
+from benchmarks.synthetic_mp3 import write_mp3
+from core.id3_writer import write_tags
+from core.metadata_editor import FRAMES
+
+
+def io_bytes_written() -> int:
+    """Bytes this process has written so far, where the OS reports it (Linux)."""
+    try:
+        with open("/proc/self/io") as io:
+            for line in io:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def mutagen_save(file_path, tags) -> None:
+    """The path edit_mp3_metadata used to take."""
+    audio = MP3(file_path)
+    if audio.tags is None:
+        audio.add_tags()
+    for frame_id, text in tags.items():
+        audio.tags.add(FRAMES[frame_id](encoding=3, text=text))
+    audio.save()
+
+
+def in_place_save(file_path, tags) -> None:
+    write_tags(file_path, tags)
+
+
+def measure(save, paths, tags):
+    start_bytes, start = io_bytes_written(), time.perf_counter()
+    for path in paths:
+        save(path, tags)
+    return time.perf_counter() - start, io_bytes_written() - start_bytes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--size-mb", type=float, default=30.0)
+    args = parser.parse_args()
+
+    tags = {
+        "TIT2": "Chapter 1", "TIT3": "A Series With A Fairly Long Name", "TPOS": "3/5",
+        "TPE1": "An Author", "TALB": "A Book - Book 3", "TRCK": "1", "TCON": "Audiobook",
+    }
+    retag = dict(tags, TIT2="Chapter 1 (retagged)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for name, save in (("MP3.save", mutagen_save), ("write_tags", in_place_save)):
+            paths = []
+            for i in range(args.files):
+                path = os.path.join(tmp, f"{name}-{i}.mp3")
+                write_mp3(path, size=int(args.size_mb * 1024 * 1024))
+                paths.append(path)
+            results[name] = (measure(save, paths, tags), measure(save, paths, retag))
+
+    print(f"{args.files} files of {args.size_mb} MB")
+    print(f"{'writer':12} {'pass':8} {'seconds':>9} {'MB written':>11} {'KB/file':>9}")
+    for name, passes in results.items():
+        for label, (seconds, written) in zip(("first", "retag"), passes):
+            print(f"{name:12} {label:8} {seconds:9.3f} {written / 1e6:11.1f} {written / 1e3 / args.files:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Bulk catalog import throughput, for CSV and JSONL.
+
+A catalog of ``--rows`` books is written with ``--duplicates`` of its rows
+repeated, and a share of the books is added to the database up front, so the
+run exercises both kinds of skipped rows.
+
+Run from the project root:
+
+    python -m benchmarks.bench_import --rows 50000
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import tempfile
+
+from core.catalog_import import FIELDS, CatalogImporter
+from core.database import SQLiteDB
+
+
+def make_rows(count, duplicates):
+    rows = [
+        (f"Book {i}", f"Author {i % 500}", f"Series {i % 2000}", i % 10 + 1, f"https://example.com/book-{i}", "Jackson")
+        for i in range(count)
+    ]
+    rows += random.Random(0).sample(rows, int(count * duplicates))
+    return rows
+
+
+def write_catalog(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        if path.endswith(".csv"):
+            writer = csv.writer(file)
+            writer.writerow(FIELDS)
+            writer.writerows(rows)
+        else:
+            for row in rows:
+                file.write(json.dumps(dict(zip(FIELDS, row))) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--duplicates", type=float, default=0.1, help="share of rows repeated in the catalog")
+    parser.add_argument("--existing", type=float, default=0.2, help="share of books already in the database")
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows, args.duplicates)
+    with tempfile.TemporaryDirectory() as tmp:
+        for extension in ("csv", "jsonl"):
+            catalog_path = os.path.join(tmp, f"catalog.{extension}")
+            write_catalog(catalog_path, rows)
+
+            db = SQLiteDB(db_path=os.path.join(tmp, f"{extension}.sql"))
+            db.migrate()
+            db.add_audiobooks(rows[:int(args.rows * args.existing)])
+
+            print(f"{extension}: {len(rows)} row(s), {os.path.getsize(catalog_path) / 1e6:.1f} MB")
+            counts = CatalogImporter(db).run(catalog_path)
+            assert counts["inserted"] == args.rows - int(args.rows * args.existing), counts
+            db.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Throughput of joining a book's chapters into one chaptered MP3.
+
+Writes ``--chapters`` synthetic chapters adding up to ``--book-gb`` of audio,
+each with its own ID3 tag and an Info frame like real encoder output, then
+joins them and checks the result with mutagen.
+
+Run from the project root:
+
+    python -m benchmarks.bench_join --book-gb 2 --chapters 60
+"""
+import argparse
+import os
+import tempfile
+
+from mutagen.id3 import ID3
+from mutagen.mp3 import MP3
+
+from benchmarks.synthetic_mp3 import FRAME, FRAME_SIZE, mp3_bytes
+from core.book_joiner import BookJoiner
+from core.database import AudiobookRecord
+from core.downloader import chapter_filename
+from core.id3_writer import render_tag
+
+# An Info frame (the CBR form of a Xing header) sits right after the 32 bytes of side information
+INFO_FRAME = FRAME[:36] + b"Info" + FRAME[40:]
+
+
+class NoSeriesDB:
+    def get_last_book_number_in_series(self, series_name):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--book-gb", type=float, default=1.0)
+    parser.add_argument("--chapters", type=int, default=40)
+    args = parser.parse_args()
+
+    title = "Bench Book"
+    audiobook = AudiobookRecord(1, title, "Bench Author", None, None, "https://example.com", "Jackson", 1, 1)
+    chapter_size = int(args.book_gb * 1e9 / args.chapters) // FRAME_SIZE * FRAME_SIZE
+    chapter = mp3_bytes(size=chapter_size)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = os.path.join(tmp, title)
+        os.makedirs(folder)
+        for index in range(args.chapters):
+            with open(os.path.join(folder, chapter_filename(index, title)), "wb") as file:
+                file.write(render_tag({"TIT2": f"Chapter {index}"}))
+                file.write(INFO_FRAME)
+                file.write(chapter)
+
+        output_path = os.path.join(tmp, "joined", f"{title}.mp3")
+        result = BookJoiner(NoSeriesDB()).join(folder, audiobook, output_path)
+
+        expected_bytes = args.chapters * len(chapter)
+        assert result["bytes"] == expected_bytes, (result["bytes"], expected_bytes)
+        tags = ID3(output_path)
+        print(f"{len(tags.getall('CHAP'))} CHAP frame(s), {len(tags.getall('CTOC'))} CTOC frame(s), "
+              f"{MP3(output_path).info.length / 3600:.2f}h according to mutagen")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Times edit_mp3_metadata on a folder of synthetic chapters.
+
+The first pass tags untagged files, the second finds every tag already
+correct, and the third changes one frame so every file is retagged in place.
+
+Run from the project root:
+
+    python -m benchmarks.bench_metadata --chapters 50 --chapter-mb 5
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic_mp3 import write_mp3
+from core.database import AudiobookRecord, SQLiteDB
+from core.metadata_editor import edit_mp3_metadata
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chapters", type=int, default=50)
+    parser.add_argument("--chapter-mb", type=float, default=5.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = SQLiteDB(db_path=os.path.join(tmp, "bench.sql"))
+        db.migrate()
+        db.add_audiobooks([("Bench Book", "Bench Author", "Bench Series", 2, "https://example.com", "Jackson")])
+        audiobook = db.get_audiobooks("title", "Bench Book")[0]
+
+        folder = os.path.join(tmp, "Bench Book")
+        os.makedirs(folder)
+        for chapter in range(args.chapters):
+            write_mp3(os.path.join(folder, f"Chapter {chapter} - Bench Book.mp3"), size=int(args.chapter_mb * 1024 * 1024))
+
+        renamed = AudiobookRecord(audiobook.id, "Bench Book (Renamed)", *audiobook[2:])
+        for label, data in (("first tag", audiobook), ("unchanged", audiobook), ("retag", renamed)):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):  # edit_mp3_metadata prints per file
+                edit_mp3_metadata(folder_path=folder, audiobook_data=data, db=db)
+            seconds = time.perf_counter() - start
+            print(f"{label:10} {seconds:8.3f}s  {args.chapters / seconds:8.1f} files/s")
+        db.disconnect()
+
+
+if __name__ == "__main__":
+    main()
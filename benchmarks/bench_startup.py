@@ -0,0 +1,76 @@
+"""Checks how fast the CLI starts and that light commands don't load heavy modules.
+
+Each command runs in a fresh interpreter with ``-X importtime`` against an empty
+temporary database. The wall time of the whole command and the time spent
+importing are compared to a budget, and the run fails if any command goes over
+it or imports a module it shouldn't.
+
+Run from the project root:
+
+    python -m benchmarks.bench_startup --budget 1.0
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds a light command may take from start to exit
+DEFAULT_BUDGET = 1.0
+
+# Commands that must stay fast, and the modules they must not import
+LIGHT_COMMANDS = {
+    "status": ("selenium", "pyautogui", "requests", "mutagen"),
+    "tag": ("selenium", "pyautogui", "requests"),
+}
+
+
+def run_command(command, db_path, metrics_dir):
+    """Runs ``podcatcher.py <command>`` and returns (wall seconds, import seconds, imported module names)."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "podcatcher.py", "--db", db_path, "--metrics-dir", metrics_dir, command],
+        capture_output=True, text=True, check=True, cwd=PROJECT_ROOT,
+    )
+    wall = time.perf_counter() - start
+
+    import_us, modules = 0, set()
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        modules.add(name.strip())
+        if not name.startswith("  "):  # Top-level imports already include their children
+            import_us += int(cumulative)
+    return wall, import_us / 1e6, modules
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="seconds each light command may take")
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "startup.sql")
+        for command, forbidden in LIGHT_COMMANDS.items():
+            wall, import_seconds, modules = run_command(command, db_path, os.path.join(tmp, "metrics"))
+            loaded = sorted(name for name in forbidden if name in modules)
+            print(f"{command:8} {wall:6.3f}s total  {import_seconds:6.3f}s importing  "
+                  f"heavy modules: {', '.join(loaded) or 'none'}")
+            if wall > args.budget:
+                failures.append(f"{command} took {wall:.3f}s (budget {args.budget}s)")
+            if loaded:
+                failures.append(f"{command} imported {', '.join(loaded)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
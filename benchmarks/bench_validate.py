@@ -0,0 +1,51 @@
+"""Throughput of the frame-level MP3 check over a synthetic library.
+
+Writes ``--files`` chapters of ``--chapter-mb`` each, damages a few of them
+(truncated, an HTML error page, junk in the middle) and checks them all.
+
+Run from the project root:
+
+    python -m benchmarks.bench_validate --files 500 --chapter-mb 10
+"""
+import argparse
+import os
+import tempfile
+
+from benchmarks.synthetic_mp3 import mp3_bytes
+from core.database import SQLiteDB
+from core.id3_writer import render_tag
+from core.mp3_validator import MP3Validator
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--chapter-mb", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    chapter = render_tag({"TIT2": "Chapter"}) + mp3_bytes(size=int(args.chapter_mb * 1024 * 1024))
+    damaged = {
+        0: chapter[:-1000],  # Truncated mid-frame
+        1: b"<html><body>404 Not Found</body></html>",
+        2: chapter[:len(chapter) // 2] + os.urandom(len(chapter) // 20) + chapter[len(chapter) // 2:],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        jobs = []
+        for index in range(args.files):
+            file_path = os.path.join(tmp, f"Chapter {index}.mp3")
+            with open(file_path, "wb") as file:
+                file.write(damaged.get(index, chapter))
+            jobs.append((index + 1, file_path, len(chapter), None))
+
+        db = SQLiteDB(db_path=os.path.join(tmp, "validate.sql"))
+        db.migrate()
+        counts = MP3Validator(db, workers=args.workers).run(jobs)
+        db.disconnect()
+
+    assert counts["invalid"] == len(damaged), counts["failed"]
+
+
+if __name__ == "__main__":
+    main()
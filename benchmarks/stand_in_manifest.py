@@ -0,0 +1,149 @@
+"""A local stand-in for the Chrome for Testing manifest and its ChromeDriver downloads.
+
+The manifest is served with an ETag and a Last-Modified date and answers a
+matching ``If-None-Match`` or ``If-Modified-Since`` with 304, like the real one.
+Each listed version links to a small ChromeDriver zip laid out the way the real
+downloads are (``chromedriver-<platform>/chromedriver[.exe]``). Requests are
+counted per path, so tests can tell whether anything was fetched.
+
+Point CHROMEDRIVER_MANIFEST_URL at it to exercise the updater offline:
+
+    python -m benchmarks.stand_in_manifest --versions 124.0.6367.91 125.0.6422.60
+"""
+import argparse
+import collections
+import hashlib
+import io
+import json
+import threading
+import zipfile
+
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MANIFEST_PATH = "/known-good-versions-with-downloads.json"
+LAST_MODIFIED = formatdate(1700000000, usegmt=True)
+
+
+def driver_zip(version: str, platform: str) -> bytes:
+    """A zip holding a stand-in ChromeDriver "executable" that only contains its version."""
+    name = "chromedriver.exe" if platform.startswith("win") else "chromedriver"
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr(f"chromedriver-{platform}/{name}", f"ChromeDriver {version}\n")
+    return buffer.getvalue()
+
+
+class StandInManifest:
+    """Serves a manifest listing ``versions`` with a ChromeDriver download for ``platform``."""
+
+    def __init__(self, versions=("124.0.6367.91",), platform="win64", host="127.0.0.1", port=0) -> None:
+        self.versions = list(versions)
+        self.platform = platform
+        self.requests = collections.Counter()  # Path -> number of requests
+        self.not_modified = 0  # How many manifest requests were answered with 304
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def manifest_url(self) -> str:
+        return f"{self.base_url}{MANIFEST_PATH}"
+
+    def zip_path(self, version: str) -> str:
+        return f"/{version}/{self.platform}/chromedriver-{self.platform}.zip"
+
+    def manifest(self) -> bytes:
+        versions = [
+            {"version": version, "downloads": {"chromedriver": [
+                {"platform": self.platform, "url": f"{self.base_url}{self.zip_path(version)}"}
+            ]}}
+            for version in self.versions
+        ]
+        return json.dumps({"versions": versions}).encode("utf-8")
+
+    @property
+    def etag(self) -> str:
+        # Changes whenever the version list does
+        return f'"{hashlib.sha1(" ".join(self.versions).encode()).hexdigest()[:16]}"'
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                site.requests[self.path] += 1
+                if self.path == MANIFEST_PATH:
+                    self._send_manifest()
+                    return
+                for version in site.versions:
+                    if self.path == site.zip_path(version):
+                        self._send(200, driver_zip(version, site.platform), "application/zip")
+                        return
+                self._send(404, b"Not found", "text/plain")
+
+            def _send_manifest(self):
+                if self.headers.get("If-None-Match") == site.etag or \
+                        (self.headers.get("If-None-Match") is None and self.headers.get("If-Modified-Since") == LAST_MODIFIED):
+                    site.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", site.etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self._send(200, site.manifest(), "application/json", {"ETag": site.etag, "Last-Modified": LAST_MODIFIED})
+
+            def _send(self, status, body, content_type, headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--versions", nargs="+", default=["124.0.6367.91"])
+    parser.add_argument("--platform", default="win64")
+    parser.add_argument("--port", type=int, default=8801)
+    args = parser.parse_args()
+
+    manifest = StandInManifest(args.versions, args.platform, port=args.port)
+    print(f"Serving the ChromeDriver manifest at {manifest.manifest_url}")
+    try:
+        manifest.server.serve_forever()
+    except KeyboardInterrupt:
+        manifest.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""A local stand-in for the audiobook site, serving player pages and synthetic chapters.
+
+Each book page has the structure ``WebsiteDriver.scrape_website`` relies on: a
+``#plList`` with one ``<li>`` per chapter, a ``#btnNext`` button and an
+``#audio1`` player whose ``src`` advances on every click. The track list is also
+embedded as player data, so static extraction works without a browser, unless
+``embed_tracks=False`` forces the Chrome fallback. Setting ``signature`` makes the
+chapter links signed: they carry ``?sig=<signature>`` and any other signature
+is refused with 403, like an expired CDN link.
+
+Run it on its own to point a real browser or the CLI at it:
+
+    python -m benchmarks.stand_in_site --books 3 --chapters 10 --chapter-mb 5
+"""
+import argparse
+import json
+import re
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.synthetic_mp3 import mp3_bytes
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head><title>{title}</title></head>
+<body>
+  <audio id="audio1" src="{first}" preload="none" controls></audio>
+  <button id="btnNext">Next</button>
+  <ul id="plList">
+{items}
+  </ul>
+  <script>
+    var tracks = {tracks};
+    var current = 0;
+    document.getElementById("btnNext").addEventListener("click", function () {{
+      current = Math.min(current + 1, tracks.length - 1);
+      document.getElementById("audio1").src = tracks[current].src;
+    }});
+  </script>
+</body>
+</html>
+"""
+
+PAGE_PATH = re.compile(r"^/book/(\d+)$")
+AUDIO_PATH = re.compile(r"^/audio/(\d+)/(\d+)\.mp3$")
+RANGE_HEADER = re.compile(r"^bytes=(\d+)-(\d*)$")
+
+
+class StandInSite:
+    """Serves ``books`` player pages with ``chapters`` synthetic MP3s of ``chapter_size`` bytes each."""
+
+    def __init__(self, books=3, chapters=10, chapter_size=1024 * 1024, host="127.0.0.1", port=0, embed_tracks=True) -> None:
+        self.books = books
+        self.chapters = chapters
+        self.chapter = mp3_bytes(size=chapter_size)  # Every chapter shares the same bytes
+        self.embed_tracks = embed_tracks
+        self.signature = None
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def book_url(self, book: int) -> str:
+        return f"{self.base_url}/book/{book}"
+
+    def page(self, book: int) -> str:
+        query = f"?sig={self.signature}" if self.signature else ""
+        sources = [f"/audio/{book}/{chapter}.mp3{query}" for chapter in range(self.chapters)]
+        items = "\n".join(f"    <li>Chapter {chapter}</li>" for chapter in range(self.chapters))
+        if self.embed_tracks:
+            tracks = json.dumps([{"name": f"Chapter {chapter}", "src": src} for chapter, src in enumerate(sources)])
+        else:
+            # Build the sources at runtime so they can't be read from the HTML
+            tracks = (
+                f'Array.from({{length: {self.chapters}}}, function (_, i) {{ '
+                f'return {{src: "/audio/{book}/" + i + ".mp" + "3{query}"}}; }})'
+            )
+        return PAGE_TEMPLATE.format(title=f"Book {book}", first=sources[0], items=items, tracks=tracks)
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, like a real CDN
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                path, _, query = self.path.partition("?")
+                page = PAGE_PATH.match(path)
+                audio = AUDIO_PATH.match(path)
+                if page and int(page.group(1)) < site.books:
+                    self._send(200, site.page(int(page.group(1))).encode("utf-8"), "text/html; charset=utf-8")
+                elif audio and site.signature and query != f"sig={site.signature}":
+                    self._send(403, b"Link expired", "text/plain")
+                elif audio and int(audio.group(1)) < site.books and int(audio.group(2)) < site.chapters:
+                    self._send_audio(site.chapter)
+                else:
+                    self._send(404, b"Not found", "text/plain")
+
+            def _send_audio(self, data):
+                match = RANGE_HEADER.match(self.headers.get("Range", ""))
+                if match and int(match.group(1)) >= len(data):
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{len(data)}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if match:
+                    start = int(match.group(1))
+                    end = int(match.group(2)) if match.group(2) else len(data) - 1
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+                    body = memoryview(data)[start:end + 1]
+                else:
+                    self.send_response(200)
+                    body = memoryview(data)
+                self.send_header("Content-Type", "audio/mpeg")
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send(self, status, body, content_type):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=3)
+    parser.add_argument("--chapters", type=int, default=10)
+    parser.add_argument("--chapter-mb", type=float, default=1.0)
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--no-embedded-tracks", action="store_true", help="force scrapers to click through the player")
+    args = parser.parse_args()
+
+    site = StandInSite(args.books, args.chapters, int(args.chapter_mb * 1024 * 1024), port=args.port,
+                       embed_tracks=not args.no_embedded_tracks)
+    print(f"Serving {args.books} book(s) at {site.base_url}/book/0 .. /book/{args.books - 1}")
+    try:
+        site.server.serve_forever()
+    except KeyboardInterrupt:
+        site.stop()
+
+
+if __name__ == "__main__":
+    main()
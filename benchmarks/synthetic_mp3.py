@@ -0,0 +1,24 @@
+"""Synthetic MP3 files made of valid, silent MPEG-1 Layer III frames."""
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, joint stereo, no CRC, no padding
+FRAME_HEADER = b"\xff\xfb\x90\x64"
+FRAME_SIZE = 417  # 144 * 128000 // 44100
+FRAME_DURATION = 1152 / 44100
+FRAME = FRAME_HEADER + b"\x00" * (FRAME_SIZE - len(FRAME_HEADER))
+
+
+def mp3_bytes(size=None, seconds=None) -> bytes:
+    """Whole frames adding up to at most ``size`` bytes, or about ``seconds`` of audio."""
+    if seconds is not None:
+        count = max(1, round(seconds / FRAME_DURATION))
+    else:
+        count = max(1, size // FRAME_SIZE)
+    return FRAME * count
+
+
+def write_mp3(path, size=None, seconds=None, prefix=b"") -> int:
+    """Writes a synthetic MP3 (optionally after ``prefix``, e.g. an ID3 tag) and returns its size."""
+    data = prefix + mp3_bytes(size=size, seconds=seconds)
+    with open(path, "wb") as file:
+        file.write(data)
+    return len(data)
@@ -0,0 +1,87 @@
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+from core.database import AudiobookRecord
+from core.metadata_editor import apply_tags, build_tags
+from core.metrics import TRACER
+
+
+def tag_file(job):
+    """Worker entry point: applies one file's tags and returns (status, bytes written, seconds, error)."""
+    file_path, tags = job
+    start = time.perf_counter()
+    try:
+        written = apply_tags(file_path, tags)
+        return ("tagged" if written else "skipped"), written, time.perf_counter() - start, None
+    except Exception as e:
+        return "failed", 0, time.perf_counter() - start, str(e)
+
+
+class BatchTagger:
+    """Tags whole books, or a whole library, across a pool of worker processes.
+
+    Series and book-level data is looked up once per book in the parent process;
+    the workers only read each file's ID3 tag and rewrite it when it differs.
+    """
+
+    def __init__(self, db, workers=None, chunksize=16) -> None:
+        """
+        Args:
+            db (SQLiteDB): Used to look up the last book number of each series.
+            workers (int): Worker processes, defaults to the number of CPUs.
+            chunksize (int): Files handed to a worker at a time.
+        """
+        self.db = db
+        self.workers = workers or os.cpu_count()
+        self.chunksize = chunksize
+        self._last_book_numbers = {}
+
+    def last_book_number(self, series_name):
+        if series_name not in self._last_book_numbers:
+            self._last_book_numbers[series_name] = self.db.get_last_book_number_in_series(series_name)
+        return self._last_book_numbers[series_name]
+
+    def plan_book(self, folder_path: str, audiobook_data: AudiobookRecord) -> list:
+        """Returns a (file_path, tags) job for every MP3 in a book's folder."""
+        series_name = audiobook_data.series_name
+        last_book_number = self.last_book_number(series_name) if series_name else None
+        return [
+            (entry.path, build_tags(entry.name, audiobook_data, last_book_number))
+            for entry in os.scandir(folder_path)
+            if entry.is_file() and entry.name.endswith(".mp3")
+        ]
+
+    def run(self, books) -> dict:
+        """
+        Tags every (folder_path, audiobook_data) pair.
+
+        Returns:
+            dict: Counts of tagged, skipped and failed files, the bytes written, the elapsed seconds and
+                  the folders that had a failure ("failed_folders").
+        """
+        jobs = []
+        for folder_path, audiobook_data in books:
+            jobs.extend(self.plan_book(folder_path, audiobook_data))
+
+        counts = {"tagged": 0, "skipped": 0, "failed": 0, "bytes_written": 0, "failed_folders": set()}
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            for (file_path, _), (status, written, seconds, error) in zip(jobs, executor.map(tag_file, jobs, chunksize=self.chunksize)):
+                counts[status] += 1
+                counts["bytes_written"] += written
+                # Worker processes can't reach the tracer, so their timings are recorded here
+                TRACER.record("tag_file", seconds, book=os.path.basename(os.path.dirname(file_path)), size=written)
+                if error is not None:
+                    counts["failed_folders"].add(os.path.dirname(file_path))
+                    print(f"Tagging failed for {file_path}: {error}")
+        counts["seconds"] = elapsed = time.perf_counter() - start
+
+        per_second = lambda count: count / elapsed if elapsed else 0.0
+        print(
+            f"Tagged {counts['tagged']} ({per_second(counts['tagged']):.1f}/s), "
+            f"skipped {counts['skipped']} ({per_second(counts['skipped']):.1f}/s), "
+            f"failed {counts['failed']} file(s) in {elapsed:.2f}s, {counts['bytes_written']} bytes written"
+        )
+        return counts
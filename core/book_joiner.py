@@ -0,0 +1,192 @@
+import mmap
+import os
+import re
+import struct
+import time
+
+from contextlib import contextmanager
+
+from core.id3_writer import encode_frame, encode_text_frame, render_tag
+from core.metadata_editor import build_tags
+from core.metrics import TRACER
+from core.mpeg import scan_audio
+
+# CTOC frames list at most 255 entries, so longer books get one sub-table per 255 chapters
+CTOC_MAX_ENTRIES = 255
+CTOC_TOP_LEVEL = 0x02
+CTOC_ORDERED = 0x01
+NO_OFFSET = 0xFFFFFFFF
+
+COPY_CHUNK = 64 * 1024 * 1024
+
+
+def chapter_number(filename: str) -> int:
+    """The chapter number in a file name such as "Chapter 3 - Title.mp3", as ``build_tags`` reads it."""
+    match = re.search(r'\d+', os.path.splitext(filename)[0])
+    return int(match.group()) if match else -1
+
+
+def encode_chap_frame(element_id: str, start_ms: int, end_ms: int, start_offset: int, end_offset: int, title: str) -> bytes:
+    """An ID3v2.4 CHAP frame with an embedded TIT2 title."""
+    body = (
+        element_id.encode("latin-1") + b"\x00"
+        + struct.pack(">IIII", start_ms, end_ms, start_offset, end_offset)
+        + encode_text_frame("TIT2", title)
+    )
+    return encode_frame("CHAP", body)
+
+
+def encode_ctoc_frame(element_id: str, children, flags: int, title=None) -> bytes:
+    """An ID3v2.4 CTOC frame listing ``children`` by element ID."""
+    body = element_id.encode("latin-1") + b"\x00" + bytes((flags, len(children)))
+    body += b"".join(child.encode("latin-1") + b"\x00" for child in children)
+    if title:
+        body += encode_text_frame("TIT2", title)
+    return encode_frame("CTOC", body)
+
+
+def chapter_frames(chapters, title: str) -> list:
+    """Builds the CTOC and CHAP frames for ``chapters``, a list of (title, start_ms, end_ms) tuples."""
+    chap_ids = [f"chp{index}" for index in range(len(chapters))]
+    frames = []
+    if len(chap_ids) <= CTOC_MAX_ENTRIES:
+        frames.append(encode_ctoc_frame("toc", chap_ids, CTOC_TOP_LEVEL | CTOC_ORDERED, title))
+    else:
+        groups = [chap_ids[i:i + CTOC_MAX_ENTRIES] for i in range(0, len(chap_ids), CTOC_MAX_ENTRIES)]
+        group_ids = [f"toc{index}" for index in range(len(groups))]
+        frames.append(encode_ctoc_frame("toc", group_ids, CTOC_TOP_LEVEL | CTOC_ORDERED, title))
+        frames.extend(encode_ctoc_frame(group_id, group, CTOC_ORDERED) for group_id, group in zip(group_ids, groups))
+
+    for chap_id, (chapter_title, start_ms, end_ms) in zip(chap_ids, chapters):
+        frames.append(encode_chap_frame(chap_id, start_ms, end_ms, NO_OFFSET, NO_OFFSET, chapter_title))
+    return frames
+
+
+def _copy_range(source_fd: int, target_fd: int, source_map, start: int, end: int) -> None:
+    """Copies ``source[start:end]`` to the end of the target, inside the kernel where it can."""
+    offset = start
+    while offset < end:
+        count = min(COPY_CHUNK, end - offset)
+        try:
+            copied = os.copy_file_range(source_fd, target_fd, count, offset)
+        except (AttributeError, OSError):
+            # No copy_file_range (not Linux, or across file systems): write straight from the mapping
+            copied = os.write(target_fd, memoryview(source_map)[offset:offset + count])
+        if copied == 0:
+            raise OSError(f"Copy stopped at byte {offset} of {end}")
+        offset += copied
+
+
+@contextmanager
+def _mapped(file_path: str):
+    """Yields a file's descriptor and a read-only memory map of it (empty bytes for an empty file)."""
+    with open(file_path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            yield file.fileno(), b""
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as source_map:
+            yield file.fileno(), source_map
+
+
+class BookJoiner:
+    """Splices a book's chapter MP3s into one chaptered MP3 without decoding any audio.
+
+    Every chapter is memory-mapped and its frame headers walked to find the
+    audio and its duration. The joined file gets a single ID3v2.4 tag, built
+    from the same data as the chapter tags, with a CHAP frame per chapter and a
+    CTOC table of contents. Then each chapter's frames are copied in after it;
+    the chapters' own ID3 tags and Xing/Info headers are left out.
+    """
+
+    def __init__(self, db) -> None:
+        self.db = db
+
+    def book_tags(self, chapter_files, audiobook_data):
+        """Returns the book-level text frames and the series' last book number."""
+        series_name = audiobook_data.series_name
+        last_book_number = self.db.get_last_book_number_in_series(series_name) if series_name else None
+        tags = build_tags(os.path.basename(chapter_files[0]), audiobook_data, last_book_number)
+        tags.pop("TRCK", None)
+        tags["TIT2"] = audiobook_data.title  # The book title instead of the first chapter's
+        return tags, last_book_number
+
+    def join(self, folder_path: str, audiobook_data, output_path: str) -> dict:
+        """
+        Joins every chapter in ``folder_path`` into ``output_path``.
+
+        Args:
+            folder_path (str): The book folder with "Chapter N - title.mp3" files.
+            audiobook_data (AudiobookRecord): The audiobook the chapters belong to.
+            output_path (str): The joined file. It only appears once it's complete.
+
+        Returns:
+            dict: The number of ``chapters``, ``bytes`` of audio copied, ``seconds`` of audio and
+                  ``elapsed`` seconds, plus ``skipped`` files that had no MPEG audio.
+        """
+        title = audiobook_data.title
+        chapter_files = sorted(
+            (entry.path for entry in os.scandir(folder_path) if entry.is_file() and entry.name.endswith(".mp3")),
+            key=lambda path: chapter_number(os.path.basename(path)),
+        )
+        if not chapter_files:
+            raise FileNotFoundError(f"No chapters found in {folder_path}")
+
+        start = time.perf_counter()
+        tags, last_book_number = self.book_tags(chapter_files, audiobook_data)
+        temp_path = f"{output_path}.joining"
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+
+        with TRACER.span("join", book=title) as span:
+            # - Walk every chapter's frames first, since the tag needs all the chapter times
+            sources, chapters, skipped = [], [], []
+            position_ms = 0.0
+            for file_path in chapter_files:
+                with _mapped(file_path) as (_, source_map):
+                    scan = scan_audio(source_map)
+                if scan is None or scan.frames == 0:
+                    skipped.append(file_path)
+                    continue
+                sources.append((file_path, scan))
+                chapter_title = build_tags(os.path.basename(file_path), audiobook_data, last_book_number)["TIT2"]
+                end_ms = position_ms + scan.seconds * 1000
+                chapters.append((chapter_title, round(position_ms), round(end_ms)))
+                position_ms = end_ms
+
+            if not chapters:
+                raise ValueError(f"None of the chapters in {folder_path} have MPEG audio")
+
+            frames = [encode_text_frame(frame_id, text) for frame_id, text in tags.items()]
+            frames += chapter_frames(chapters, title)
+            tag = render_tag(frames)
+
+            # - Write the tag, then copy each chapter's frames straight after it
+            target_fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o644)
+            try:
+                try:
+                    os.write(target_fd, tag)
+                    for file_path, scan in sources:
+                        with _mapped(file_path) as (source_fd, source_map):
+                            _copy_range(source_fd, target_fd, source_map, scan.start, scan.end)
+                        span.bytes += scan.end - scan.start
+                finally:
+                    os.close(target_fd)
+                os.replace(temp_path, output_path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+
+        elapsed = time.perf_counter() - start
+        for file_path in skipped:
+            print(f"Left {file_path} out of the joined book, it has no MPEG audio")
+        print(
+            f"Joined {len(chapters)} chapter(s) of '{title}' ({span.bytes / 1e6:.1f} MB, "
+            f"{position_ms / 3.6e6:.2f}h of audio) in {elapsed:.2f}s, {span.bytes / elapsed / 1e6 if elapsed else 0:.0f} MB/s"
+        )
+        return {
+            "chapters": len(chapters),
+            "bytes": span.bytes,
+            "seconds": position_ms / 1000,
+            "elapsed": elapsed,
+            "skipped": skipped,
+        }
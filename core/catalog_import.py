@@ -0,0 +1,104 @@
+import csv
+import json
+import os
+import time
+
+# The fields every catalog row provides, in the order the database expects them
+FIELDS = ("title", "author", "series_name", "book_number", "url", "user")
+REQUIRED_FIELDS = ("title", "author", "url", "user")
+
+
+class CatalogError(Exception):
+    """Raised when a catalog file can't be read at all, e.g. an unknown format or missing columns."""
+
+
+def _to_row(record: dict):
+    """Turns a catalog record into an audiobook tuple, or None if a required field is missing."""
+    values = {field: record.get(field) for field in FIELDS}
+    for field in FIELDS:
+        if isinstance(values[field], str):
+            values[field] = values[field].strip() or None
+    if any(values[field] is None for field in REQUIRED_FIELDS):
+        return None
+    if values["book_number"] is not None:
+        try:
+            values["book_number"] = int(values["book_number"])
+        except (TypeError, ValueError):
+            return None
+    return tuple(values[field] for field in FIELDS)
+
+
+def _read_csv(file):
+    reader = csv.DictReader(file)
+    missing = [field for field in REQUIRED_FIELDS if field not in (reader.fieldnames or ())]
+    if missing:
+        raise CatalogError(f"CSV header is missing column(s): {', '.join(missing)}")
+    yield from reader
+
+
+def _read_jsonl(file):
+    for line in file:
+        if line.strip():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield record if isinstance(record, dict) else {}
+
+
+class CatalogImporter:
+    """Streams a CSV or JSONL catalog of books into the database.
+
+    Rows are read one at a time and handed to ``SQLiteDB.import_audiobooks`` as a
+    generator, so memory use doesn't grow with the size of the catalog. CSV files
+    need a header row; JSONL files have one JSON object per line. Both use the
+    field names in ``FIELDS``, and ``series_name`` and ``book_number`` are optional.
+    """
+
+    def __init__(self, db, batch_size=5000) -> None:
+        self.db = db
+        self.batch_size = batch_size
+        self.invalid = 0
+
+    def rows(self, file_path: str):
+        """Yields the valid audiobook tuples in a catalog, counting the invalid rows it skips."""
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension == ".csv":
+            reader = _read_csv
+        elif extension in (".jsonl", ".ndjson"):
+            reader = _read_jsonl
+        else:
+            raise CatalogError(f"Unsupported catalog format: {extension or file_path}")
+
+        with open(file_path, "r", encoding="utf-8-sig", newline="") as file:
+            for record in reader(file):
+                row = _to_row(record)
+                if row is None:
+                    self.invalid += 1
+                else:
+                    yield row
+
+    def run(self, file_path: str) -> dict:
+        """
+        Imports a catalog file and prints how it went.
+
+        Returns:
+            dict: ``staged``, ``inserted``, ``skipped`` and ``invalid`` row counts,
+            plus ``seconds`` and ``rows_per_second``.
+        """
+        self.invalid = 0
+        start = time.perf_counter()
+        counts = self.db.import_audiobooks(self.rows(file_path), batch_size=self.batch_size)
+        seconds = time.perf_counter() - start
+
+        total = counts["staged"] + self.invalid
+        counts.update(
+            invalid=self.invalid,
+            seconds=seconds,
+            rows_per_second=total / seconds if seconds else 0.0,
+        )
+        print(
+            f"Imported {counts['inserted']} new book(s), skipped {counts['skipped']} duplicate(s) "
+            f"and {counts['invalid']} invalid row(s) in {seconds:.2f}s ({counts['rows_per_second']:.0f} rows/s)"
+        )
+        return counts
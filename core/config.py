@@ -1,7 +1,7 @@
 import os
 import sys
 
-from dotenv import load_dotenv, get_key
+from dotenv import dotenv_values
 
 
 class Settings:
@@ -9,15 +9,65 @@ class Settings:
         self._base_path = self._get_base_path()  # Get base path immediately
 
         self.dotenv_file = os.path.join(self._base_path, ".env")
-        load_dotenv(self.dotenv_file)
+        # - The .env file is parsed once; every setting below is read from these values.
+        self._values = dotenv_values(self.dotenv_file)
+        for key, value in self._values.items():
+            if value is not None:
+                os.environ.setdefault(key, value)  # Same as load_dotenv: the real environment wins
 
-        self.DRIVER_PATH = get_key(self.dotenv_file, "DRIVER_PATH")
-        self.DRIVER_BASE_PATH = get_key(self.dotenv_file, "DRIVER_BASE_PATH")
-        self.DEFAULT_PATH = get_key(self.dotenv_file, "DOWNLOAD_PATH")
+        self.DRIVER_PATH = self._get("DRIVER_PATH")
+        self.DRIVER_BASE_PATH = self._get("DRIVER_BASE_PATH")
+        self.DEFAULT_PATH = self._get("DOWNLOAD_PATH")
+
+        # - "http" streams chapters directly, "gui" uses the browser's "Save As" dialog.
+        self.DOWNLOAD_MODE = self._get("DOWNLOAD_MODE") or "http"
+
+        # - How Chrome reads chapter URLs: "dom" reads the player's src after each click, "network" captures
+        #   its requests instead and falls back to "dom" when the capture fails.
+        self.SCRAPE_MODE = self._get("SCRAPE_MODE") or "dom"
+
+        # - Concurrency limits for the download pipeline.
+        self.BOOKS_IN_FLIGHT = self._get_int("BOOKS_IN_FLIGHT", 2)
+        self.PER_HOST_CONNECTIONS = self._get_int("PER_HOST_CONNECTIONS", 4)
+        self.CHAPTER_CONCURRENCY = self._get_int("CHAPTER_CONCURRENCY", 4)
+
+        # - Block images, fonts and media in the pooled headless Chrome sessions.
+        self.BLOCK_RESOURCES = (self._get("BLOCK_RESOURCES") or "true").lower() == "true"
+
+        # - Where run reports (JSON) and Prometheus metrics are written.
+        self.METRICS_DIR = self._get("METRICS_DIR") or self.resource_path("metrics")
+
+        # - Write each chapter's ID3 tags while it downloads, instead of in a separate tagging pass
+        self.TAG_ON_DOWNLOAD = (self._get("TAG_ON_DOWNLOAD") or "true").lower() == "true"
+
+        # - Set when processes on more than one machine open the database, e.g. over a network drive.
+        #   It then uses SQLite's rollback journal, since WAL mode only works on a single machine.
+        self.SHARED_DATABASE = (self._get("SHARED_DATABASE") or "false").lower() == "true"
+
+        # - Finished chapters by the checksum of their audio. It has to be on the same drive as the libraries, since
+        #   chapters are only stored as hard links. Leave unset to turn the store off.
+        self.CONTENT_STORE_DIR = self._get("CONTENT_STORE_DIR") or None
+
+        # - Where books are joined into a single chaptered MP3 after downloading. Leave unset to skip joining.
+        self.JOINED_BOOKS_DIR = self._get("JOINED_BOOKS_DIR") or None
+
+        # - Known-good ChromeDriver versions manifest. Point it at a local copy to test updates offline.
+        self.CHROMEDRIVER_MANIFEST_URL = self._get("CHROMEDRIVER_MANIFEST_URL") or \
+            "https://googlechromelabs.github.io/chrome-for-testing/known-good-versions-with-downloads.json"
 
         # - Replace these with the base path(s) for your user(s).
-        self.ALICIA = get_key(self.dotenv_file, "ALICIA_BASE_PATH")
-        self.JACKSON = get_key(self.dotenv_file, "JACKSON_BASE_PATH")
+        self.ALICIA = self._get("ALICIA_BASE_PATH")
+        self.JACKSON = self._get("JACKSON_BASE_PATH")
+
+    def _get(self, key, default=None):
+        """Returns a setting from the .env file, or the default if it isn't set"""
+        value = self._values.get(key)
+        return value if value is not None else default
+
+    def _get_int(self, key, default) -> int:
+        """Returns an integer setting from the .env file, or the default if it isn't set"""
+        value = self._get(key)
+        return int(value) if value else default
 
     def _get_base_path(self):
         """Get absolute path to resource, works for dev and for PyInstaller"""
@@ -0,0 +1,114 @@
+import os
+import shutil
+
+from core.downloader import file_checksum
+from core.id3_writer import HEADER_SIZE, merge_tag, tag_size
+from core.metrics import TRACER
+
+
+class ContentStore:
+    """Keeps one copy of every finished chapter, addressed by the SHA-256 of its audio.
+
+    The key is the audio checksum from ``ChapterChecksums``, which leaves out the
+    ID3v2 tag, so the same chapter is found again whatever tag each copy carries.
+    Chapters land in the store as hard links to the downloaded file, so the
+    store itself costs no extra space. Any later chapter with the same content
+    (a re-run, a duplicate listing or the same book for another user) is then
+    hard-linked from the store when it takes the same tags, and written from the
+    stored audio behind its own tag when it doesn't, instead of being fetched again.
+    Chapters are only stored as hard links: when the store is on a different
+    drive than the library they aren't stored at all, rather than written twice.
+    A chapter placed from the store into a library on another drive is copied,
+    which still saves the download.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def path_for(self, audio_checksum: str) -> str:
+        # - Fan out on the first two hex digits so no folder gets too big
+        return os.path.join(self.root, audio_checksum[:2], f"{audio_checksum}.mp3")
+
+    def has(self, audio_checksum) -> bool:
+        """True if the store holds a chapter with this audio."""
+        return bool(audio_checksum) and os.path.isfile(self.path_for(audio_checksum))
+
+    def add(self, file_path: str, audio_checksum: str, checksum: str) -> bool:
+        """Records a finished file under its audio checksum.
+
+        If the stored copy is byte for byte the same file (``checksum`` is the whole
+        file's), ``file_path`` is replaced with a link to it, so duplicates downloaded
+        at the same time end up sharing one copy. A copy with another tag is left alone.
+
+        Returns:
+            bool: True if the audio was already in the store.
+        """
+        blob_path = self.path_for(audio_checksum)
+        if self.has(audio_checksum):
+            if not _same_file(blob_path, file_path) and os.path.getsize(blob_path) == os.path.getsize(file_path) \
+                    and file_checksum(blob_path) == checksum:
+                self.link_to(audio_checksum, file_path)
+            return True
+
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        try:
+            _link(file_path, blob_path)
+        except OSError:
+            pass  # Another drive, a copy would store the chapter twice
+        return False
+
+    def link_to(self, audio_checksum: str, target_path: str) -> int:
+        """Places the stored content at ``target_path`` and returns its size in bytes."""
+        with TRACER.span("store_link") as span:
+            blob_path = self.path_for(audio_checksum)
+            _link_or_copy(blob_path, target_path)
+            span.bytes = os.path.getsize(target_path)
+        return span.bytes
+
+    def copy_with_tags(self, audio_checksum: str, target_path: str, tags: dict) -> int:
+        """Writes the stored audio to ``target_path`` behind a tag with ``tags`` and returns its size in bytes.
+
+        Used when the stored copy carries another chapter's tags, so the new file
+        is written once, already tagged, instead of linked and then rewritten.
+        """
+        with TRACER.span("store_copy") as span:
+            temp_path = f"{target_path}.linking"
+            with open(self.path_for(audio_checksum), "rb") as source, open(temp_path, "wb") as target:
+                size = tag_size(source.read(HEADER_SIZE))
+                source.seek(0)
+                stored_tag = source.read(size)  # Leaves the file at the start of the audio
+                target.write(merge_tag(stored_tag, tags))
+                shutil.copyfileobj(source, target, 1024 * 1024)
+                span.bytes = target.tell()
+            os.replace(temp_path, target_path)
+        return span.bytes
+
+
+def _same_file(first: str, second: str) -> bool:
+    try:
+        return os.path.samefile(first, second)
+    except OSError:
+        return False
+
+
+def _link(source: str, target: str) -> None:
+    """Hard-links ``source`` to ``target``.
+
+    The link is made under a temporary name and renamed into place, so ``target``
+    only ever appears complete and an existing file there is replaced.
+    """
+    temp_path = f"{target}.linking"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    os.link(source, temp_path)
+    os.replace(temp_path, target)
+
+
+def _link_or_copy(source: str, target: str) -> None:
+    """Hard-links ``source`` to ``target``, copying when the two are on different drives."""
+    try:
+        _link(source, target)
+    except OSError:
+        temp_path = f"{target}.linking"
+        shutil.copyfile(source, temp_path)
+        os.replace(temp_path, target)
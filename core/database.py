@@ -1,96 +1,713 @@
+import itertools
 import sqlite3
-import os  # Assuming you still use os.path functions  
+import os  # Assuming you still use os.path functions
+import threading
+
+from contextlib import contextmanager
 
 from core.config import PROJECT_SETTING
+from core.metrics import TRACER
+
+# - Schema migrations, applied in order. The database's PRAGMA user_version records
+#   how many have run, so only add new entries to the end of this list.
+MIGRATIONS = [
+    # 1: The original audiobooks table
+    """
+    CREATE TABLE IF NOT EXISTS audiobooks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        author TEXT NOT NULL,
+        series_name TEXT,
+        book_number INT,
+        url TEXT NOT NULL,
+        user TEXT NOT NULL,
+        downloaded BOOLEAN NOT NULL DEFAULT 0,  -- Default to not downloaded
+        edited BOOLEAN NOT NULL DEFAULT 0  -- Default to not downloaded
+    );
+    """,
+    # 2: Chapter-level download progress
+    """
+    CREATE TABLE IF NOT EXISTS chapters (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        book_id INTEGER NOT NULL REFERENCES audiobooks(id),
+        chapter_index INTEGER NOT NULL,
+        url TEXT NOT NULL,
+        expected_bytes INTEGER,
+        received_bytes INTEGER NOT NULL DEFAULT 0,
+        checksum TEXT,  -- SHA-256 of the finished file
+        status TEXT NOT NULL DEFAULT 'pending',  -- pending, partial, failed or complete
+        UNIQUE (book_id, chapter_index)
+    );
+    """,
+    # 3: One row per (title, author), plus indexes for the common lookups. The kept (oldest) row
+    #    takes the downloaded/edited flags of its duplicates, so a finished book isn't fetched again.
+    #    The duplicates' chapters go first, since foreign keys are on and they reference the rows.
+    """
+    UPDATE audiobooks SET
+        downloaded = (SELECT MAX(dup.downloaded) FROM audiobooks AS dup WHERE dup.title = audiobooks.title AND dup.author = audiobooks.author),
+        edited = (SELECT MAX(dup.edited) FROM audiobooks AS dup WHERE dup.title = audiobooks.title AND dup.author = audiobooks.author)
+    WHERE id IN (SELECT MIN(id) FROM audiobooks GROUP BY title, author HAVING COUNT(*) > 1);
+    DELETE FROM chapters WHERE book_id NOT IN (SELECT MIN(id) FROM audiobooks GROUP BY title, author);
+    DELETE FROM audiobooks WHERE id NOT IN (SELECT MIN(id) FROM audiobooks GROUP BY title, author);
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_audiobooks_title_author ON audiobooks (title, author);
+    CREATE INDEX IF NOT EXISTS idx_audiobooks_downloaded ON audiobooks (downloaded);
+    CREATE INDEX IF NOT EXISTS idx_audiobooks_edited ON audiobooks (edited);
+    CREATE INDEX IF NOT EXISTS idx_audiobooks_series ON audiobooks (series_name, book_number);
+    """,
+    # 4: Library index for incremental scans and retags
+    """
+    CREATE TABLE IF NOT EXISTS library_folders (
+        path TEXT PRIMARY KEY,
+        mtime_ns INTEGER NOT NULL,
+        dirty BOOLEAN NOT NULL DEFAULT 1,  -- Changed since it was last retagged or validated
+        scanned_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS library_files (
+        path TEXT PRIMARY KEY,
+        folder TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        tag_fingerprint TEXT  -- SHA-1 of the raw ID3v2 tag, empty if the file has none
+    );
+    CREATE INDEX IF NOT EXISTS idx_library_files_folder ON library_files (folder);
+    """,
+    # 5: Look up finished chapters by URL, so content that's already stored isn't fetched again
+    """
+    CREATE INDEX IF NOT EXISTS idx_chapters_url ON chapters (url, status);
+    """,
+    # 6: Job queue shared by worker processes
+    """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        book_id INTEGER NOT NULL REFERENCES audiobooks(id),
+        kind TEXT NOT NULL,  -- download or tag
+        status TEXT NOT NULL DEFAULT 'queued',  -- queued, leased, done or dead
+        attempts INTEGER NOT NULL DEFAULT 0,
+        available_at REAL NOT NULL DEFAULT 0,  -- Not claimed before this time, for retry backoff
+        lease_owner TEXT,
+        lease_expires_at REAL,
+        last_error TEXT,
+        updated_at REAL,
+        UNIQUE (book_id, kind)
+    );
+    CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (kind, status, available_at);
+    """,
+    # 7: Audio checks. The duration is measured when a chapter is downloaded and compared on later checks.
+    """
+    ALTER TABLE chapters ADD COLUMN duration_seconds REAL;
+    ALTER TABLE chapters ADD COLUMN validated_at REAL;
+    """,
+    # 8: The tag fingerprint each file had when its folder last validated clean
+    """
+    ALTER TABLE library_files ADD COLUMN validated_fingerprint TEXT;
+    """,
+    # 9: SHA-256 of each chapter's audio without its ID3 tag, the content store's key. The
+    #    checksum column keeps the whole file's, for verification.
+    """
+    ALTER TABLE chapters ADD COLUMN audio_checksum TEXT;
+    """,
+]
+
+# - Rows a migration is about to remove, counted just before it runs so the removal can be reported
+MIGRATION_REMOVALS = {
+    3: ("duplicate audiobook row(s)",
+        "SELECT COUNT(*) FROM audiobooks WHERE id NOT IN (SELECT MIN(id) FROM audiobooks GROUP BY title, author)"),
+}
+
+# - The audiobook flag each job kind sets once it succeeds, and the flags a book needs before it's queued
+JOB_KINDS = {
+    "download": ("downloaded", "downloaded = 0"),
+    "tag": ("edited", "downloaded = 1 AND edited = 0"),
+}
+
+# - The audiobooks columns, in the order rows are read. Also the only names queries may filter on.
+AUDIOBOOK_COLUMNS = ("id", "title", "author", "series_name", "book_number", "url", "user", "downloaded", "edited")
+# - The flags mark_audiobook_bool may set
+AUDIOBOOK_FLAGS = ("downloaded", "edited")
+# - The chapters columns get_chapters reads, in order
+CHAPTER_COLUMNS = ("id", "book_id", "chapter_index", "url", "expected_bytes", "received_bytes", "checksum", "status")
+
+
+class Record:
+    """A row read by column name (``book.title``), with the columns as its ``__slots__``.
+
+    It can still be indexed and unpacked like the tuple rows it replaces, so
+    ``book[1]`` and ``book.title`` are the same value.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self)[index]
+        return getattr(self, self.__slots__[index])
+
+    def __iter__(self):
+        return (getattr(self, column) for column in self.__slots__)
+
+    def __len__(self) -> int:
+        return len(self.__slots__)
+
+    def __eq__(self, other):
+        if isinstance(other, (Record, tuple)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(tuple(self))
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{column}={getattr(self, column)!r}" for column in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class AudiobookRecord(Record):
+    """One audiobooks row."""
+
+    __slots__ = AUDIOBOOK_COLUMNS
+
+    def __init__(self, id, title, author, series_name, book_number, url, user, downloaded, edited) -> None:
+        self.id = id
+        self.title = title
+        self.author = author
+        self.series_name = series_name
+        self.book_number = book_number
+        self.url = url
+        self.user = user
+        self.downloaded = downloaded
+        self.edited = edited
+
+
+class ChapterRecord(Record):
+    """One chapters row, as ``get_chapters`` reads it."""
+
+    __slots__ = CHAPTER_COLUMNS
+
+    def __init__(self, id, book_id, chapter_index, url, expected_bytes, received_bytes, checksum, status) -> None:
+        self.id = id
+        self.book_id = book_id
+        self.chapter_index = chapter_index
+        self.url = url
+        self.expected_bytes = expected_bytes
+        self.received_bytes = received_bytes
+        self.checksum = checksum
+        self.status = status
+
+
+def _audiobook_record(cursor, row):
+    """A ``row_factory`` that builds records straight from the cursor, with no intermediate tuple list."""
+    return AudiobookRecord(*row)
+
+
+def _chapter_record(cursor, row):
+    return ChapterRecord(*row)
+
+
+def _check_column(column_name: str, allowed) -> str:
+    """Returns ``column_name`` if it's one of ``allowed``, since it's put into the SQL text itself."""
+    if column_name not in allowed:
+        raise ValueError(f"Unknown audiobooks column {column_name!r}, expected one of: {', '.join(allowed)}")
+    return column_name
+
+
+# - Applied to every new connection, after the journal pragmas below.
+PRAGMAS = (
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",  # 16 MB page cache
+    "PRAGMA busy_timeout = 5000",  # Wait for other processes instead of failing straight away
+)
+
+# - WAL needs shared memory between every connection, so it only works when all of them run on
+#   one machine. A database shared over a network drive uses the rollback journal instead.
+LOCAL_JOURNAL_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",  # Readers don't block the writer
+    "PRAGMA synchronous = NORMAL",  # Safe with WAL, and avoids an fsync per commit
+)
+SHARED_JOURNAL_PRAGMAS = (
+    "PRAGMA journal_mode = DELETE",  # Locks the database file itself, which other machines can see
+    "PRAGMA synchronous = FULL",
+)
 
 class SQLiteDB:
 
-    def __init__(self, db_path="core/audio_downloads.sql") -> None:
+    def __init__(self, db_path="core/audio_downloads.sql", shared=None) -> None:
+        """
+        Args:
+            db_path (str): The database file, relative to the project or absolute.
+            shared (bool): Whether processes on other machines open the same file. Defaults to
+                the SHARED_DATABASE setting.
+        """
         self.db_path = os.path.join(PROJECT_SETTING._base_path, db_path)
+        self.shared = PROJECT_SETTING.SHARED_DATABASE if shared is None else shared
         self.conn = None
+        # Serialises access to the shared connection so download threads can use one instance
+        self._lock = threading.RLock()
 
     def connect(self) -> None:
-        if self.conn is None:
-            self.conn = sqlite3.connect(self.db_path)
+        """Opens the long-lived connection the first time it's needed."""
+        with self._lock:
+            if self.conn is None:
+                self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                journal = SHARED_JOURNAL_PRAGMAS if self.shared else LOCAL_JOURNAL_PRAGMAS
+                for pragma in journal + PRAGMAS:
+                    self.conn.execute(pragma)
 
     def disconnect(self) -> None:
-        if self.conn is not None:
-            self.conn.commit()
-            self.conn.close()
-            self.conn = None
+        with self._lock:
+            if self.conn is not None:
+                self.conn.commit()
+                self.conn.close()
+                self.conn = None
+
+    @contextmanager
+    def _cursor(self, operation: str):
+        """Yields a cursor on the shared connection and commits when the block succeeds."""
+        with TRACER.span(f"db.{operation}"), self._lock:
+            self.connect()
+            cursor = self.conn.cursor()
+            try:
+                yield cursor
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def migrate(self) -> int:
+        """Applies any migrations the database hasn't seen yet and returns the schema version."""
+        with self._cursor("migrate") as cursor:
+            version = cursor.execute("PRAGMA user_version").fetchone()[0]
+            for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+                removal = MIGRATION_REMOVALS.get(number)
+                removed = cursor.execute(removal[1]).fetchone()[0] if removal else 0
+                # executescript commits first, so each migration runs in its own transaction
+                cursor.executescript(f"BEGIN; {migration} PRAGMA user_version = {number}; COMMIT;")
+                if removed:
+                    print(f"Migration {number} removed {removed} {removal[0]}")
+            return len(MIGRATIONS)
 
     def create_audiobook_table(self) -> None:
-        self.connect()
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS audiobooks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                author TEXT NOT NULL,
-                series_name TEXT,
-                book_number INT,
-                url TEXT NOT NULL,
-                user TEXT NOT NULL,
-                downloaded BOOLEAN NOT NULL DEFAULT 0,  -- Default to not downloaded
-                edited BOOLEAN NOT NULL DEFAULT 0  -- Default to not downloaded
-            )
-        """)
-        self.disconnect()
-
-    def add_audiobook(self, title, author, url, user) -> None:
-        self.connect()
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO audiobooks (title, author, series_name, book_number, url, user, downloaded, edited) VALUES (?, ?, ?, ?, ?, ?, 0, 0)
-        """, (title, author, url, user))
-        self.disconnect()
-
-    def add_audiobooks(self, audiobooks) -> None:
+        self.migrate()
+
+    def create_chapter_table(self) -> None:
+        self.migrate()
+
+    def add_audiobook(self, title, author, url, user, series_name=None, book_number=None) -> None:
+        with self._cursor("add_audiobook") as cursor:
+            cursor.execute("""
+                INSERT INTO audiobooks (title, author, series_name, book_number, url, user, downloaded, edited) VALUES (?, ?, ?, ?, ?, ?, 0, 0)
+                ON CONFLICT (title, author) DO NOTHING
+            """, (title, author, series_name, book_number, url, user))
+
+    def add_audiobooks(self, audiobooks) -> int:
         """Inserts multiple audiobook records into the database efficiently.
 
+        Books whose title and author are already in the database are skipped.
+
+        Args:
+            audiobooks (list): A list of tuples where each tuple represents an audiobook
+                               (title, author, series_name, book_number, url, user)
+
+        Returns:
+            int: The number of audiobooks that were inserted.
+        """
+        with self._cursor("add_audiobooks") as cursor:
+            cursor.executemany("""
+                INSERT INTO audiobooks (title, author, series_name, book_number, url, user, downloaded, edited) VALUES (?, ?, ?, ?, ?, ?, 0, 0)
+                ON CONFLICT (title, author) DO NOTHING
+            """, audiobooks)
+            return cursor.rowcount
+
+    def import_audiobooks(self, audiobooks, batch_size=5000) -> dict:
+        """Bulk-imports a stream of audiobooks, skipping ones that are already in the database.
+
+        Rows are loaded into a temporary staging table in batches, then added to
+        ``audiobooks`` with one set-based insert that drops repeats within the
+        import and books whose title and author already exist. Everything happens
+        in a single transaction, so a failed import leaves the database untouched.
+
         Args:
-            audiobooks (list): A list of tuples where each tuple represents an audiobook 
-                               (title, author, series_name, book_number, url, user, downloaded, edited)
+            audiobooks (iterable): Tuples of (title, author, series_name, book_number, url, user).
+                Any iterable works; it is read ``batch_size`` rows at a time.
+
+        Returns:
+            dict: ``staged``, ``inserted`` and ``skipped`` row counts.
         """
-        self.connect()
-        cursor = self.conn.cursor()
-        cursor.executemany("""
-            INSERT INTO audiobooks (title, author, series_name, book_number, url, user, downloaded, edited) VALUES (?, ?, ?, ?, ?, ?, 0, 0)
-        """, audiobooks)
-        self.disconnect()
-
-    def get_audiobooks(self, column_name, value):  # More flexible parameters
-        self.connect()
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT id, title, author, series_name, book_number, url, user, downloaded, edited 
-            FROM audiobooks 
-            WHERE {} = ?
-        """.format(column_name), (value,)) 
-        results = cursor.fetchall()
-        self.disconnect()
-        return results
-    
+        audiobooks = iter(audiobooks)
+        with self._cursor("import_audiobooks") as cursor:
+            cursor.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS audiobook_staging (
+                    title TEXT NOT NULL,
+                    author TEXT NOT NULL,
+                    series_name TEXT,
+                    book_number INT,
+                    url TEXT NOT NULL,
+                    user TEXT NOT NULL
+                )
+            """)
+            cursor.execute("BEGIN")
+            cursor.execute("DELETE FROM audiobook_staging")
+
+            staged = 0
+            while True:
+                batch = list(itertools.islice(audiobooks, batch_size))
+                if not batch:
+                    break
+                cursor.executemany("""
+                    INSERT INTO audiobook_staging (title, author, series_name, book_number, url, user) VALUES (?, ?, ?, ?, ?, ?)
+                """, batch)
+                staged += len(batch)
+
+            # The first row wins when a title and author appear more than once in the import
+            cursor.execute("""
+                INSERT INTO audiobooks (title, author, series_name, book_number, url, user, downloaded, edited)
+                SELECT staging.title, staging.author, staging.series_name, staging.book_number, staging.url, staging.user, 0, 0
+                FROM audiobook_staging AS staging
+                JOIN (SELECT MIN(rowid) AS first_row FROM audiobook_staging GROUP BY title, author) AS firsts
+                    ON firsts.first_row = staging.rowid
+                LEFT JOIN audiobooks AS existing
+                    ON existing.title = staging.title AND existing.author = staging.author
+                WHERE existing.id IS NULL
+                ORDER BY staging.rowid
+            """)
+            inserted = cursor.rowcount
+            cursor.execute("DELETE FROM audiobook_staging")
+        return {"staged": staged, "inserted": inserted, "skipped": staged - inserted}
+
+    def get_audiobooks(self, column_name, value) -> list:
+        """Returns every audiobook whose ``column_name`` equals ``value``, as AudiobookRecords.
+
+        Meant for lookups that match a few rows. Use ``iter_audiobooks`` to work through large result sets.
+        """
+        _check_column(column_name, AUDIOBOOK_COLUMNS)
+        with self._cursor("get_audiobooks") as cursor:
+            cursor.row_factory = _audiobook_record
+            cursor.execute(f"""
+                SELECT {', '.join(AUDIOBOOK_COLUMNS)}
+                FROM audiobooks
+                WHERE {column_name} = ?
+            """, (value,))
+            return cursor.fetchall()
+
+    def iter_audiobooks(self, column_name=None, value=None, page_size=1000):
+        """
+        Yields the matching audiobooks in id order, a page at a time.
+
+        Each page is a separate keyset query (``id > last id seen``), and the
+        connection is only held while a page is read. Memory stays flat however
+        many rows match, other threads can use the database between pages, and
+        rows the caller updates along the way don't shift the pages still to come.
+
+        Args:
+            column_name (str): The column to filter on, or None for every audiobook.
+            value: The value ``column_name`` must equal.
+            page_size (int): Rows read per query.
+        """
+        where = f"{_check_column(column_name, AUDIOBOOK_COLUMNS)} = ? AND " if column_name else ""
+        params = (value,) if column_name else ()
+        last_id = 0
+        while True:
+            with self._cursor("iter_audiobooks") as cursor:
+                cursor.row_factory = _audiobook_record
+                cursor.execute(f"""
+                    SELECT {', '.join(AUDIOBOOK_COLUMNS)}
+                    FROM audiobooks
+                    WHERE {where}id > ?
+                    ORDER BY id
+                    LIMIT ?
+                """, params + (last_id, page_size))
+                page = cursor.fetchall()
+            yield from page
+            if len(page) < page_size:
+                return
+            last_id = page[-1].id
+
     def get_last_book_number_in_series(self, series_name):
-        self.connect()
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT MAX(book_number)
-            FROM audiobooks
-            WHERE series_name = (?)
-        """, (series_name,))
-        result = cursor.fetchone()
-        self.disconnect()
+        with self._cursor("get_last_book_number_in_series") as cursor:
+            cursor.execute("""
+                SELECT MAX(book_number)
+                FROM audiobooks
+                WHERE series_name = (?)
+            """, (series_name,))
+            result = cursor.fetchone()
         if result and result[0] is not None:
             return result[0]
         else:
             return None
 
-    # - bool_check value can either be 'downloaded' or 'edited'
+    # - column_name can either be 'downloaded' or 'edited'
     def mark_audiobook_bool(self, column_name: str, audiobook_id:int) -> None:
-        self.connect()
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            UPDATE audiobooks SET {} = 1 WHERE id = ?
-        """.format(column_name), (audiobook_id,))
-        self.disconnect()
\ No newline at end of file
+        _check_column(column_name, AUDIOBOOK_FLAGS)
+        with self._cursor("mark_audiobook_bool") as cursor:
+            cursor.execute(f"""
+                UPDATE audiobooks SET {column_name} = 1 WHERE id = ?
+            """, (audiobook_id,))
+
+    def add_chapters(self, book_id: int, urls: list) -> None:
+        """Records a book's scraped chapter URLs. Chapters that are already known are left alone."""
+        with self._cursor("add_chapters") as cursor:
+            cursor.executemany("""
+                INSERT OR IGNORE INTO chapters (book_id, chapter_index, url) VALUES (?, ?, ?)
+            """, [(book_id, index, url) for index, url in enumerate(urls)])
+
+    def get_chapters(self, book_id: int) -> list:
+        """Returns a book's chapters as ChapterRecords, in playlist order."""
+        with self._cursor("get_chapters") as cursor:
+            cursor.row_factory = _chapter_record
+            cursor.execute(f"""
+                SELECT {', '.join(CHAPTER_COLUMNS)}
+                FROM chapters
+                WHERE book_id = ?
+                ORDER BY chapter_index
+            """, (book_id,))
+            return cursor.fetchall()
+
+    def replace_chapter_urls(self, book_id: int, urls: list) -> int:
+        """
+        Swaps in freshly scraped URLs for the chapters that haven't finished, e.g. after signed links expired.
+
+        Returns:
+            int: How many chapter URLs changed. Nothing changes if ``urls`` doesn't have one URL per chapter.
+        """
+        with self._cursor("replace_chapter_urls") as cursor:
+            count = cursor.execute("SELECT COUNT(*) FROM chapters WHERE book_id = ?", (book_id,)).fetchone()[0]
+            if count != len(urls):
+                return 0
+            cursor.executemany("""
+                UPDATE chapters SET url = ?
+                WHERE book_id = ? AND chapter_index = ? AND status != 'complete' AND url != ?
+            """, [(url, book_id, index, url) for index, url in enumerate(urls)])
+            return cursor.rowcount
+
+    def update_chapter(self, chapter_id: int, status: str, received_bytes: int, expected_bytes=None, checksum=None,
+                       duration_seconds=None, audio_checksum=None) -> None:
+        with self._cursor("update_chapter") as cursor:
+            cursor.execute("""
+                UPDATE chapters
+                SET status = ?, received_bytes = ?, expected_bytes = COALESCE(?, expected_bytes), checksum = ?,
+                    duration_seconds = ?, audio_checksum = ?
+                WHERE id = ?
+            """, (status, received_bytes, expected_bytes, checksum, duration_seconds, audio_checksum, chapter_id))
+
+    def get_chapters_to_validate(self, book_id=None):
+        """Returns (chapter_id, book_id, chapter_index, expected_bytes, duration_seconds, title, user) for every
+        complete chapter, or only those of ``book_id``."""
+        with self._cursor("get_chapters_to_validate") as cursor:
+            cursor.execute("""
+                SELECT chapters.id, chapters.book_id, chapters.chapter_index, chapters.expected_bytes,
+                       chapters.duration_seconds, audiobooks.title, audiobooks.user
+                FROM chapters
+                JOIN audiobooks ON audiobooks.id = chapters.book_id
+                WHERE chapters.status = 'complete' AND (? IS NULL OR chapters.book_id = ?)
+                ORDER BY chapters.book_id, chapters.chapter_index
+            """, (book_id, book_id))
+            return cursor.fetchall()
+
+    def set_chapters_validated(self, results, validated_at: float) -> None:
+        """Records checks that passed. ``results`` holds (chapter_id, duration_seconds) pairs."""
+        with self._cursor("set_chapters_validated") as cursor:
+            cursor.executemany("""
+                UPDATE chapters SET duration_seconds = COALESCE(duration_seconds, ?), validated_at = ? WHERE id = ?
+            """, [(duration, validated_at, chapter_id) for chapter_id, duration in results])
+
+    def mark_chapters_for_redownload(self, chapter_ids) -> None:
+        """Resets bad chapters, and their books, so the next download run fetches them again and retags the book."""
+        chapter_ids = list(chapter_ids)
+        with self._cursor("mark_chapters_for_redownload") as cursor:
+            cursor.executemany("""
+                UPDATE chapters
+                SET status = 'failed', received_bytes = 0, checksum = NULL, audio_checksum = NULL, duration_seconds = NULL
+                WHERE id = ?
+            """, [(chapter_id,) for chapter_id in chapter_ids])
+            cursor.executemany("""
+                UPDATE audiobooks SET downloaded = 0, edited = 0 WHERE id = (SELECT book_id FROM chapters WHERE id = ?)
+            """, [(chapter_id,) for chapter_id in chapter_ids])
+
+    def find_chapter_content(self, url: str):
+        """Returns the audio checksum of any finished chapter downloaded from ``url``, or None."""
+        with self._cursor("find_chapter_content") as cursor:
+            cursor.execute("""
+                SELECT audio_checksum
+                FROM chapters
+                WHERE url = ? AND status = 'complete' AND audio_checksum IS NOT NULL
+                LIMIT 1
+            """, (url,))
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    def all_chapters_verified(self, book_id: int) -> bool:
+        """True once a book has chapters and every one of them finished with a matching size."""
+        with self._cursor("all_chapters_verified") as cursor:
+            cursor.execute("""
+                SELECT COUNT(*), SUM(status = 'complete' AND received_bytes = expected_bytes AND checksum IS NOT NULL)
+                FROM chapters
+                WHERE book_id = ?
+            """, (book_id,))
+            total, verified = cursor.fetchone()
+        return total > 0 and total == verified
+
+
+    def get_status(self) -> dict:
+        """Returns book counts and chapter counts/bytes by status, for a quick overview of the library."""
+        with self._cursor("get_status") as cursor:
+            total, downloaded, edited = cursor.execute("""
+                SELECT COUNT(*), COALESCE(SUM(downloaded), 0), COALESCE(SUM(edited), 0) FROM audiobooks
+            """).fetchone()
+            chapters = {
+                status: (count, received_bytes)
+                for status, count, received_bytes in cursor.execute("""
+                    SELECT status, COUNT(*), COALESCE(SUM(received_bytes), 0) FROM chapters GROUP BY status
+                """)
+            }
+        return {"books": total, "downloaded": downloaded, "edited": edited, "chapters": chapters}
+
+
+    # - Job queue. Claims and lease updates are single statements, so they are atomic across processes.
+    def enqueue_jobs(self, kind: str, now: float) -> int:
+        """Queues a job for every book that still needs ``kind`` done and doesn't have one yet."""
+        _, pending = JOB_KINDS[kind]
+        with self._cursor("enqueue_jobs") as cursor:
+            cursor.execute(f"""
+                INSERT INTO jobs (book_id, kind, available_at, updated_at)
+                SELECT id, ?, ?, ? FROM audiobooks WHERE {pending}
+                ON CONFLICT (book_id, kind) DO UPDATE SET
+                    status = 'queued', attempts = 0, available_at = excluded.available_at,
+                    lease_owner = NULL, lease_expires_at = NULL, updated_at = excluded.updated_at
+                WHERE jobs.status = 'done'
+            """, (kind, now, now))
+            return cursor.rowcount
+
+    def claim_job(self, kind: str, owner: str, lease_seconds: float, now: float):
+        """Leases the next job that is due, or one whose lease has expired.
+
+        Returns:
+            tuple: (job_id, book_id, attempts) of the claimed job, or None if nothing is due.
+        """
+        with self._cursor("claim_job") as cursor:
+            cursor.execute("""
+                UPDATE jobs
+                SET status = 'leased', lease_owner = ?, lease_expires_at = ?, attempts = attempts + 1, updated_at = ?
+                WHERE id = (
+                    SELECT id FROM jobs
+                    WHERE kind = ? AND (
+                        (status = 'queued' AND available_at <= ?) OR (status = 'leased' AND lease_expires_at < ?)
+                    )
+                    ORDER BY available_at, id
+                    LIMIT 1
+                )
+                RETURNING id, book_id, attempts
+            """, (owner, now + lease_seconds, now, kind, now, now))
+            return cursor.fetchone()
+
+    def heartbeat_job(self, job_id: int, owner: str, lease_seconds: float, now: float) -> bool:
+        """Extends a lease. Returns False if the lease expired and another worker has taken the job."""
+        with self._cursor("heartbeat_job") as cursor:
+            cursor.execute("""
+                UPDATE jobs SET lease_expires_at = ?, updated_at = ?
+                WHERE id = ? AND lease_owner = ? AND status = 'leased'
+            """, (now + lease_seconds, now, job_id, owner))
+            return cursor.rowcount == 1
+
+    def finish_job(self, job_id: int, owner: str, status: str, now: float, error=None, available_at=None) -> bool:
+        """Ends a lease: ``done``, ``dead``, or ``queued`` again to be retried at ``available_at``."""
+        with self._cursor("finish_job") as cursor:
+            cursor.execute("""
+                UPDATE jobs
+                SET status = ?, last_error = ?, available_at = COALESCE(?, available_at),
+                    lease_owner = NULL, lease_expires_at = NULL, updated_at = ?
+                WHERE id = ? AND lease_owner = ? AND status = 'leased'
+            """, (status, error, available_at, now, job_id, owner))
+            return cursor.rowcount == 1
+
+    def requeue_dead_jobs(self, kind: str, now: float) -> int:
+        with self._cursor("requeue_dead_jobs") as cursor:
+            cursor.execute("""
+                UPDATE jobs SET status = 'queued', attempts = 0, available_at = ?, updated_at = ?
+                WHERE kind = ? AND status = 'dead'
+            """, (now, now, kind))
+            return cursor.rowcount
+
+    def get_job_counts(self) -> dict:
+        """Returns {(kind, status): count} for every job in the queue."""
+        with self._cursor("get_job_counts") as cursor:
+            cursor.execute("SELECT kind, status, COUNT(*) FROM jobs GROUP BY kind, status")
+            return {(kind, status): count for kind, status, count in cursor}
+
+
+    # - Library index. Paths are selected by prefix with a range query so the primary key index is used.
+    def _library_range(self, base_path: str):
+        prefix = os.path.join(base_path, "")
+        return base_path, prefix, prefix + "\U0010ffff"
+
+    def get_library_folders(self, base_path: str) -> dict:
+        """Returns {path: (mtime_ns, dirty)} for every indexed folder under ``base_path``."""
+        with self._cursor("get_library_folders") as cursor:
+            cursor.execute("""
+                SELECT path, mtime_ns, dirty FROM library_folders
+                WHERE path = ? OR (path >= ? AND path < ?)
+            """, self._library_range(base_path))
+            return {path: (mtime_ns, bool(dirty)) for path, mtime_ns, dirty in cursor}
+
+    def get_library_files(self, base_path: str) -> dict:
+        """Returns {path: (size, mtime_ns, tag_fingerprint)} for every indexed file under ``base_path``."""
+        with self._cursor("get_library_files") as cursor:
+            cursor.execute("""
+                SELECT path, size, mtime_ns, tag_fingerprint FROM library_files
+                WHERE path >= ? AND path < ?
+            """, self._library_range(base_path)[1:])
+            return {path: (size, mtime_ns, fingerprint) for path, size, mtime_ns, fingerprint in cursor}
+
+    def save_library_scan(self, folders, files, removed_folders, removed_files, scanned_at: float) -> None:
+        """Stores one scan's results in a single transaction.
+
+        Args:
+            folders (list): (path, mtime_ns, dirty) for every folder that was seen.
+            files (list): (path, folder, size, mtime_ns, tag_fingerprint) for new or changed files.
+            removed_folders (list): Folder paths that no longer exist.
+            removed_files (list): File paths that no longer exist.
+        """
+        with self._cursor("save_library_scan") as cursor:
+            cursor.executemany("""
+                INSERT INTO library_folders (path, mtime_ns, dirty, scanned_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (path) DO UPDATE SET
+                    mtime_ns = excluded.mtime_ns, dirty = dirty OR excluded.dirty, scanned_at = excluded.scanned_at
+            """, [(path, mtime_ns, dirty, scanned_at) for path, mtime_ns, dirty in folders])
+            cursor.executemany("""
+                INSERT INTO library_files (path, folder, size, mtime_ns, tag_fingerprint) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (path) DO UPDATE SET
+                    folder = excluded.folder, size = excluded.size, mtime_ns = excluded.mtime_ns,
+                    tag_fingerprint = excluded.tag_fingerprint
+            """, files)
+            cursor.executemany("DELETE FROM library_folders WHERE path = ?", [(path,) for path in removed_folders])
+            cursor.executemany("DELETE FROM library_files WHERE path = ?", [(path,) for path in removed_files])
+
+    def get_dirty_library_folders(self, base_path: str) -> list:
+        with self._cursor("get_dirty_library_folders") as cursor:
+            cursor.execute("""
+                SELECT path FROM library_folders
+                WHERE dirty = 1 AND (path = ? OR (path >= ? AND path < ?))
+                ORDER BY path
+            """, self._library_range(base_path))
+            return [row[0] for row in cursor]
+
+    def clear_library_folders_dirty(self, paths) -> None:
+        with self._cursor("clear_library_folders_dirty") as cursor:
+            cursor.executemany("UPDATE library_folders SET dirty = 0 WHERE path = ?", [(path,) for path in paths])
+
+    def get_validated_files(self, folder: str) -> set:
+        """Returns the paths in ``folder`` whose tag is byte for byte the one they had when it last validated clean."""
+        with self._cursor("get_validated_files") as cursor:
+            cursor.execute("""
+                SELECT path FROM library_files WHERE folder = ? AND tag_fingerprint = validated_fingerprint
+            """, (folder,))
+            return {row[0] for row in cursor}
+
+    def set_library_folders_validated(self, paths) -> None:
+        """Records the current tag fingerprints of folders that validated clean, and clears them."""
+        with self._cursor("set_library_folders_validated") as cursor:
+            cursor.executemany("""
+                UPDATE library_files SET validated_fingerprint = tag_fingerprint WHERE folder = ?
+            """, [(path,) for path in paths])
+            cursor.executemany("UPDATE library_folders SET dirty = 0 WHERE path = ?", [(path,) for path in paths])
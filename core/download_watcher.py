@@ -0,0 +1,139 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import shutil
+import sys
+import time
+
+from core.metrics import TRACER
+
+# Suffixes browsers and download tools give files that are still being written
+PARTIAL_SUFFIXES = (".crdownload", ".part", ".partial", ".download", ".tmp")
+
+# inotify event masks, from <sys/inotify.h>
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = 0o4000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+
+class _PollingNotifier:
+    """Portable fallback: simply sleeps between checks."""
+
+    def wait(self, timeout: float) -> None:
+        time.sleep(timeout)
+
+    def close(self) -> None:
+        pass
+
+
+class _InotifyNotifier:
+    """Wakes up as soon as anything in the watched directory changes (Linux only)."""
+
+    def __init__(self, path: str) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+
+    def wait(self, timeout: float) -> None:
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if readable:
+            # Drain the queued events; which file changed doesn't matter, every pending name is re-checked
+            try:
+                while os.read(self.fd, 64 * 1024):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def _make_notifier(path: str):
+    if sys.platform.startswith("linux"):
+        try:
+            return _InotifyNotifier(path)
+        except (OSError, AttributeError):
+            pass
+    return _PollingNotifier()
+
+
+def move_atomically(source: str, target: str) -> None:
+    """Moves a file so ``target`` only ever appears complete, even across drives."""
+    with TRACER.span("file_move") as span:
+        span.bytes = os.path.getsize(source)
+        try:
+            os.replace(source, target)
+        except OSError:
+            # Different file systems: copy next to the target, then rename into place
+            temp_path = f"{target}.moving"
+            shutil.copyfile(source, temp_path)
+            os.replace(temp_path, target)
+            os.remove(source)
+
+
+class DownloadWatcher:
+    """Waits for browser downloads to finish and moves them into the book folder.
+
+    A file counts as finished once it exists, no partial-download file for it is
+    left (e.g. ``.crdownload``) and its size hasn't changed for ``stable_seconds``.
+    All pending files are checked together, so many chapters can be awaited at once.
+    """
+
+    def __init__(self, watch_dir: str, stable_seconds=2.0, poll_interval=0.5) -> None:
+        self.watch_dir = watch_dir
+        self.stable_seconds = stable_seconds
+        self.poll_interval = poll_interval
+
+    def _has_partial(self, name: str) -> bool:
+        return any(os.path.exists(os.path.join(self.watch_dir, name + suffix)) for suffix in PARTIAL_SUFFIXES)
+
+    def wait_for(self, names, target_dir: str, timeout=120.0) -> dict:
+        """
+        Waits for every file name in ``names`` and moves each one into ``target_dir`` as it finishes.
+
+        Args:
+            names (iterable): File names expected in the watched directory.
+            target_dir (str): Where finished files are moved to.
+            timeout (float): Seconds to wait for all of them.
+
+        Returns:
+            dict: Each name mapped to its new path, or None if it didn't finish in time.
+        """
+        results = {name: None for name in names}
+        last_seen = {}  # name -> (size, time the size was first seen)
+        deadline = time.monotonic() + timeout
+        notifier = _make_notifier(self.watch_dir)
+
+        try:
+            while True:
+                now = time.monotonic()
+                for name in [name for name, path in results.items() if path is None]:
+                    source = os.path.join(self.watch_dir, name)
+                    if not os.path.exists(source) or self._has_partial(name):
+                        last_seen.pop(name, None)
+                        continue
+
+                    size = os.path.getsize(source)
+                    if name not in last_seen or last_seen[name][0] != size:
+                        last_seen[name] = (size, now)
+                    elif now - last_seen[name][1] >= self.stable_seconds:
+                        target = os.path.join(target_dir, name)
+                        move_atomically(source, target)
+                        results[name] = target
+
+                remaining = deadline - time.monotonic()
+                if all(results.values()) or remaining <= 0:
+                    return results
+                notifier.wait(min(self.poll_interval, remaining))
+        finally:
+            notifier.close()
@@ -0,0 +1,247 @@
+import hashlib
+import itertools
+import os
+import requests
+import threading
+
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from core.id3_writer import HEADER_SIZE, merge_tag, tag_size
+
+CHUNK_SIZE = 256 * 1024
+
+# Sent until a browser session provides its own
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+)
+
+
+def chapter_filename(index: int, title: str) -> str:
+    """Returns the file name a chapter is saved under inside the book folder."""
+    return f"Chapter {index} - {title}.mp3"
+
+
+def _content_range_total(content_range):
+    """Returns the full size from a ``Content-Range: bytes a-b/total`` header, if the server sent one."""
+    if content_range and "/" in content_range:
+        total = content_range.rsplit("/", 1)[1].strip()
+        if total.isdigit():
+            return int(total)
+    return None
+
+
+def file_checksum(file_path: str) -> str:
+    """Returns the SHA-256 hex digest of a whole file."""
+    checksum = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+class ChapterChecksums:
+    """SHA-256 of a whole chapter file, and of its audio: everything after the ID3v2 tag at the front.
+
+    The file checksum verifies the chapter on disk. The audio checksum is the same
+    for every copy of a chapter whatever tag it carries, so it keys the content store.
+    """
+
+    def __init__(self, audio_start=0) -> None:
+        self.audio_start = audio_start
+        self.position = 0
+        self.file = hashlib.sha256()
+        self.audio = hashlib.sha256()
+
+    def update(self, chunk: bytes) -> None:
+        self.file.update(chunk)
+        skip = self.audio_start - self.position
+        self.audio.update(memoryview(chunk)[skip:] if skip > 0 else chunk)
+        self.position += len(chunk)
+
+    def update_from_file(self, file_path: str) -> None:
+        with open(file_path, "rb") as file:
+            for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+                self.update(chunk)
+
+
+def _split_source_tag(chunks):
+    """
+    Reads the source's own ID3v2 tag off the front of a response body.
+
+    Returns:
+        tuple: (the tag's bytes, empty if the body doesn't start with one, and an
+               iterator over the rest of the body)
+    """
+    chunks = iter(chunks)
+    buffer = bytearray()
+    size = HEADER_SIZE
+    while len(buffer) < size:
+        chunk = next(chunks, None)
+        if chunk is None:
+            break
+        buffer += chunk
+        if size == HEADER_SIZE and len(buffer) >= HEADER_SIZE:
+            size = tag_size(buffer) or HEADER_SIZE  # Only keep reading if there is a tag
+    if buffer[:3] != b"ID3":
+        return b"", itertools.chain((bytes(buffer),), chunks)
+    return bytes(buffer[:size]), itertools.chain((bytes(buffer[size:]),), chunks)
+
+
+class HostLimiter:
+    """Caps the number of simultaneous connections made to any single host."""
+
+    def __init__(self, per_host=4) -> None:
+        self.per_host = per_host
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def for_url(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.per_host)
+            return self._semaphores[host]
+
+
+class ChapterDownloader:
+    """Streams chapter MP3s over a pooled HTTP session straight into the book folder."""
+
+    def __init__(self, pool_size=8, max_retries=3, timeout=30, limiter=None) -> None:
+        self.timeout = timeout
+        self.limiter = limiter
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+
+        # Retry connection errors and transient server errors with a short backoff
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET", "HEAD"),
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @classmethod
+    def from_driver(cls, driver, **kwargs):
+        """Creates a downloader that reuses the browser's cookies, user agent and referer.
+
+        Args:
+            driver (webdriver.Chrome): A browser session that has already loaded the book page.
+        """
+        downloader = cls(**kwargs)
+        downloader.session.headers["User-Agent"] = driver.execute_script("return navigator.userAgent;")
+        downloader.session.headers["Referer"] = driver.current_url
+        for cookie in driver.get_cookies():
+            downloader.session.cookies.set(
+                cookie["name"], cookie["value"], domain=cookie.get("domain"), path=cookie.get("path", "/")
+            )
+        return downloader
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        self.session.close()
+
+    def download_file(self, url: str, file_path: str, resume=True, tags=None):
+        """Streams a single URL to disk.
+
+        The body is written to a ``.part`` file first and only renamed once the
+        transfer is complete, so an interrupted download never looks finished.
+        If a ``.part`` file is left over from an earlier attempt, the rest of the
+        file is requested with an HTTP Range header instead of starting over.
+
+        With ``tags``, the file is tagged as it's written: the source's own ID3v2
+        tag is read off the front of the body and replaced by one with ``tags``
+        (its other frames, like cover art, are kept), then the audio streams in
+        after it. The chapter never needs a separate tagging pass.
+
+        Returns:
+            tuple: (received_bytes, expected_bytes, file checksum, audio checksum) of the finished
+                   file, both SHA-256 hex digests (see ``ChapterChecksums``).
+
+        Raises:
+            requests.RequestException: If the transfer fails or ends short of the expected size.
+        """
+        if self.limiter is not None:
+            with self.limiter.for_url(url):
+                return self._download_file(url, file_path, resume, tags)
+        return self._download_file(url, file_path, resume, tags)
+
+    def _download_file(self, url: str, file_path: str, resume: bool, tags=None):
+        part_path = f"{file_path}.part"
+        offset = os.path.getsize(part_path) if resume and os.path.exists(part_path) else 0
+
+        # The part starts with the file's tag: ours, or the source's own without ``tags``
+        part_tag_size = 0
+        if offset:
+            with open(part_path, "rb") as part:
+                part_tag_size = tag_size(part.read(HEADER_SIZE))
+            if offset < HEADER_SIZE or (tags is not None and not 0 < part_tag_size <= offset):
+                offset = part_tag_size = 0  # Too short to tell, or not a part this writes, start over
+
+        # A tagged part holds our tag and then the source's bytes that follow its own tag, so the
+        # offset on the server is shifted by the difference between the two
+        our_tag_size = source_tag_size = 0
+        if offset and tags is not None:
+            our_tag_size, source_tag_size = part_tag_size, self._source_tag_size(url)
+
+        headers = {"Range": f"bytes={offset - our_tag_size + source_tag_size}-"} if offset else {}
+
+        with self.session.get(url, stream=True, timeout=self.timeout, headers=headers) as response:
+            if response.status_code == 416:
+                # The leftover part doesn't fit the file on the server any more
+                os.remove(part_path)
+                return self._download_file(url, file_path, resume=False, tags=tags)
+            response.raise_for_status()
+
+            if offset and response.status_code == 206:
+                expected = _content_range_total(response.headers.get("Content-Range"))
+                mode = "ab"
+                checksums = ChapterChecksums(audio_start=part_tag_size)
+                checksums.update_from_file(part_path)
+            else:
+                # The server ignored the Range header, so the body is the whole file
+                offset = our_tag_size = source_tag_size = 0
+                expected = response.headers.get("Content-Length")
+                mode = "wb"
+
+            received = offset
+            with open(part_path, mode) as file:
+                chunks = response.iter_content(chunk_size=CHUNK_SIZE)
+                if mode == "wb":
+                    source_tag, chunks = _split_source_tag(chunks)
+                    tag = merge_tag(source_tag, tags) if tags is not None else source_tag
+                    if tags is not None:
+                        our_tag_size, source_tag_size = len(tag), len(source_tag)
+                    checksums = ChapterChecksums(audio_start=len(tag))
+                    file.write(tag)
+                    checksums.update(tag)
+                    received += len(tag)
+                for chunk in chunks:
+                    file.write(chunk)
+                    checksums.update(chunk)
+                    received += len(chunk)
+
+        # The server's size is the source file's, with its own tag instead of ours
+        expected = int(expected) - source_tag_size + our_tag_size if expected is not None else received
+        if received != expected:
+            raise requests.RequestException(f"Expected {expected} bytes but received {received}")
+
+        os.replace(part_path, file_path)
+        return received, expected, checksums.file.hexdigest(), checksums.audio.hexdigest()
+
+    def _source_tag_size(self, url: str) -> int:
+        """Reads the first bytes of ``url`` to find the size of the ID3v2 tag it starts with."""
+        with self.session.get(url, stream=True, timeout=self.timeout, headers={"Range": f"bytes=0-{HEADER_SIZE - 1}"}) as response:
+            response.raise_for_status()
+            header = next(response.iter_content(chunk_size=HEADER_SIZE), b"")
+        return tag_size(header[:HEADER_SIZE])
@@ -0,0 +1,169 @@
+import queue
+import threading
+import time
+
+from contextlib import contextmanager
+
+
+class PoolStats:
+    """Running totals for a ``DriverPool``."""
+
+    def __init__(self) -> None:
+        self.leases = 0
+        self.reused = 0
+        self.created = 0
+        self.replaced = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "leases": self.leases,
+            "reused": self.reused,
+            "created": self.created,
+            "replaced": self.replaced,
+            "total_wait": self.total_wait,
+            "max_wait": self.max_wait,
+            "average_wait": self.total_wait / self.leases if self.leases else 0.0,
+        }
+
+
+def print_lease(lease: dict) -> None:
+    """A stats hook that prints every lease."""
+    state = f"reused ({lease['session_uses']} uses)" if lease["session_reused"] else "new session"
+    print(f"Leased Chrome session after {lease['wait']:.2f}s, {state}, {lease['reused']}/{lease['leases']} leases reused so far")
+
+
+class DriverPool:
+    """Keeps warm browser sessions around so each book doesn't pay for a Chrome cold start.
+
+    Sessions are created lazily up to ``size``, leased one book at a time and
+    reset before they go back in the pool. A session that fails its health
+    check or its reset is quit and replaced with a new one.
+    """
+
+    def __init__(self, factory, size=2, stats_hook=None) -> None:
+        """
+        Args:
+            factory (callable): Creates a new ``WebsiteDriver`` when called with no arguments.
+            size (int): The most sessions kept open at once.
+            stats_hook (callable): Called with the pool totals from ``PoolStats``, updated with
+                                   the lease's own wait, session_reused and session_uses.
+        """
+        self.factory = factory
+        self.size = size
+        self.stats_hook = stats_hook
+        self.stats = PoolStats()
+
+        self._idle = queue.LifoQueue()  # Most recently used first, so warm sessions stay warm
+        self._uses = {}
+        self._open = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _create(self):
+        driver = self.factory()
+        with self._lock:
+            self.stats.created += 1
+            self._uses[id(driver)] = 0
+        return driver
+
+    def _discard(self, driver) -> None:
+        with self._lock:
+            self._uses.pop(id(driver), None)
+            self._open -= 1
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def _is_alive(self, driver) -> bool:
+        try:
+            driver.window_handles  # Any round trip to the driver fails once Chrome has crashed
+            return True
+        except Exception:
+            return False
+
+    def _acquire(self):
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("The driver pool has been closed")
+                can_create = self._idle.empty() and self._open < self.size
+                if can_create:
+                    self._open += 1
+
+            if can_create:
+                try:
+                    return self._create()
+                except Exception:
+                    with self._lock:
+                        self._open -= 1
+                    raise
+
+            try:
+                # Wake up now and then in case a discarded session freed a slot
+                driver = self._idle.get(timeout=1)
+            except queue.Empty:
+                continue
+
+            if self._is_alive(driver):
+                return driver
+
+            # Replace a crashed session with a fresh one in the same slot
+            self._discard(driver)
+            with self._lock:
+                self.stats.replaced += 1
+
+    def _release(self, driver) -> None:
+        if self._closed:
+            self._discard(driver)
+            return
+        try:
+            driver.reset()
+        except Exception as e:
+            print(f"Discarding Chrome session that failed to reset: {e}")
+            self._discard(driver)
+            return
+        self._idle.put(driver)
+
+    @contextmanager
+    def lease(self):
+        """Leases a session for the length of the ``with`` block."""
+        start = time.perf_counter()
+        driver = self._acquire()
+        wait = time.perf_counter() - start
+
+        with self._lock:
+            uses = self._uses.get(id(driver), 0)
+            self._uses[id(driver)] = uses + 1
+            self.stats.leases += 1
+            self.stats.reused += uses > 0
+            self.stats.total_wait += wait
+            self.stats.max_wait = max(self.stats.max_wait, wait)
+            snapshot = self.stats.as_dict()
+
+        if self.stats_hook is not None:
+            self.stats_hook({**snapshot, "wait": wait, "session_reused": uses > 0, "session_uses": uses + 1})
+
+        try:
+            yield driver
+        finally:
+            self._release(driver)
+
+    def close(self) -> None:
+        """Quits every idle session. Sessions still leased are quit when they're returned."""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,191 @@
+import os
+import shutil
+import struct
+
+# Room left after the frames on a first write, so later edits fit in place
+DEFAULT_PADDING = 4096
+
+HEADER_SIZE = 10
+FLAG_UNSYNCHRONISATION = 0x80
+FLAG_EXTENDED_HEADER = 0x40
+FLAG_FOOTER = 0x10
+
+
+class UnsupportedTag(Exception):
+    """Raised for tags this writer doesn't edit directly (ID3v2.2, unsynchronised, extended headers)."""
+
+
+def encode_syncsafe(value: int) -> bytes:
+    return bytes(((value >> 21) & 0x7F, (value >> 14) & 0x7F, (value >> 7) & 0x7F, value & 0x7F))
+
+
+def decode_syncsafe(data: bytes) -> int:
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def read_tag_header(file):
+    """
+    Read the ID3v2 header at the start of an open file.
+
+    Returns:
+        tuple: (major version, flags, tag size without the header), or None if there is no tag.
+    """
+    file.seek(0)
+    header = file.read(HEADER_SIZE)
+    if len(header) < HEADER_SIZE or header[:3] != b"ID3":
+        return None
+    return header[3], header[5], decode_syncsafe(header[6:10])
+
+
+def tag_size(header: bytes) -> int:
+    """The full size of the ID3v2 tag whose first 10 bytes are ``header``, footer included, or 0 if it isn't one."""
+    if len(header) < HEADER_SIZE or header[:3] != b"ID3":
+        return 0
+    footer = HEADER_SIZE if header[5] & FLAG_FOOTER else 0
+    return HEADER_SIZE + decode_syncsafe(header[6:10]) + footer
+
+
+def encode_frame(frame_id: str, body: bytes, version=4) -> bytes:
+    """Wrap a frame body in its header. ID3v2.4 sizes are syncsafe, ID3v2.3 sizes are plain."""
+    size = encode_syncsafe(len(body)) if version == 4 else struct.pack(">I", len(body))
+    return frame_id.encode("latin-1") + size + b"\x00\x00" + body
+
+
+def encode_text_frame(frame_id: str, text: str, version=4) -> bytes:
+    if version == 4:
+        body = b"\x03" + text.encode("utf-8")  # UTF-8
+    else:
+        body = b"\x01" + text.encode("utf-16")  # UTF-16 with BOM, the only Unicode option in v2.3
+    return encode_frame(frame_id, body, version)
+
+
+def iter_raw_frames(tag_body: bytes, version: int):
+    """Yield (frame_id, raw frame bytes) for every frame in a tag body, stopping at the padding."""
+    offset = 0
+    while offset + HEADER_SIZE <= len(tag_body):
+        frame_id = tag_body[offset:offset + 4]
+        if frame_id[:1] == b"\x00":
+            break  # Padding
+        size_bytes = tag_body[offset + 4:offset + 8]
+        size = decode_syncsafe(size_bytes) if version == 4 else struct.unpack(">I", size_bytes)[0]
+        end = offset + HEADER_SIZE + size
+        if end > len(tag_body):
+            raise UnsupportedTag(f"Frame {frame_id!r} runs past the end of the tag")
+        yield frame_id.decode("latin-1"), tag_body[offset:end]
+        offset = end
+
+
+def render_tag(frames, padding=DEFAULT_PADDING, version=4, size=None) -> bytes:
+    """
+    Build a complete ID3v2 tag.
+
+    Args:
+        frames (dict | list): Frame IDs mapped to text, or already encoded frames (bytes).
+        padding (int): Zero bytes added after the frames.
+        version (int): The ID3v2 major version, 3 or 4.
+        size (int): Pad the tag body to exactly this size instead of using ``padding``.
+
+    Returns:
+        bytes: The header, the frames and the padding.
+    """
+    if isinstance(frames, dict):
+        frames = [encode_text_frame(frame_id, text, version) for frame_id, text in frames.items()]
+    body = b"".join(frames)
+    padding = size - len(body) if size is not None else padding
+    return b"ID3" + bytes((version, 0, 0)) + encode_syncsafe(len(body) + padding) + body + b"\x00" * padding
+
+
+def merge_tag(source_tag: bytes, frames: dict, padding=DEFAULT_PADDING) -> bytes:
+    """
+    Build the tag that replaces ``source_tag``, keeping its other frames the way ``write_tags`` does.
+
+    Args:
+        source_tag (bytes): A complete ID3v2 tag, or empty bytes if there is none.
+        frames (dict): Frame IDs (e.g. "TIT2") mapped to their text.
+        padding (int): Zero bytes reserved after the frames.
+
+    Returns:
+        bytes: The new tag. Tags ``write_tags`` can't edit are replaced by the new frames alone.
+    """
+    version, kept = 4, []
+    if len(source_tag) >= HEADER_SIZE and source_tag[3] in (3, 4) \
+            and not source_tag[5] & (FLAG_UNSYNCHRONISATION | FLAG_EXTENDED_HEADER | FLAG_FOOTER):
+        try:
+            kept = [raw for frame_id, raw in iter_raw_frames(source_tag[HEADER_SIZE:], source_tag[3]) if frame_id not in frames]
+            version = source_tag[3]
+        except UnsupportedTag:
+            kept = []
+    new_frames = kept + [encode_text_frame(frame_id, text, version) for frame_id, text in frames.items()]
+    return render_tag(new_frames, padding=padding, version=version)
+
+
+def write_tags(file_path: str, frames: dict, padding=DEFAULT_PADDING) -> int:
+    """
+    Set text frames on an MP3, editing the existing tag in place whenever it fits.
+
+    Only the tag region at the start of the file is read. Frames that aren't being
+    set (cover art, comments, ...) are carried over byte for byte. When the new
+    tag doesn't fit in the old one, or there is no tag yet, the file is rewritten
+    once with ``padding`` bytes reserved so later edits fit in place.
+
+    Args:
+        file_path (str): The MP3 file.
+        frames (dict): Frame IDs (e.g. "TIT2") mapped to their text.
+        padding (int): Padding reserved when the file has to be rewritten.
+
+    Returns:
+        int: The number of bytes written to disk.
+
+    Raises:
+        UnsupportedTag: If the existing tag uses features this writer doesn't handle.
+    """
+    with open(file_path, "r+b") as file:
+        header = read_tag_header(file)
+
+        if header is None:
+            version, old_size, kept = 4, None, []
+        else:
+            version, flags, old_size = header
+            if version not in (3, 4):
+                raise UnsupportedTag(f"ID3v2.{version} tags aren't supported")
+            if flags & (FLAG_UNSYNCHRONISATION | FLAG_EXTENDED_HEADER | FLAG_FOOTER):
+                raise UnsupportedTag("Unsynchronised tags, extended headers and footers aren't supported")
+            tag_body = file.read(old_size)
+            kept = [raw for frame_id, raw in iter_raw_frames(tag_body, version) if frame_id not in frames]
+
+        new_frames = kept + [encode_text_frame(frame_id, text, version) for frame_id, text in frames.items()]
+        frames_size = sum(len(frame) for frame in new_frames)
+
+        # Hard-linked chapters (see ContentStore) are rewritten so the other links keep their bytes
+        shared = os.fstat(file.fileno()).st_nlink > 1
+
+        if old_size is not None and frames_size <= old_size and not shared:
+            # Fits: overwrite the old tag and its padding, leaving the audio untouched
+            tag = render_tag(new_frames, version=version, size=old_size)
+            file.seek(0)
+            file.write(tag)
+            return len(tag)
+
+    tag = render_tag(new_frames, padding=padding, version=version)
+    audio_start = HEADER_SIZE + old_size if old_size is not None else 0
+    return _rewrite(file_path, tag, audio_start)
+
+
+def break_hard_link(file_path: str) -> None:
+    """Give ``file_path`` its own copy of its data if it is hard-linked elsewhere."""
+    if os.stat(file_path).st_nlink > 1:
+        temp_path = f"{file_path}.tagging"
+        shutil.copyfile(file_path, temp_path)
+        os.replace(temp_path, file_path)
+
+
+def _rewrite(file_path: str, tag: bytes, audio_start: int) -> int:
+    """Write ``tag`` followed by the audio from ``audio_start`` into a new file that replaces the old one."""
+    temp_path = f"{file_path}.tagging"
+    with open(file_path, "rb") as source, open(temp_path, "wb") as target:
+        target.write(tag)
+        source.seek(audio_start)
+        shutil.copyfileobj(source, target, 1024 * 1024)
+        written = target.tell()
+    os.replace(temp_path, file_path)
+    return written
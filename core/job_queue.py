@@ -0,0 +1,170 @@
+import os
+import random
+import socket
+import threading
+import time
+
+from core.database import JOB_KINDS
+from core.metrics import TRACER
+
+
+class JobFailed(Exception):
+    """Raised by a job handler when the book couldn't be processed and should be retried."""
+
+
+class _Heartbeat:
+    """Keeps a job's lease alive from a background thread while the job runs.
+
+    If the lease turns out to be lost, ``lost`` is set so the handler can stop early.
+    """
+
+    def __init__(self, db, job_id, owner, lease_seconds, interval, clock=time.time) -> None:
+        self.db = db
+        self.job_id = job_id
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self.interval = interval
+        self.clock = clock
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            if not self.db.heartbeat_job(self.job_id, self.owner, self.lease_seconds, now=self.clock()):
+                self.lost.set()
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stop.set()
+        self._thread.join()
+
+
+class JobWorker:
+    """Drains one kind of job ("download" or "tag") from the queue in the database.
+
+    Any number of workers, in other processes sharing the database, can run at
+    once: each job is leased to a single worker by an atomic claim, and the lease
+    is renewed by a heartbeat while the job runs. Workers on other machines need
+    SHARED_DATABASE set, so the database uses a rollback journal instead of WAL,
+    and a network file system whose file locks work. If a worker
+    dies, its lease expires and another worker picks the job up. A worker that
+    finds its lease taken over signals its handler to stop and drops the result.
+    Failed jobs are retried with exponential backoff and end up ``dead`` after
+    ``max_attempts``. The book's flag for the job kind is set once a job is done.
+    """
+
+    def __init__(self, db, kind: str, handler, lease_seconds=600.0, heartbeat_seconds=60.0,
+                 max_attempts=5, backoff_seconds=30.0, max_backoff_seconds=3600.0, owner=None, clock=time.time) -> None:
+        """
+        Args:
+            db (SQLiteDB): The database holding the queue.
+            kind (str): The job kind this worker runs.
+            handler (callable): Called with the audiobook row of each job and a ``threading.Event`` that is
+                set if the lease is lost, in which case it should stop early. Raises on failure.
+            lease_seconds (float): How long a claim lasts without a heartbeat.
+            heartbeat_seconds (float): How often a running job's lease is renewed.
+            max_attempts (int): Attempts before a job is moved to the dead-letter state.
+            backoff_seconds (float): Delay before the first retry, doubled on each later one.
+            max_backoff_seconds (float): The longest delay between retries.
+            owner (str): Identifies this worker in leases. Defaults to host name and process ID.
+            clock (callable): Returns the current time in seconds, for leases and retry times.
+        """
+        self.db = db
+        self.kind = kind
+        self.handler = handler
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self.clock = clock
+        self.counts = {"done": 0, "retried": 0, "dead": 0}
+
+    def retry_delay(self, attempts: int) -> float:
+        """Exponential backoff with up to 10% jitter, so failed jobs don't all come back at once."""
+        delay = min(self.max_backoff_seconds, self.backoff_seconds * 2 ** (attempts - 1))
+        return delay * (1 + random.random() * 0.1)
+
+    def run_once(self) -> bool:
+        """Claims and runs a single job. Returns False if no job was due."""
+        claimed = self.db.claim_job(self.kind, self.owner, self.lease_seconds, now=self.clock())
+        if claimed is None:
+            return False
+
+        job_id, book_id, attempts = claimed
+        if attempts > self.max_attempts:
+            # Its leases kept expiring, e.g. the worker running it crashed every time
+            self._finish(job_id, "dead", "Lease expired on the final attempt")
+            return True
+
+        audiobooks = self.db.get_audiobooks(column_name="id", value=book_id)
+        if not audiobooks:
+            self._finish(job_id, "dead", f"Audiobook {book_id} no longer exists")
+            return True
+
+        audiobook = audiobooks[0]
+        heartbeat = _Heartbeat(self.db, job_id, self.owner, self.lease_seconds, self.heartbeat_seconds, self.clock)
+        try:
+            with heartbeat, TRACER.span(f"job.{self.kind}", book=audiobook.title):
+                self.handler(audiobook, heartbeat.lost)
+        except KeyboardInterrupt:
+            # Hand the job straight back instead of waiting for the lease to expire
+            self.db.finish_job(job_id, self.owner, "queued", now=self.clock(), available_at=self.clock())
+            raise
+        except Exception as e:
+            if not heartbeat.lost.is_set():
+                self._retry_or_bury(job_id, attempts, f"{type(e).__name__}: {e}", audiobook.title)
+                return True
+
+        if heartbeat.lost.is_set():
+            print(f"Lost the lease on '{audiobook.title}' while working on it, another worker has taken it over")
+            return True
+        if self._finish(job_id, "done"):
+            self.db.mark_audiobook_bool(column_name=JOB_KINDS[self.kind][0], audiobook_id=book_id)
+        return True
+
+    def _retry_or_bury(self, job_id, attempts, error, title) -> None:
+        if attempts >= self.max_attempts:
+            print(f"{self.kind} of '{title}' failed {attempts} time(s), giving up: {error}")
+            self._finish(job_id, "dead", error)
+            return
+        delay = self.retry_delay(attempts)
+        print(f"{self.kind} of '{title}' failed ({error}), retrying in {delay:.0f}s")
+        self._finish(job_id, "queued", error, available_at=self.clock() + delay)
+
+    def _finish(self, job_id, status, error=None, available_at=None) -> bool:
+        """Ends this worker's lease on a job. Returns False if the lease had already passed to another worker."""
+        if not self.db.finish_job(job_id, self.owner, status, now=self.clock(), error=error, available_at=available_at):
+            return False
+        self.counts["retried" if status == "queued" else status] += 1
+        return True
+
+    def run(self, daemon=False, poll_seconds=10.0) -> dict:
+        """
+        Queues every book that needs this kind of job, then works until nothing is due.
+
+        In daemon mode the worker keeps going, re-checking for newly added books
+        every ``poll_seconds`` until it's interrupted.
+
+        Returns:
+            dict: How many jobs finished as done, were rescheduled, or went dead.
+        """
+        try:
+            while True:
+                queued = self.db.enqueue_jobs(self.kind, now=self.clock())
+                if queued:
+                    print(f"Queued {queued} new {self.kind} job(s)")
+                while self.run_once():
+                    pass
+                if not daemon:
+                    return self.counts
+                time.sleep(poll_seconds)
+        except KeyboardInterrupt:
+            print(f"Stopping {self.kind} worker {self.owner}")
+            return self.counts
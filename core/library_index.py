@@ -0,0 +1,172 @@
+import argparse
+import hashlib
+import os
+import time
+
+from mutagen.id3 import ID3, ID3NoHeaderError
+
+from core.batch_tagger import BatchTagger
+from core.database import AudiobookRecord, SQLiteDB
+from core.id3_writer import HEADER_SIZE, read_tag_header
+from core.metadata_editor import build_tags, tags_match
+
+
+def tag_fingerprint(file_path: str) -> str:
+    """SHA-1 of a file's raw ID3v2 tag. Only the tag region is read."""
+    with open(file_path, "rb") as file:
+        header = read_tag_header(file)
+        if header is None:
+            return ""
+        file.seek(0)
+        return hashlib.sha1(file.read(HEADER_SIZE + header[2])).hexdigest()
+
+
+class LibraryIndex:
+    """Keeps a record of every library folder and MP3 so repeat runs only touch what changed.
+
+    Every folder is still listed with ``os.scandir`` on each scan (a file edited in
+    place doesn't change its folder's mtime), but files are only opened when their
+    size or mtime differs from the index. Folders with any change are flagged
+    dirty until they have been retagged or validated.
+    """
+
+    def __init__(self, db) -> None:
+        self.db = db
+
+    def scan(self, base_path: str) -> list:
+        """
+        Walks ``base_path`` and records what changed since the last scan.
+
+        Returns:
+            list: The folders that changed (new, removed files, or new/changed MP3s).
+        """
+        base_path = os.path.abspath(base_path)
+        known_folders = self.db.get_library_folders(base_path)
+        known_files = self.db.get_library_files(base_path)
+
+        folders, files, changed = [], [], []
+        seen_files = set()
+        stack = [base_path]
+
+        while stack:
+            folder = stack.pop()
+            folder_changed = False
+            try:
+                folder_mtime = os.stat(folder).st_mtime_ns
+                entries = list(os.scandir(folder))
+            except OSError as e:
+                print(f"Skipping {folder}: {e}")
+                continue
+
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith(".mp3") and entry.is_file():
+                    seen_files.add(entry.path)
+                    stat = entry.stat()
+                    known = known_files.get(entry.path)
+                    if known is None or known[0] != stat.st_size or known[1] != stat.st_mtime_ns:
+                        files.append((entry.path, folder, stat.st_size, stat.st_mtime_ns, tag_fingerprint(entry.path)))
+                        folder_changed = True
+
+            known = known_folders.get(folder)
+            if known is None or known[0] != folder_mtime:
+                folder_changed = True  # Files were added, removed or renamed
+            folders.append((folder, folder_mtime, folder_changed))
+            if folder_changed:
+                changed.append(folder)
+
+        seen_folders = {folder[0] for folder in folders}
+        removed_folders = [path for path in known_folders if path not in seen_folders]
+        removed_files = [path for path in known_files if path not in seen_files]
+        self.db.save_library_scan(folders, files, removed_folders, removed_files, scanned_at=time.time())
+        return changed
+
+    def book_for_folder(self, folder: str):
+        """The audiobook row a folder was downloaded for, matched on its title, or a stand-in row."""
+        title = os.path.basename(folder)
+        books = self.db.get_audiobooks(column_name="title", value=title)
+        return books[0] if books else AudiobookRecord(None, title, None, None, None, None, None, 1, 0)
+
+    def folders_with_mp3s(self, folders) -> list:
+        return [folder for folder in folders if any(name.endswith(".mp3") for name in os.listdir(folder))]
+
+    def retag(self, base_path: str, workers=None) -> dict:
+        """Scans, then retags only the folders flagged dirty and clears them once they succeed."""
+        self.scan(base_path)
+        dirty = self.db.get_dirty_library_folders(os.path.abspath(base_path))
+        books = [(folder, self.book_for_folder(folder)) for folder in self.folders_with_mp3s(dirty)]
+        counts = BatchTagger(db=self.db, workers=workers).run(books)
+
+        # Record the new tags so the retag itself doesn't show up as a change next time
+        self.scan(base_path)
+        self.db.clear_library_folders_dirty([folder for folder in dirty if folder not in counts["failed_folders"]])
+        return counts
+
+    def validate(self, base_path: str) -> dict:
+        """Scans, then checks the tags in dirty folders without writing anything.
+
+        Files whose tag fingerprint is the one they had when their folder last
+        validated clean (e.g. only the audio changed) aren't parsed again.
+
+        Returns:
+            dict: Folder paths mapped to the files whose tags don't match. Valid folders are cleared.
+        """
+        self.scan(base_path)
+        invalid = {}
+        valid = []
+
+        for folder in self.db.get_dirty_library_folders(os.path.abspath(base_path)):
+            audiobook = self.book_for_folder(folder)
+            series_name = audiobook.series_name
+            last_book_number = self.db.get_last_book_number_in_series(series_name) if series_name else None
+
+            validated = self.db.get_validated_files(folder)
+            mismatched = []
+            for entry in os.scandir(folder):
+                if entry.name.endswith(".mp3") and entry.is_file() and entry.path not in validated:
+                    try:
+                        audio_tags = ID3(entry.path)
+                    except ID3NoHeaderError:
+                        audio_tags = ID3()
+                    if not tags_match(audio_tags, build_tags(entry.name, audiobook, last_book_number)):
+                        mismatched.append(entry.path)
+
+            if mismatched:
+                invalid[folder] = mismatched
+            else:
+                valid.append(folder)
+
+        self.db.set_library_folders_validated(valid)
+        return invalid
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Scan, retag or validate a library incrementally.")
+    parser.add_argument("command", choices=("scan", "retag", "validate"))
+    parser.add_argument("base_path", help="library folder, e.g. a user's audiobook folder")
+    parser.add_argument("--workers", type=int, default=None, help="tagging processes (retag only)")
+    args = parser.parse_args(argv)
+
+    db = SQLiteDB()
+    db.migrate()
+    index = LibraryIndex(db)
+    start = time.perf_counter()
+
+    if args.command == "scan":
+        changed = index.scan(args.base_path)
+        print(f"{len(changed)} folder(s) changed since the last scan")
+    elif args.command == "retag":
+        index.retag(args.base_path, workers=args.workers)
+    else:
+        invalid = index.validate(args.base_path)
+        for folder, files in invalid.items():
+            print(f"{folder}: {len(files)} file(s) with outdated tags")
+        print(f"{len(invalid)} folder(s) need retagging")
+
+    print(f"Finished {args.command} in {time.perf_counter() - start:.2f}s")
+    db.disconnect()
+
+
+if __name__ == "__main__":
+    main()
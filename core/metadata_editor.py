@@ -1,8 +1,15 @@
 import os
 import re
 
-from mutagen.mp3 import MP3
-from mutagen.id3 import ID3, TIT2, TPE1, TALB, TRCK, TCON, TPOS, TIT3
+from mutagen.id3 import ID3, ID3NoHeaderError, TIT2, TPE1, TALB, TRCK, TCON, TPOS, TIT3
+
+from core.database import AudiobookRecord
+from core.id3_writer import DEFAULT_PADDING, UnsupportedTag, break_hard_link, write_tags
+
+GENRE = "Audiobook"
+
+# The frames written to every chapter, by frame ID
+FRAMES = {"TIT2": TIT2, "TIT3": TIT3, "TPOS": TPOS, "TPE1": TPE1, "TALB": TALB, "TRCK": TRCK, "TCON": TCON}
 
 def get_folders(base_path):
     """
@@ -16,73 +23,127 @@ def get_folders(base_path):
     """
     folders = []
 
-    for entry in os.listdir(base_path):
-        entry_path = os.path.join(base_path, entry)
-        if os.path.isdir(entry_path):
-            folders.append(entry_path)
-            folders.extend(get_folders(entry_path))
+    with os.scandir(base_path) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                folders.append(entry.path)
+                folders.extend(get_folders(entry.path))
     return folders
 
 
-def edit_mp3_metadata(folder_path: str, audiobook_data: list, db) -> None:
+def build_tags(filename: str, audiobook_data: AudiobookRecord, last_book_number=None) -> dict:
+    """
+    Build the ID3 text frames a chapter file should carry.
+
+    Args:
+        filename (str): The chapter's file name, e.g. "Chapter 3 - Title.mp3".
+        audiobook_data (AudiobookRecord): The audiobook the file belongs to.
+        last_book_number (int): The highest book number known for the series.
+
+    Returns:
+        dict: Frame IDs (e.g. "TIT2") mapped to their text.
+    """
+    # Get the track number from the file name
+    name = os.path.splitext(filename)[0]
+    match = re.search(r'\d+', name)
+    track_number = int(match.group()) if match else None
+    title = f"Chapter {track_number}" if match else name
+
+    album = audiobook_data.title
+    artist = audiobook_data.author
+    series_name = audiobook_data.series_name
+    book_number = audiobook_data.book_number
+
+    # "Description" section
+    tags = {"TIT2": title}
+    if series_name:
+        tags["TIT3"] = series_name
+    if book_number:
+        tags["TPOS"] = f"{book_number}/{last_book_number}"
+
+    # "Media" section
+    if artist:
+        tags["TPE1"] = artist
+    if album:
+        tags["TALB"] = album
+    if track_number is not None:
+        tags["TRCK"] = str(track_number)
+    tags["TCON"] = GENRE
+    return tags
+
+
+def tags_match(audio_tags, tags: dict) -> bool:
+    """Check whether existing ID3 tags already hold every target frame's text."""
+    for frame_id, text in tags.items():
+        frame = audio_tags.get(frame_id)
+        if frame is None or [str(value) for value in frame.text] != [text]:
+            return False
+    return True
+
+
+def has_tags(file_path: str, tags: dict) -> bool:
+    """Check whether an MP3 file's ID3 tag already holds every target frame's text."""
+    try:
+        return tags_match(ID3(file_path), tags)
+    except ID3NoHeaderError:
+        return False
+
+
+def apply_tags(file_path: str, tags: dict) -> int:
+    """
+    Write the target frames to an MP3 file, leaving files that already match untouched.
+
+    Only the ID3 tag is read, and it is edited in place whenever the new frames
+    fit in the existing tag's padding.
+
+    Returns:
+        int: The number of bytes written, 0 if the file already had the tags.
+    """
+    try:
+        audio_tags = ID3(file_path)
+    except ID3NoHeaderError:
+        # If the file doesn't have any existing ID3 tags, create a new ID3 object
+        audio_tags = ID3()
+
+    if tags_match(audio_tags, tags):
+        return 0
+
+    try:
+        return write_tags(file_path, tags)
+    except UnsupportedTag:
+        # Let mutagen handle tag layouts the in-place writer doesn't
+        break_hard_link(file_path)
+        for frame_id, text in tags.items():
+            audio_tags.add(FRAMES[frame_id](encoding=3, text=text))
+        audio_tags.save(file_path, padding=lambda info: DEFAULT_PADDING)
+        return os.path.getsize(file_path)
+
+
+def edit_mp3_metadata(folder_path: str, audiobook_data: AudiobookRecord, db) -> None:
     """
     Edit the metadata of MP3 files in a folder.
 
     Args:
         folder_path (str): The path to the folder containing the MP3 files.
-        artist (str): The new contributing artist(s) to set.
-        album (str): The new album to set.
-        genre (str): 
+        audiobook_data (AudiobookRecord): The audiobook the files belong to.
+        db (SQLiteDB): Used to look up the last book number in the series.
     """
+    series_name = audiobook_data.series_name
+    last_book_number = db.get_last_book_number_in_series(series_name) if series_name else None
 
     for filename in os.listdir(folder_path):
         if filename.endswith(".mp3"):
             file_path = os.path.join(folder_path, filename)
-            audio = MP3(file_path)
-
-            # If the file doesn't have any existing ID3 tags, create a new ID3 object
-            if audio.tags is None:
-                audio.tags = ID3()
-
-            # Get the track number from the file name
-            name = os.path.splitext(filename)[0]
-            match = re.search(r'\d+', name)
-            if match:
-                track_number = int(match.group())
-                title = f"Chapter {track_number}"
+            tags = build_tags(filename, audiobook_data, last_book_number)
+
+            written = apply_tags(file_path, tags)
+            if written:
+                print(f"Metadata edited for {filename} ({written} bytes written)")
             else:
-                title = name
-            print(f"title is: {title}")
-
-            album = audiobook_data[1] 
-            artist = audiobook_data[2]
-            series_name = audiobook_data[3]
-            book_number = audiobook_data[4]
-            last_book_number = None
-
-            # Edit the "Description" section
-            audio["title"] = TIT2(encoding=3, text=title)
-            print(f"series name is: {series_name}")
-            if series_name:
-                last_book_number = db.get_last_book_number_in_series(series_name)
-                audio["subtitle"] = TIT3(encoding=3, text=series_name)
-            print(f"book number: {book_number}")
-            if book_number:
-                audio["part_of_a_set"] = TPOS(encoding=3, text=f"{book_number}/{last_book_number}")
-
-            # Edit the "Media" section
-            audio["artist"] = TPE1(encoding=3, text=artist)
-            audio["album"] = TALB(encoding=3, text=album)
-            audio["tracknumber"] = TRCK(encoding=3, text=str(track_number))
-            audio["genre"] = TCON(encoding=3, text="Audiobook")
-
-            audio.save()
-            print(f"Metadata edited for {filename}")
+                print(f"Metadata already up to date for {filename}")
 
 if __name__ == "__main__":
-    base_path = "C:\\Users\\Ghost\\Documents\\Personal\\Alicia\\Audiobooks"
-    folders = get_folders(base_path)
-    genre = "Audiobook"
-    for folder in folders:
-        album = os.path.basename(folder)
-        edit_mp3_metadata(folder, album, genre)
\ No newline at end of file
+    # Library-wide retags go through the library index, so only changed folders are touched:
+    #   python -m core.metadata_editor retag "C:\\Users\\Ghost\\Documents\\Personal\\Alicia\\Audiobooks"
+    from core.library_index import main
+    main()
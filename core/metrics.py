@@ -0,0 +1,142 @@
+import json
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+
+
+class Span:
+    """A timed stage. ``bytes`` can be set inside the ``with`` block once the size is known."""
+
+    __slots__ = ("name", "book", "bytes", "start", "duration")
+
+    def __init__(self, name: str, book=None) -> None:
+        self.name = name
+        self.book = book
+        self.bytes = 0
+        self.start = 0.0
+        self.duration = 0.0
+
+
+class Tracer:
+    """Times pipeline stages and aggregates them per book and per run.
+
+    Spans aren't kept individually: each one is folded into running totals
+    (count, seconds, max, bytes) keyed by book and stage, so tracing a large
+    run costs a few dictionary updates per span.
+    """
+
+    def __init__(self) -> None:
+        self.started_at = time.time()
+        self._totals = {}  # (book, stage) -> [count, seconds, max seconds, bytes]
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, book=None):
+        span = Span(name, book)
+        span.start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span.duration = time.perf_counter() - span.start
+            self.record(name, span.duration, book=book, size=span.bytes)
+
+    def record(self, name: str, duration: float, book=None, size=0) -> None:
+        """Adds a stage that was timed elsewhere, e.g. in a worker process."""
+        with self._lock:
+            for key in ((None, name), (book, name)) if book is not None else ((None, name),):
+                totals = self._totals.get(key)
+                if totals is None:
+                    self._totals[key] = [1, duration, duration, size]
+                else:
+                    totals[0] += 1
+                    totals[1] += duration
+                    totals[2] = max(totals[2], duration)
+                    totals[3] += size
+
+    def reset(self) -> None:
+        with self._lock:
+            self._totals.clear()
+            self.started_at = time.time()
+
+    def summary(self) -> dict:
+        """Returns the totals as ``{"run": {stage: ...}, "books": {book: {stage: ...}}}``."""
+        run, books = {}, {}
+        with self._lock:
+            items = [(key, list(totals)) for key, totals in self._totals.items()]
+
+        for (book, stage), (count, seconds, max_seconds, size) in items:
+            stats = {
+                "count": count,
+                "seconds": round(seconds, 6),
+                "mean_seconds": round(seconds / count, 6),
+                "max_seconds": round(max_seconds, 6),
+            }
+            if size:
+                stats["bytes"] = size
+                stats["bytes_per_second"] = round(size / seconds, 1) if seconds else 0.0
+            if book is None:
+                run[stage] = stats
+            else:
+                books.setdefault(book, {})[stage] = stats
+
+        return {
+            "started_at": self.started_at,
+            "wall_seconds": round(time.time() - self.started_at, 3),
+            "run": run,
+            "books": books,
+        }
+
+    def write_json(self, file_path: str) -> None:
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        with open(file_path, "w", encoding="utf-8") as file:
+            json.dump(self.summary(), file, indent=2)
+
+    def write_prometheus(self, file_path: str) -> None:
+        """Writes the totals in the Prometheus text format, e.g. for node_exporter's textfile collector."""
+        summary = self.summary()
+        lines = []
+
+        def metric(name, help_text, metric_type, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        stages = summary["run"].items()
+        metric("podcatcher_stage_count", "Spans recorded per stage.", "gauge",
+               [({"stage": stage}, stats["count"]) for stage, stats in stages])
+        metric("podcatcher_stage_seconds", "Total seconds spent per stage.", "gauge",
+               [({"stage": stage}, stats["seconds"]) for stage, stats in stages])
+        metric("podcatcher_stage_max_seconds", "Longest single span per stage.", "gauge",
+               [({"stage": stage}, stats["max_seconds"]) for stage, stats in stages])
+        metric("podcatcher_stage_bytes", "Bytes handled per stage.", "gauge",
+               [({"stage": stage}, stats["bytes"]) for stage, stats in stages if "bytes" in stats])
+        metric("podcatcher_book_stage_seconds", "Total seconds spent per book and stage.", "gauge",
+               [({"book": book, "stage": stage}, stats["seconds"])
+                for book, book_stages in summary["books"].items() for stage, stats in book_stages.items()])
+        metric("podcatcher_run_wall_seconds", "Wall-clock seconds since the run started.", "gauge",
+               [({}, summary["wall_seconds"])])
+
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        temp_path = f"{file_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+        os.replace(temp_path, file_path)  # Scrapers never see a half-written file
+
+    def export(self, metrics_dir: str) -> str:
+        """Writes a timestamped JSON run report and the Prometheus file, and returns the report path."""
+        report_path = os.path.join(metrics_dir, time.strftime("run-%Y%m%d-%H%M%S.json", time.localtime(self.started_at)))
+        self.write_json(report_path)
+        self.write_prometheus(os.path.join(metrics_dir, "podcatcher.prom"))
+        return report_path
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+# - The tracer shared by the whole program.
+TRACER = Tracer()
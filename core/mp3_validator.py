@@ -0,0 +1,136 @@
+import mmap
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+from core.downloader import chapter_filename
+from core.metrics import TRACER
+from core.mpeg import scan_audio
+
+# Non-audio bytes tolerated between frames, as a share of the file, before it counts as corrupt
+GARBAGE_TOLERANCE = 0.01
+# How far a chapter's duration may drift from the one measured when it was downloaded
+DURATION_TOLERANCE_SECONDS = 1.0
+# Without a measured duration, constant-bitrate files are checked against the server's Content-Length.
+# The size includes the source's own tags, so only a file clearly shorter than that is flagged.
+SIZE_ESTIMATE_TOLERANCE = 0.1
+
+
+def check_audio(file_path: str, expected_bytes=None, expected_seconds=None):
+    """
+    Checks that a file is complete MPEG audio by walking its frame headers.
+
+    Args:
+        file_path (str): The MP3 file.
+        expected_bytes (int): The size the server reported for it, if known.
+        expected_seconds (float): The duration measured when it was downloaded, if known.
+
+    Returns:
+        tuple: (problems, seconds of audio). ``problems`` is empty when the file is fine.
+    """
+    try:
+        with open(file_path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if size == 0:
+                return ["empty file"], 0.0
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                scan = scan_audio(buf)
+    except OSError as e:
+        return [f"can't be read ({e.strerror or e})"], 0.0
+
+    if scan is None or scan.frames == 0:
+        return ["no MPEG audio, e.g. an HTML error page"], 0.0
+
+    problems = []
+    if scan.truncated_bytes:
+        problems.append(f"truncated, the last frame is cut off after {scan.truncated_bytes} bytes")
+    if scan.garbage_bytes > size * GARBAGE_TOLERANCE:
+        problems.append(f"{scan.garbage_bytes} bytes of data that isn't audio")
+
+    if expected_seconds:
+        if abs(scan.seconds - expected_seconds) > DURATION_TOLERANCE_SECONDS:
+            problems.append(f"{scan.seconds:.1f}s of audio, {expected_seconds:.1f}s when downloaded")
+    elif expected_bytes and not scan.variable_bitrate:
+        estimate = expected_bytes * 8 / scan.header.bitrate
+        if scan.seconds < estimate * (1 - SIZE_ESTIMATE_TOLERANCE):
+            problems.append(f"{scan.seconds:.1f}s of audio, about {estimate:.1f}s expected from the server's size")
+    return problems, scan.seconds
+
+
+def validate_job(job):
+    """Worker entry point: checks one (chapter_id, file_path, expected_bytes, expected_seconds) job."""
+    chapter_id, file_path, expected_bytes, expected_seconds = job
+    start = time.perf_counter()
+    if not os.path.exists(file_path):
+        return chapter_id, ["missing"], 0.0, 0, time.perf_counter() - start
+    problems, seconds = check_audio(file_path, expected_bytes, expected_seconds)
+    return chapter_id, problems, seconds, os.path.getsize(file_path), time.perf_counter() - start
+
+
+class MP3Validator:
+    """Checks downloaded chapters across a pool of worker processes and queues bad ones for re-download.
+
+    Files are memory-mapped and only their frame headers are read, so a whole
+    library can be checked far faster than it could be decoded.
+    """
+
+    def __init__(self, db, workers=None, chunksize=8) -> None:
+        """
+        Args:
+            db (SQLiteDB): Holds the chapters to check, and records the results.
+            workers (int): Worker processes, defaults to the number of CPUs.
+            chunksize (int): Files handed to a worker at a time.
+        """
+        self.db = db
+        self.workers = workers or os.cpu_count()
+        self.chunksize = chunksize
+
+    def plan(self, chapters, get_user_path) -> list:
+        """Turns rows from ``get_chapters_to_validate`` into jobs, skipping users without a library path."""
+        jobs = []
+        for chapter_id, _, chapter_index, expected_bytes, duration_seconds, title, user in chapters:
+            user_path = get_user_path(user)
+            if user_path:
+                file_path = os.path.join(user_path, title, chapter_filename(chapter_index, title))
+                jobs.append((chapter_id, file_path, expected_bytes, duration_seconds))
+        return jobs
+
+    def run(self, jobs) -> dict:
+        """
+        Checks every job, records the chapters that passed and resets the ones that didn't.
+
+        Returns:
+            dict: Counts of ``valid`` and ``invalid`` files, the ``bytes`` and ``audio_seconds`` checked,
+                  the elapsed ``seconds`` and the ``failed`` chapters as {file_path: problems}.
+        """
+        counts = {"valid": 0, "invalid": 0, "bytes": 0, "audio_seconds": 0.0, "failed": {}}
+        valid, invalid = [], []
+        start = time.perf_counter()
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            results = executor.map(validate_job, jobs, chunksize=self.chunksize)
+            for (_, file_path, _, _), (chapter_id, problems, seconds, size, elapsed) in zip(jobs, results):
+                TRACER.record("validate_file", elapsed, book=os.path.basename(os.path.dirname(file_path)), size=size)
+                counts["bytes"] += size
+                counts["audio_seconds"] += seconds
+                if problems:
+                    invalid.append(chapter_id)
+                    counts["failed"][file_path] = problems
+                    print(f"{file_path}: {'; '.join(problems)}")
+                else:
+                    valid.append((chapter_id, seconds))
+
+        self.db.set_chapters_validated(valid, validated_at=time.time())
+        if invalid:
+            self.db.mark_chapters_for_redownload(invalid)
+        counts["valid"], counts["invalid"] = len(valid), len(invalid)
+        counts["seconds"] = elapsed = time.perf_counter() - start
+
+        print(
+            f"Checked {len(jobs)} file(s) ({counts['bytes'] / 1e6:.0f} MB, {counts['audio_seconds'] / 3600:.1f}h of audio) "
+            f"in {elapsed:.2f}s, {len(jobs) / elapsed if elapsed else 0:.0f} files/s, "
+            f"{counts['bytes'] / elapsed / 1e6 if elapsed else 0:.0f} MB/s. "
+            f"{counts['invalid']} file(s) will be downloaded again"
+        )
+        return counts
@@ -0,0 +1,161 @@
+import struct
+
+from collections import namedtuple
+from functools import lru_cache
+
+from core.id3_writer import FLAG_FOOTER, HEADER_SIZE, decode_syncsafe
+
+# Bitrates in kbps by (MPEG-1?, layer), indexed by the header's 4-bit bitrate index
+BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+# Sample rates by the header's 2-bit version field (0 = MPEG-2.5, 2 = MPEG-2, 3 = MPEG-1)
+SAMPLE_RATES = {0: (11025, 12000, 8000), 2: (22050, 24000, 16000), 3: (44100, 48000, 32000)}
+
+ID3V1_SIZE = 128
+
+FrameHeader = namedtuple("FrameHeader", "mpeg1 layer bitrate sample_rate mono frame_size samples")
+
+# What walking a file's frames found. ``start`` and ``end`` delimit the audio frames that can be
+# copied as they are: any Xing/Info frame is before ``start`` and a cut-off last frame after ``end``.
+AudioScan = namedtuple("AudioScan", "start end frames seconds header xing garbage_bytes truncated_bytes variable_bitrate")
+
+
+@lru_cache(maxsize=256)
+def parse_header(value: int):
+    """Decodes a 32-bit MPEG audio frame header, or returns None if it isn't a valid one.
+
+    Headers barely change from frame to frame, so results are cached.
+    """
+    if value >> 21 != 0x7FF:
+        return None
+    version = (value >> 19) & 3
+    layer = 4 - ((value >> 17) & 3)
+    bitrate_index = (value >> 12) & 15
+    rate_index = (value >> 10) & 3
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None  # Reserved values, or free format, which can't be walked without decoding
+
+    mpeg1 = version == 3
+    bitrate = BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version][rate_index]
+    padding = (value >> 9) & 1
+
+    if layer == 1:
+        samples = 384
+        frame_size = (12 * bitrate // sample_rate + padding) * 4
+    elif layer == 2 or mpeg1:
+        samples = 1152
+        frame_size = 144 * bitrate // sample_rate + padding
+    else:
+        samples = 576
+        frame_size = 72 * bitrate // sample_rate + padding
+    return FrameHeader(mpeg1, layer, bitrate, sample_rate, (value >> 6) & 3 == 3, frame_size, samples)
+
+
+def header_at(buf, offset: int):
+    if offset + 4 > len(buf):
+        return None
+    return parse_header(struct.unpack_from(">I", buf, offset)[0])
+
+
+def id3v2_end(buf) -> int:
+    """Returns where the audio can start: after any ID3v2 tags at the beginning of ``buf``."""
+    offset = 0
+    while buf[offset:offset + 3] == b"ID3" and offset + HEADER_SIZE <= len(buf):
+        footer = HEADER_SIZE if buf[offset + 5] & FLAG_FOOTER else 0
+        offset += HEADER_SIZE + decode_syncsafe(buf[offset + 6:offset + 10]) + footer
+    return min(offset, len(buf))
+
+
+def data_end(buf) -> int:
+    """Returns where the audio must end: before an ID3v1 tag, if the file has one."""
+    if len(buf) >= ID3V1_SIZE and buf[len(buf) - ID3V1_SIZE:len(buf) - ID3V1_SIZE + 3] == b"TAG":
+        return len(buf) - ID3V1_SIZE
+    return len(buf)
+
+
+def is_xing_frame(buf, offset: int, header) -> bool:
+    """True if the frame at ``offset`` is a Xing/Info or VBRI header rather than audio."""
+    if header.layer != 3:
+        return False
+    # The Xing tag follows the side information, whose size depends on the version and channels
+    side_info = (17 if header.mono else 32) if header.mpeg1 else (9 if header.mono else 17)
+    xing_at = offset + 4 + side_info
+    return buf[xing_at:xing_at + 4] in (b"Xing", b"Info") or buf[offset + 36:offset + 40] == b"VBRI"
+
+
+def _is_sync(buf, offset: int, end: int):
+    """Returns the header at ``offset`` if it's a real frame: the next frame must follow it, or the data end."""
+    header = header_at(buf, offset)
+    if header is None:
+        return None
+    following = offset + header.frame_size
+    if following == end or (following < end and header_at(buf, following) is not None):
+        return header
+    return None
+
+
+def _resync(buf, offset: int, end: int) -> int:
+    """Finds the next offset at or after ``offset`` where frames start again, or ``end``."""
+    while True:
+        offset = buf.find(b"\xff", offset, end)
+        if offset < 0:
+            return end
+        if _is_sync(buf, offset, end):
+            return offset
+        offset += 1
+
+
+def scan_audio(buf):
+    """
+    Walks the MPEG frame headers of a whole file without decoding any audio.
+
+    Args:
+        buf: The file's contents, e.g. an ``mmap``.
+
+    Returns:
+        AudioScan: The audio region and what was found in it, or None if there are no MPEG frames at all.
+    """
+    end = data_end(buf)
+    audio_start = id3v2_end(buf)
+    offset = _resync(buf, audio_start, end)
+    garbage = offset - audio_start
+    if offset >= end:
+        return None
+
+    first = header_at(buf, offset)
+    xing = is_xing_frame(buf, offset, first)
+    if xing:
+        offset += first.frame_size
+    start = offset
+
+    frames = 0
+    seconds = 0.0
+    truncated = 0
+    bitrates = set()
+    while offset < end:
+        header = header_at(buf, offset)
+        if header is None:
+            # Not a frame: skip to where frames pick up again, and count what was skipped
+            following = _resync(buf, offset + 1, end)
+            garbage += following - offset
+            offset = following
+            continue
+        if offset + header.frame_size > end:
+            truncated = end - offset
+            break
+        frames += 1
+        seconds += header.samples / header.sample_rate
+        bitrates.add(header.bitrate)
+        offset += header.frame_size
+
+    return AudioScan(
+        start, offset, frames, seconds, header_at(buf, start) or first, xing, garbage, truncated, len(bitrates) > 1
+    )
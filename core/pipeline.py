@@ -0,0 +1,296 @@
+import os
+import requests
+import time
+
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from core.downloader import ChapterDownloader, HostLimiter, chapter_filename, file_checksum
+from core.metadata_editor import apply_tags, build_tags, has_tags
+from core.metrics import TRACER
+from core.mp3_validator import check_audio
+from core.playlist import PlaylistNotFound, fetch_playlist
+
+# Statuses a CDN answers with once a signed chapter link has expired
+EXPIRED_LINK_STATUSES = (403, 410)
+
+
+class DownloadPipeline:
+    """Downloads several books at once with separate scrape and download stages.
+
+    The scrape stage reads the chapter URLs straight from the player page and
+    only opens a browser when that fails. The download stage then streams the
+    chapters while the next book is already being scraped. With tagging on,
+    each chapter is written with its ID3 tag already in front of the audio.
+    """
+
+    def __init__(self, db, driver_pool, books_in_flight=2, per_host_connections=4, chapter_concurrency=4,
+                 content_store=None, tag_on_download=False) -> None:
+        """
+        Args:
+            db (SQLiteDB): The database the finished books are marked in.
+            driver_pool (DriverPool): Leases the browser sessions used when static extraction fails.
+            books_in_flight (int): How many books are scraped, and how many downloaded, at once.
+            per_host_connections (int): The most connections open to a single host across all books.
+            chapter_concurrency (int): How many chapters of one book are downloaded at once.
+            content_store (ContentStore): Where finished chapters are kept by audio checksum, so identical
+                chapters are linked instead of downloaded again. None disables it.
+            tag_on_download (bool): Write each chapter's tags as it downloads and mark finished books
+                edited, so they don't need a separate tagging pass.
+        """
+        self.db = db
+        self.driver_pool = driver_pool
+        self.books_in_flight = books_in_flight
+        self.chapter_concurrency = chapter_concurrency
+        self.limiter = HostLimiter(per_host=per_host_connections)
+        self.content_store = content_store
+        self.tag_on_download = tag_on_download
+
+    def scrape_book(self, audiobook, user_path):
+        """Makes sure the book's chapters are recorded and returns a downloader for them.
+
+        Books that already have chapters from an earlier run aren't scraped again,
+        unless their links turn out to have expired (see ``download_book``).
+        """
+        downloader = ChapterDownloader(pool_size=self.chapter_concurrency, limiter=self.limiter)
+        if self.db.get_chapters(audiobook.id):
+            return downloader
+
+        mp3_urls, downloader = self.scrape_urls(audiobook, user_path, downloader)
+        self.db.add_chapters(audiobook.id, mp3_urls)
+        return downloader
+
+    def scrape_urls(self, audiobook, user_path, downloader):
+        """Reads the book page's chapter URLs, with Chrome if static extraction fails.
+
+        Returns:
+            tuple: (chapter URLs, the downloader to fetch them with). After the Chrome
+                   fallback that's a new downloader with the browser's cookies, and
+                   ``downloader`` has been closed.
+        """
+        title = audiobook.title
+        with TRACER.span("scrape", book=title) as span:
+            try:
+                mp3_urls = fetch_playlist(audiobook.url, downloader.session)
+                method = "static"
+            except (PlaylistNotFound, requests.RequestException) as e:
+                downloader.close()
+                print(f"Static extraction failed for '{title}' ({e}), falling back to Chrome")
+                mp3_urls, downloader, method = self.scrape_book_with_browser(audiobook, user_path)
+
+        print(f"Scraped {len(mp3_urls)} chapter(s) of '{title}' in {time.perf_counter() - span.start:.2f}s ({method})")
+        return mp3_urls, downloader
+
+    def scrape_book_with_browser(self, audiobook, user_path):
+        with self.driver_pool.lease() as driver:
+            driver.prepare(base_path=user_path, title=audiobook.title)
+            driver.scrape_website(url=audiobook.url)
+            downloader = ChapterDownloader.from_driver(
+                driver, pool_size=self.chapter_concurrency, limiter=self.limiter
+            )
+            return list(driver.mp3_urls), downloader, f"chrome-{driver.scrape_method}"
+
+    def chapter_tags(self, audiobook):
+        """Returns a function giving the tags for a chapter file name, as ``edit_books`` would write them."""
+        series_name = audiobook.series_name
+        last_book_number = self.db.get_last_book_number_in_series(series_name) if series_name else None
+        return lambda filename: build_tags(filename, audiobook, last_book_number)
+
+    def download_chapter(self, downloader, chapter, download_path, title, tags_for=None) -> bool:
+        chapter_id, url = chapter.id, chapter.url
+        file_path = os.path.join(download_path, chapter_filename(chapter.chapter_index, title))
+        tags = tags_for(os.path.basename(file_path)) if tags_for else None
+
+        if self.content_store is not None and self.link_stored_chapter(chapter, file_path, tags):
+            return True
+
+        try:
+            with TRACER.span("chapter_download", book=title) as span:
+                received, expected, checksum, audio_checksum = downloader.download_file(url, file_path, tags=tags)
+                span.bytes = received
+        except (requests.RequestException, OSError) as e:
+            part_path = f"{file_path}.part"
+            received = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            if getattr(getattr(e, "response", None), "status_code", None) in EXPIRED_LINK_STATUSES:
+                status = "expired"  # The .part is kept, the fresh link serves the same file
+            else:
+                status = "partial" if received else "failed"
+            self.db.update_chapter(chapter_id, status, received)
+            print(f"Download failed for URL: {url} ({e})")
+            return False
+
+        # A server can answer with an error page or cut the file short and still send a matching size
+        problems, seconds = check_audio(file_path)
+        if problems:
+            os.remove(file_path)
+            self.db.update_chapter(chapter_id, "failed", 0)
+            print(f"Download of URL: {url} isn't usable audio ({'; '.join(problems)})")
+            return False
+
+        self.db.update_chapter(chapter_id, "complete", received, expected_bytes=expected, checksum=checksum,
+                               duration_seconds=seconds, audio_checksum=audio_checksum)
+        if self.content_store is not None:
+            try:
+                self.content_store.add(file_path, audio_checksum, checksum)
+            except OSError as e:
+                print(f"Couldn't add {file_path} to the content store ({e})")
+        return True
+
+    def link_stored_chapter(self, chapter, file_path, tags=None) -> bool:
+        """Places a chapter from the content store if the same URL was downloaded before.
+
+        The stored file is hard-linked when it already carries ``tags``. Otherwise
+        the stored audio is written behind a tag with ``tags``, since a link would
+        only be broken again when the chapter is tagged.
+        """
+        chapter_id, url = chapter.id, chapter.url
+        audio_checksum = self.db.find_chapter_content(url)
+        if not self.content_store.has(audio_checksum):
+            return False
+
+        try:
+            if tags is None or has_tags(self.content_store.path_for(audio_checksum), tags):
+                size = self.content_store.link_to(audio_checksum, file_path)
+            else:
+                size = self.content_store.copy_with_tags(audio_checksum, file_path, tags)
+        except OSError as e:
+            print(f"Couldn't link {file_path} from the content store ({e}), downloading it instead")
+            return False
+        problems, seconds = check_audio(file_path)
+        if problems:
+            os.remove(file_path)
+            print(f"Stored copy of {file_path} isn't usable audio ({'; '.join(problems)}), downloading it instead")
+            return False
+        self.db.update_chapter(chapter_id, "complete", size, expected_bytes=size, checksum=file_checksum(file_path),
+                               duration_seconds=seconds, audio_checksum=audio_checksum)
+        return True
+
+    def download_book(self, audiobook, user_path, downloader, stop=None) -> int:
+        """Downloads every chapter that isn't complete yet and returns how many failed.
+
+        If the server refuses some chapter links (403/410, e.g. expired signed CDN
+        links), the book page is scraped again and those chapters are retried once
+        with their fresh URLs. Once ``stop`` is set, chapters that haven't started
+        are skipped and count as failed.
+        """
+        title = audiobook.title
+        download_path = os.path.join(user_path, title)
+        os.makedirs(download_path, exist_ok=True)
+
+        chapters = [
+            chapter for chapter in self.db.get_chapters(audiobook.id)
+            if not _is_chapter_complete(chapter, os.path.join(download_path, chapter_filename(chapter.chapter_index, title)))
+        ]
+        tags_for = self.chapter_tags(audiobook) if self.tag_on_download else None
+
+        try:
+            failed = self.download_chapters(downloader, chapters, download_path, title, tags_for, stop)
+
+            expired = {chapter.id: chapter.url for chapter in self.db.get_chapters(audiobook.id) if chapter.status == "expired"}
+            if expired:
+                print(f"{len(expired)} chapter link(s) of '{title}' were refused, scraping the book again for fresh ones")
+                mp3_urls, downloader = self.scrape_urls(audiobook, user_path, downloader)
+                if self.db.replace_chapter_urls(audiobook.id, mp3_urls):
+                    retry = [
+                        chapter for chapter in self.db.get_chapters(audiobook.id)
+                        if chapter.id in expired and chapter.url != expired[chapter.id]
+                    ]
+                    failed -= len(retry)
+                    failed += self.download_chapters(downloader, retry, download_path, title, tags_for, stop)
+                else:
+                    print(f"The page of '{title}' gave no new links for its {len(expired)} refused chapter(s)")
+        finally:
+            downloader.close()
+        return failed
+
+    def download_chapters(self, downloader, chapters, download_path, title, tags_for, stop=None) -> int:
+        """Downloads ``chapters`` concurrently and returns how many failed or were skipped after ``stop``."""
+        def download(chapter):
+            if stop is not None and stop.is_set():
+                return False
+            return self.download_chapter(downloader, chapter, download_path, title, tags_for)
+
+        with ThreadPoolExecutor(max_workers=self.chapter_concurrency) as executor:
+            results = list(executor.map(download, chapters))
+        return results.count(False)
+
+    def tag_book(self, audiobook, user_path) -> bool:
+        """Makes sure every chapter of a finished book carries its tags.
+
+        Chapters downloaded or placed from the content store with their tags only
+        have their tag read, so hard links to the store are kept. The rest, e.g.
+        ones finished before tagging was turned on, are tagged now.
+
+        Returns:
+            bool: True if every chapter is tagged.
+        """
+        tags_for = self.chapter_tags(audiobook)
+        download_path = os.path.join(user_path, audiobook.title)
+        tagged = True
+        for chapter in self.db.get_chapters(audiobook.id):
+            filename = chapter_filename(chapter.chapter_index, audiobook.title)
+            try:
+                apply_tags(os.path.join(download_path, filename), tags_for(filename))
+            except Exception as e:  # mutagen raises its own errors for damaged tags
+                print(f"Couldn't tag {filename} ({e}), it's left for the tagging pass")
+                tagged = False
+        return tagged
+
+    def run(self, audiobooks, stop=None) -> None:
+        """Runs every (audiobook, user_path) pair through both stages.
+
+        ``audiobooks`` can be any iterable, such as a generator over
+        ``SQLiteDB.iter_audiobooks``. It is read lazily: about ``books_in_flight``
+        books are being scraped at a time, at most twice that are in the pipeline,
+        and the next book is only pulled once one of them moves on. Once ``stop``
+        (a ``threading.Event``) is set, no more books or chapters are started.
+
+        A book is marked downloaded as soon as every one of its chapters has been
+        verified. Books with missing chapters are picked up again on the next run,
+        which only fetches what is still missing.
+        """
+        books = iter(audiobooks)
+        with ThreadPoolExecutor(max_workers=self.books_in_flight) as scrape_pool, \
+                ThreadPoolExecutor(max_workers=self.books_in_flight) as download_pool:
+            pending = {}
+
+            def fill() -> None:
+                # Downloads are slower than scrapes, so the scrape stage also waits for room in the download stage
+                scraping = sum(stage == "scrape" for stage, _, _ in pending.values())
+                while (stop is None or not stop.is_set()) and scraping < self.books_in_flight and len(pending) < 2 * self.books_in_flight:
+                    book = next(books, None)
+                    if book is None:
+                        return
+                    audiobook, user_path = book
+                    pending[scrape_pool.submit(self.scrape_book, audiobook, user_path)] = ("scrape", audiobook, user_path)
+                    scraping += 1
+
+            fill()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, audiobook, user_path = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"Failed to {stage} '{audiobook.title}': {e}")
+                        continue
+
+                    if stage == "scrape":
+                        download_future = download_pool.submit(self.download_book, audiobook, user_path, result, stop)
+                        pending[download_future] = ("download", audiobook, user_path)
+                    elif self.db.all_chapters_verified(audiobook.id):
+                        self.db.mark_audiobook_bool(column_name='downloaded', audiobook_id=audiobook.id)
+                        if self.tag_on_download and self.tag_book(audiobook, user_path):
+                            self.db.mark_audiobook_bool(column_name='edited', audiobook_id=audiobook.id)
+                        print(f"Finished downloading '{audiobook.title}'")
+                    else:
+                        print(f"{result} chapter(s) of '{audiobook.title}' failed to download, it will be resumed next run")
+                fill()
+
+def _is_chapter_complete(chapter, file_path) -> bool:
+    """True if a chapter finished in an earlier run and its file is still there.
+
+    The size isn't compared, since tagging changes it; damaged files are found by
+    the audio check (``podcatcher.py verify``), which resets their status.
+    """
+    return chapter.status == "complete" and os.path.exists(file_path)
@@ -0,0 +1,174 @@
+import json
+import re
+
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+AUDIO_EXTENSIONS = (".mp3", ".m4a", ".m4b", ".aac", ".ogg", ".opus")
+
+# Attributes a playlist item may carry its chapter URL in
+ITEM_URL_ATTRIBUTES = ("data-src", "data-url", "data-mp3", "data-file", "data-audio", "href")
+
+# Elements that never get an end tag, so they don't open a nesting level
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+# Quoted strings inside inline scripts, e.g. the player's track list
+SCRIPT_STRING_PATTERN = re.compile(r'"((?:[^"\\]|\\.)*)"|\'((?:[^\'\\]|\\.)*)\'')
+
+
+class PlaylistNotFound(Exception):
+    """Raised when a page's chapter list can't be read without a browser."""
+
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def is_audio_url(url: str) -> bool:
+    return urlsplit(url).path.lower().endswith(AUDIO_EXTENSIONS)
+
+
+def normalize_url(url: str) -> str:
+    """Returns the form a chapter URL is stored and compared in.
+
+    The scheme and host are lowercased, default ports and fragments are dropped
+    and surrounding whitespace is stripped. The path and query are kept as they
+    are, since signed CDN links depend on them.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    if parts.username:
+        host = f"{parts.username}{':' + parts.password if parts.password else ''}@{host}"
+    return urlunsplit((scheme, host, parts.path or "/", parts.query, ""))
+
+
+def unique_urls(urls) -> list:
+    """Normalises ``urls`` and drops repeats, keeping the first occurrence of each."""
+    seen = set()
+    return [url for url in map(normalize_url, urls) if not (url in seen or seen.add(url))]
+
+
+class _PlaylistParser(HTMLParser):
+    """Collects the ``#plList`` items, the ``#audio1`` source and inline scripts of a player page."""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.item_count = 0
+        self.item_urls = []
+        self.player_src = None
+        self.scripts = []
+
+        self._list_depth = 0  # > 0 while inside #plList
+        self._in_item = False
+        self._item_url = None
+        self._in_script = False
+        self._in_player = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+
+        if tag in VOID_TAGS:
+            pass
+        elif self._list_depth:
+            self._list_depth += 1
+        elif attrs.get("id") == "plList":
+            self._list_depth = 1
+
+        if self._list_depth and tag == "li":
+            self._in_item = True
+            self._item_url = None
+            self.item_count += 1
+
+        if self._in_item and self._item_url is None:
+            for name in ITEM_URL_ATTRIBUTES:
+                value = attrs.get(name)
+                if value and is_audio_url(value):
+                    self._item_url = value
+                    break
+
+        if tag == "audio" and attrs.get("id") == "audio1":
+            self._in_player = True
+            self.player_src = attrs.get("src") or self.player_src
+        elif tag == "source" and self._in_player and not self.player_src:
+            self.player_src = attrs.get("src")
+        elif tag == "script":
+            self._in_script = True
+
+    def handle_endtag(self, tag):
+        if self._in_item and tag == "li":
+            if self._item_url:
+                self.item_urls.append(self._item_url)
+            self._in_item = False
+        if tag == "audio":
+            self._in_player = False
+        elif tag == "script":
+            self._in_script = False
+
+        if self._list_depth and tag not in VOID_TAGS:
+            self._list_depth -= 1
+
+    def handle_data(self, data):
+        if self._in_script:
+            self.scripts.append(data)
+
+
+def _script_audio_urls(scripts) -> list:
+    """Returns every quoted audio URL found in the page's inline scripts, in order."""
+    urls = []
+    for script in scripts:
+        for match in SCRIPT_STRING_PATTERN.finditer(script):
+            raw = match.group(1) if match.group(1) is not None else match.group(2)
+            try:
+                value = json.loads(f'"{raw}"')  # Undo JSON escapes such as "\/"
+            except ValueError:
+                value = raw
+            if is_audio_url(value):
+                urls.append(value)
+    return urls
+
+
+def extract_playlist(html: str, base_url: str) -> list:
+    """Reads the full chapter URL list from a player page's HTML.
+
+    The ``#plList`` items are checked for a chapter URL first. If they don't
+    carry one, the embedded player data in the inline scripts is used instead.
+
+    Args:
+        html (str): The page source.
+        base_url (str): The page URL, used to resolve relative chapter links.
+
+    Returns:
+        list: Normalised, absolute chapter URLs in playlist order, without repeats.
+
+    Raises:
+        PlaylistNotFound: If the page has no playlist or the chapter count doesn't match it.
+    """
+    parser = _PlaylistParser()
+    parser.feed(html)
+    parser.close()
+
+    if not parser.item_count:
+        raise PlaylistNotFound("No #plList items found in the page")
+
+    if len(parser.item_urls) == parser.item_count:
+        urls = parser.item_urls
+    else:
+        urls = _script_audio_urls(parser.scripts)
+        if not urls and parser.player_src and parser.item_count == 1:
+            urls = [parser.player_src]
+
+    # Counted after dropping repeats, so items that share a URL don't quietly shorten the book
+    urls = unique_urls(urljoin(base_url, url) for url in urls)
+    if len(urls) != parser.item_count:
+        raise PlaylistNotFound(f"Found {len(urls)} chapter URL(s) for {parser.item_count} playlist item(s)")
+
+    return urls
+
+
+def fetch_playlist(url: str, session, timeout=30) -> list:
+    """Downloads a player page with ``session`` and extracts its chapter URLs in one request."""
+    response = session.get(url, timeout=timeout)
+    response.raise_for_status()
+    return extract_playlist(response.text, base_url=response.url)
@@ -1,9 +1,13 @@
+import json
 import os
 import re
 import requests
 import shutil
+import subprocess
 import zipfile
 
+from core.downloader import file_checksum
+
 def get_chrome_version():
     """Retrieve the installed Chrome version by checking the version directory."""
     chrome_path = r"C:\Program Files\Google\Chrome\Application"
@@ -27,18 +31,78 @@ def get_chrome_version():
         raise RuntimeError(f"Error retrieving Chrome version: {e}")
 
 
+MANIFEST_URL = "https://googlechromelabs.github.io/chrome-for-testing/known-good-versions-with-downloads.json"
+
+
+def parse_version(version):
+    """Turn "124.0.6367.91" into (124, 0, 6367, 91)."""
+    return tuple(int(part) for part in version.split('.'))
+
+
 class ChromeDriverUpdater:
-    def __init__(self, download_dir, driver_path):
+    def __init__(self, download_dir, driver_path, base_url=MANIFEST_URL, platform="win64"):
         self.download_dir = download_dir
         self.driver_path = driver_path
-        self.base_url = "https://googlechromelabs.github.io/chrome-for-testing/known-good-versions-with-downloads.json"
+        self.base_url = base_url
+        self.platform = platform
+
+        # The manifest and its ETag/Last-Modified are cached next to the downloads
+        self.manifest_path = os.path.join(self.download_dir, "chromedriver-manifest.json")
+        self.cache_info_path = os.path.join(self.download_dir, "chromedriver-manifest.info.json")
+
+
+    def load_cache_info(self):
+        try:
+            with open(self.cache_info_path, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+
+    def save_cache_info(self, cache_info):
+        with open(self.cache_info_path, 'w') as file:
+            json.dump(cache_info, file)
 
 
     def get_latest_chromedriver_info(self):
-        """Retrieve the latest ChromeDriver version info."""
-        response = requests.get(self.base_url)
-        data = response.json()
-        return data['versions']
+        """Retrieve the ChromeDriver versions, revalidating the cached manifest instead of re-downloading it."""
+        cache_info = self.load_cache_info()
+        headers = {}
+        if os.path.exists(self.manifest_path):
+            if cache_info.get('etag'):
+                headers['If-None-Match'] = cache_info['etag']
+            if cache_info.get('last_modified'):
+                headers['If-Modified-Since'] = cache_info['last_modified']
+
+        try:
+            response = requests.get(self.base_url, headers=headers, timeout=30)
+        except requests.RequestException as e:
+            if not os.path.exists(self.manifest_path):
+                raise
+            print(f"Couldn't reach the ChromeDriver manifest ({e}), using the cached copy")
+            response = None
+
+        if response is not None and response.status_code != 304:
+            response.raise_for_status()
+            with open(self.manifest_path, 'wb') as file:
+                file.write(response.content)
+            cache_info['etag'] = response.headers.get('ETag')
+            cache_info['last_modified'] = response.headers.get('Last-Modified')
+            self.save_cache_info(cache_info)
+
+        with open(self.manifest_path, 'r') as file:
+            return json.load(file)['versions']
+
+
+    def build_version_index(self, versions):
+        """Map each (major, build) to its (version tuple, driver URL) pairs for this platform."""
+        index = {}
+        for item in versions:
+            for driver in item.get('downloads', {}).get('chromedriver', []):
+                if driver['platform'] == self.platform:
+                    version = parse_version(item['version'])
+                    index.setdefault((version[0], version[2]), []).append((version, driver['url']))
+        return index
 
 
     def get_version_distance(self, version1, version2):
@@ -54,47 +118,68 @@ class ChromeDriverUpdater:
 
 
     def get_compatible_chromedriver_url(self, chrome_version):
-        """Get the download URL for ChromeDriver compatible with the closest Chrome version."""
-        versions = self.get_latest_chromedriver_info()
-        closest_version = None
-        min_distance = float('inf')
-        
-        for item in versions:
-            version = item['version']
-            distance = self.get_version_distance(chrome_version, version)
-            if distance < min_distance:
-                min_distance = distance
-                closest_version = version
-        
-        if not closest_version:
-            raise ValueError("No compatible ChromeDriver found for Chrome version.")
-        
-        # Find the download URL for the closest version
-        for item in versions:
-            if item['version'] == closest_version:
-                for driver in item['downloads']['chromedriver']:
-                    if driver['platform'] == 'win64':  # Assuming 'win64' platform; adjust as necessary
-                        return driver['url']
-        raise ValueError("No compatible ChromeDriver URL found for the closest version.")
-                    
+        """Get the download URL for ChromeDriver compatible with the closest Chrome version.
+
+        Candidates with the same major and build number as Chrome are preferred,
+        then the same major version, then the closest version overall.
+        """
+        index = self.build_version_index(self.get_latest_chromedriver_info())
+        if not index:
+            raise ValueError(f"No ChromeDriver downloads found for platform {self.platform}.")
+
+        chrome = parse_version(chrome_version)
+        candidates = index.get((chrome[0], chrome[2]))
+        if not candidates:
+            candidates = [entry for (major, _), entries in index.items() if major == chrome[0] for entry in entries]
+        if not candidates:
+            candidates = [entry for entries in index.values() for entry in entries]
+
+        _, url = min(candidates, key=lambda entry: self.get_version_distance(chrome_version, '.'.join(map(str, entry[0]))))
+        return url
+
+
+    def get_installed_driver_version(self):
+        """Return the installed ChromeDriver's version, or None if there isn't a working one."""
+        if not self.driver_path or not os.path.exists(self.driver_path):
+            return None
+        try:
+            output = subprocess.run([self.driver_path, "--version"], capture_output=True, text=True, timeout=10).stdout
+        except (OSError, subprocess.SubprocessError):
+            return None
+        match = re.search(r'(\d+\.\d+\.\d+\.\d+)', output)
+        return match.group(1) if match else None
+
 
     def download_latest_driver(self, latest_version, download_url):
-        """Download and update the ChromeDriver if compatible with installed Chrome."""
+        """Download and update the ChromeDriver if compatible with installed Chrome.
+
+        A zip that was already downloaded from the same URL is reused once its
+        checksum matches the one recorded when it was first downloaded.
+        """
         try:
             zip_path = os.path.join(self.download_dir, "chromedriver.zip")
-
-            # Download the zip file
-            response = requests.get(download_url, stream=True)
-            with open(zip_path, 'wb') as file:
-                shutil.copyfileobj(response.raw, file)
+            cache_info = self.load_cache_info()
+            checksums = cache_info.setdefault('checksums', {})
+
+            if os.path.exists(zip_path) and checksums.get(download_url) == file_checksum(zip_path):
+                print(f"Reusing verified ChromeDriver {latest_version} download")
+            else:
+                # Download the zip file
+                response = requests.get(download_url, stream=True, timeout=60)
+                response.raise_for_status()
+                with open(zip_path, 'wb') as file:
+                    for chunk in response.iter_content(chunk_size=1024 * 1024):
+                        file.write(chunk)
+                checksums[download_url] = file_checksum(zip_path)
+                self.save_cache_info(cache_info)
 
             # Extract the zip file
             with zipfile.ZipFile(zip_path, 'r') as zip_ref:
                 zip_ref.extractall(self.download_dir)
 
             # The extracted folder will have the name "chromedriver-win64"
-            extracted_folder = os.path.join(self.download_dir, "chromedriver-win64")
-            driver_executable = os.path.join(extracted_folder, "chromedriver.exe")  # Modify based on OS
+            extracted_folder = os.path.join(self.download_dir, f"chromedriver-{self.platform}")
+            driver_executable = os.path.join(extracted_folder, "chromedriver.exe" if self.platform.startswith("win") else "chromedriver")
 
             # Replace the old driver with the new one
             if os.path.exists(self.driver_path):
@@ -109,9 +194,21 @@ class ChromeDriverUpdater:
         """Update ChromeDriver if necessary."""
         try:
             chrome_version = get_chrome_version()
+
+            # ChromeDriver matches Chrome on major and build number, so a matching driver needs no network at all
+            installed_version = self.get_installed_driver_version()
+            if installed_version:
+                installed, chrome = parse_version(installed_version), parse_version(chrome_version)
+                if (installed[0], installed[2]) == (chrome[0], chrome[2]):
+                    print(f"ChromeDriver {installed_version} already matches Chrome {chrome_version}")
+                    return
+
             latest_chromedriver_url = self.get_compatible_chromedriver_url(chrome_version)
             # Extract the version from URL to use it in download method
             latest_version = latest_chromedriver_url.split('/')[-3]
+            if latest_version == installed_version:
+                print(f"ChromeDriver {installed_version} is already the closest match for Chrome {chrome_version}")
+                return
             self.download_latest_driver(latest_version, latest_chromedriver_url)
         except Exception as e:
             print(f"Update failed: {e}")
@@ -0,0 +1,300 @@
+import json
+import os
+import time
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from core.config import PROJECT_SETTING
+from core.download_watcher import DownloadWatcher
+from core.downloader import chapter_filename
+from core.metrics import TRACER
+from core.playlist import is_audio_url, normalize_url
+
+# URL patterns blocked when a session is created with block_resources=True
+BLOCKED_RESOURCE_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    "*.mp3", "*.m4a", "*.mp4", "*.webm",
+]
+
+# Ad, analytics and tracking scripts that "network" scrape mode also blocks. setBlockedURLs only takes
+# wildcards, so third-party scripts are matched by the hosts they usually come from.
+THIRD_PARTY_SCRIPT_PATTERNS = [
+    "*googletagmanager.com*", "*google-analytics.com*", "*googlesyndication.com*", "*doubleclick.net*",
+    "*adservice.google.*", "*googleadservices.com*", "*facebook.net*", "*connect.facebook.*",
+    "*hotjar.com*", "*scorecardresearch.com*", "*quantserve.com*", "*taboola.com*", "*outbrain.com*",
+    "*amazon-adsystem.com*", "*adnxs.com*", "*criteo.*", "*disqus.com*", "*cloudflareinsights.com*",
+]
+
+# Steps through the playlist inside the page. Each click waits for the player's "loadstart" (or a
+# short timeout) so the browser requests every chapter, rather than only the last one set.
+ADVANCE_PLAYLIST_SCRIPT = """
+const [count, done] = [arguments[0], arguments[arguments.length - 1]];
+const audio = document.getElementById("audio1");
+const next = document.getElementById("btnNext");
+audio.preload = "auto";
+const started = () => new Promise(resolve => {
+    const timer = setTimeout(resolve, 1000);
+    audio.addEventListener("loadstart", () => { clearTimeout(timer); resolve(); }, {once: true});
+});
+(async () => {
+    let pending = started();
+    audio.load();
+    await pending;
+    for (let i = 1; i < count; i++) {
+        pending = started();
+        next.click();
+        await pending;
+    }
+    done(true);
+})();
+"""
+
+
+class WebsiteDriver(webdriver.Chrome):
+    def __init__(self, driver_path=PROJECT_SETTING.DRIVER_PATH, teardown=False, base_path=PROJECT_SETTING.JACKSON, title=None, download_mode=PROJECT_SETTING.DOWNLOAD_MODE, headless=False, block_resources=False, scrape_mode=PROJECT_SETTING.SCRAPE_MODE) -> None:
+        self.mp3_urls = []
+        self.scrape_mode = scrape_mode
+        self.scrape_method = None  # How the last book was actually scraped, "network" or "dom"
+        self.default_path = PROJECT_SETTING.DEFAULT_PATH
+        self.download_mode = download_mode
+        self.download_path = None
+        self.block_resources = block_resources
+
+        # Set the download directory
+        chrome_options = Options()
+        if headless:
+            chrome_options.add_argument("--headless=new")
+            chrome_options.add_argument("--window-size=1920,1080")
+        else:
+            chrome_options.add_argument("--start-maximized")
+        chrome_options.add_argument("--log-level=0")
+        chrome_options.add_argument("--dns-prefetch-disable")
+        chrome_options.add_experimental_option('excludeSwitches', ['enable-logging', 'enable-automation'])
+        chrome_options.add_experimental_option('useAutomationExtension', False)
+        if scrape_mode == "network":
+            # Lets the DevTools network events be read back with get_log("performance")
+            chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        chrome_options.add_experimental_option("prefs", {
+            "download.default_directory": self.default_path,
+            "download.prompt_for_download": True,
+            "download.directory_upgrade": True,
+            "safebrowsing.enabled": True
+        })
+
+        self.driver_path = driver_path
+        self.chrome_service = Service(self.driver_path)
+        self.teardown = teardown
+        with TRACER.span("chrome_startup"):
+            super(WebsiteDriver, self).__init__(service=self.chrome_service, options=chrome_options)
+        self.implicitly_wait(5)
+
+        # "gui" downloads open the chapters in this browser, so nothing can be blocked for them
+        if (block_resources or scrape_mode == "network") and download_mode != "gui":
+            # Images, fonts and media aren't needed to read the playlist. Blocked media requests
+            # still show up in the network log, so the chapter URLs are captured without downloading them.
+            blocked = BLOCKED_RESOURCE_PATTERNS + (THIRD_PARTY_SCRIPT_PATTERNS if scrape_mode == "network" else [])
+            self.execute_cdp_cmd("Network.enable", {})
+            self.execute_cdp_cmd("Network.setBlockedURLs", {"urls": blocked})
+
+        if title is not None:
+            self.prepare(base_path=base_path, title=title)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.teardown:
+            self.quit()
+
+    def prepare(self, base_path, title) -> None:
+        """Points the session at a book's download folder, creating it if needed."""
+        download_path = os.path.join(base_path, title)
+        os.makedirs(download_path, exist_ok=True)
+        self.download_path = download_path
+
+    def reset(self) -> None:
+        """Clears everything a previous book left behind so the session can be leased again."""
+        self.mp3_urls = []
+        self.download_path = None
+        self.scrape_method = None
+
+        # Close any extra tabs and return to a blank page
+        for handle in self.window_handles[1:]:
+            self.switch_to.window(handle)
+            self.close()
+        self.switch_to.window(self.window_handles[0])
+
+        # Clear the site's storage while its page is still open, then every cookie in the browser:
+        # delete_all_cookies only reaches the current page's domain, which is none on about:blank
+        try:
+            self.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+        except WebDriverException:
+            pass  # about:blank and error pages have no storage to clear
+        self.get("about:blank")
+        self.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        if self.scrape_mode == "network":
+            try:
+                self.get_log("performance")  # Drop the previous book's network events
+            except WebDriverException:
+                pass  # This Chrome has no performance log, scrape_website reads the player instead
+
+    def scrape_website(self, url):
+        """Collects the chapter URLs of a book page into ``mp3_urls``.
+
+        "network" mode reads them from the browser's network events and falls back
+        to the "dom" mode, which reads the player's ``src`` after every click, if it
+        doesn't find one per playlist item or Chrome rejects the capture (no
+        performance log, a script timeout, ...).
+        """
+        if self.scrape_mode == "network":
+            try:
+                with TRACER.span("scrape.network"):
+                    found = self.scrape_website_network(url)
+            except WebDriverException as e:
+                print(f"Network capture failed on {url} ({e.__class__.__name__}), reading the player instead")
+            else:
+                if found:
+                    self.scrape_method = "network"
+                    return
+                print(f"Network capture missed chapters on {url}, reading the player instead")
+
+        with TRACER.span("scrape.dom"):
+            self.scrape_website_dom(url)
+        self.scrape_method = "dom"
+
+    def audio_requests(self) -> list:
+        """Returns the audio URLs requested since the network log was last read, in request order."""
+        urls = []
+        for entry in self.get_log("performance"):
+            message = json.loads(entry["message"])["message"]
+            if message["method"] != "Network.requestWillBeSent":
+                continue
+            params = message["params"]
+            url = params["request"]["url"]
+            if params.get("type") == "Media" or is_audio_url(url):
+                urls.append(url)
+        return urls
+
+    def scrape_website_network(self, url, timeout=10.0) -> bool:
+        """Steps through the playlist in one script and picks the chapter requests out of the network log.
+
+        Returns:
+            bool: True if a URL was found for every playlist item.
+        """
+        self.get_log("performance")  # Start from an empty log
+        self.get(url)
+        wait = WebDriverWait(self, 100)
+        pl_list = wait.until(EC.visibility_of_element_located((By.ID, "plList")))
+        num_items = len(pl_list.find_elements(By.TAG_NAME, "li"))
+        wait.until(EC.presence_of_element_located((By.ID, "btnNext")))
+
+        self.set_script_timeout(10 + 1.5 * num_items)
+        self.execute_async_script(ADVANCE_PLAYLIST_SCRIPT, num_items)
+
+        # The last requests can land in the log a moment after the script returns
+        urls, seen = [], set()
+        deadline = time.monotonic() + timeout
+        while True:
+            for mp3_url in map(normalize_url, self.audio_requests()):
+                if mp3_url not in seen:
+                    seen.add(mp3_url)
+                    urls.append(mp3_url)
+            if len(urls) >= num_items or time.monotonic() > deadline:
+                break
+            time.sleep(0.1)
+
+        if len(urls) != num_items:
+            return False
+        self.mp3_urls = urls
+        return True
+
+    def scrape_website_dom(self, url):
+        self.get(url)
+
+        # Wait for the "plList" class to be visible
+        wait = WebDriverWait(self, 100)
+        pl_list = wait.until(EC.visibility_of_element_located((By.ID, "plList")))
+
+        # Count the number of items in the list
+        num_items = len(pl_list.find_elements(By.TAG_NAME, "li"))
+
+        # Find the "btnNext" button
+        btn_next = wait.until(EC.visibility_of_element_located((By.ID, "btnNext")))
+
+        # Scroll the element into view
+        self.execute_script("arguments[0].scrollIntoView(true);", btn_next)
+
+        # Click the "btnNext" button for each item in the list
+        seen = set(self.mp3_urls)
+        mp3_url = None
+        for i in range(num_items):
+
+            if i > 0:
+                # Trigger the click event manually using JavaScript
+                self.execute_script("arguments[0].click();", btn_next)
+            
+            # Wait for the "audio1" element to be present
+            audio1_element = wait.until(EC.presence_of_element_located((By.XPATH, "//*[@id='audio1']")))
+            # The player can lag behind the click, so give it a moment to move on from the last chapter
+            previous = mp3_url
+            try:
+                WebDriverWait(self, 5).until(lambda driver: normalize_url(audio1_element.get_attribute("src") or "") != previous)
+            except TimeoutException:
+                pass
+            # Get the "src" attribute value
+            mp3_url = normalize_url(audio1_element.get_attribute("src"))
+            if mp3_url not in seen:
+                seen.add(mp3_url)
+                self.mp3_urls.append(mp3_url)
+
+
+    def download_mp3_files(self, title) -> list:
+        """Saves the scraped chapters through the browser's "Save As" dialog ("gui" mode) and returns the URLs that failed.
+
+        "http" mode doesn't come through here: DownloadPipeline streams those
+        chapters and records their progress in the chapters table.
+        """
+        import pyautogui  # Needs a desktop session, so only loaded for this mode
+
+        wait = WebDriverWait(self, 20)
+        chapter_urls = {}
+
+        # Start every chapter's "Save As" download, then wait for all of them together
+        for ind, mp3_url in enumerate(self.mp3_urls):
+            self.execute_script("window.open('');")
+            self.switch_to.window(self.window_handles[-1])
+            self.get(mp3_url)
+            current_chapter_name = chapter_filename(ind, title)
+            chapter_urls[current_chapter_name] = mp3_url
+            
+            # Wait for the page to load                 
+            wait.until(EC.visibility_of_all_elements_located((By.TAG_NAME, "body")))
+            
+            time.sleep(2.5)
+            pyautogui.press('tab', presses=5, interval=.1)
+            
+            time.sleep(.5)
+            pyautogui.press('enter', presses=2)
+            
+            time.sleep(1)
+            pyautogui.write(message=current_chapter_name, interval=.1)
+            
+            time.sleep(2)
+            pyautogui.press('enter', presses=1)
+            
+            # Close the current tab, the download carries on in the background
+            self.close()
+            self.switch_to.window(self.window_handles[0])
+
+        # Wait for files to finish downloading and move them into the book folder
+        watcher = DownloadWatcher(self.default_path)
+        results = watcher.wait_for(chapter_urls, self.download_path, timeout=60 + 20 * len(chapter_urls))
+
+        failed = [chapter_urls[name] for name, new_path in results.items() if new_path is None]
+        for mp3_url in failed:
+            print(f"Download didn't finish in time for URL: {mp3_url}")
+        return failed
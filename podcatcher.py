@@ -0,0 +1,210 @@
+"""Command line entry point.
+
+    python podcatcher.py add "Title" "Author" URL Jackson --series "Series" --book-number 2
+    python podcatcher.py import catalog.csv
+    python podcatcher.py download
+    python podcatcher.py tag
+    python podcatcher.py verify
+    python podcatcher.py join --output-dir D:\\Joined
+    python podcatcher.py worker download --processes 2 --daemon
+    python podcatcher.py status
+    python podcatcher.py update-driver
+
+Each command imports only what it needs, so ``status`` and ``tag`` don't load
+Selenium, requests or the download pipeline.
+"""
+import argparse
+import sys
+import time
+
+
+def open_db(args):
+    from core.database import SQLiteDB
+
+    db = SQLiteDB(db_path=args.db) if args.db else SQLiteDB()
+    db.migrate()
+    return db
+
+
+def export_metrics(args) -> None:
+    from core.config import PROJECT_SETTING
+    from core.metrics import TRACER
+
+    report_path = TRACER.export(args.metrics_dir or PROJECT_SETTING.METRICS_DIR)
+    print(f"Run report written to {report_path}")
+
+
+def add(args) -> None:
+    from audio_collector import check_and_add_audiobooks
+
+    db = open_db(args)
+    check_and_add_audiobooks(db, [(args.title, args.author, args.series, args.book_number, args.url, args.user)])
+    db.disconnect()
+
+
+def import_catalog(args):
+    from core.catalog_import import CatalogError, CatalogImporter
+
+    db = open_db(args)
+    try:
+        CatalogImporter(db).run(args.catalog)
+    except (CatalogError, OSError) as e:
+        print(f"Import failed: {e}")
+        return 1
+    finally:
+        db.disconnect()
+
+
+def download(args) -> None:
+    from audio_collector import check_chromedriver, download_books
+
+    db = open_db(args)
+    if not args.skip_driver_update:
+        check_chromedriver()
+    download_books(db=db)
+    db.disconnect()
+    export_metrics(args)
+
+
+def tag(args) -> None:
+    from audio_collector import edit_books
+
+    db = open_db(args)
+    edit_books(db=db)
+    db.disconnect()
+    export_metrics(args)
+
+
+def verify(args) -> None:
+    from audio_collector import validate_books
+
+    db = open_db(args)
+    validate_books(db=db, book_id=args.book_id, workers=args.workers)
+    db.disconnect()
+    export_metrics(args)
+
+
+def join(args):
+    from audio_collector import join_books
+    from core.config import PROJECT_SETTING
+
+    output_dir = args.output_dir or PROJECT_SETTING.JOINED_BOOKS_DIR
+    if not output_dir:
+        print("Set JOINED_BOOKS_DIR in .env or pass --output-dir")
+        return 1
+    db = open_db(args)
+    join_books(db=db, output_dir=output_dir, force=args.force)
+    db.disconnect()
+    export_metrics(args)
+
+
+def run_worker_process(db_path, kind, daemon, poll_seconds) -> None:
+    """One worker process. Each process opens its own connection to the database."""
+    from audio_collector import run_worker
+    from core.database import SQLiteDB
+
+    db = SQLiteDB(db_path=db_path) if db_path else SQLiteDB()
+    counts = run_worker(db, kind, daemon=daemon, poll_seconds=poll_seconds)
+    db.disconnect()
+    print(f"{kind} worker finished: {counts}")
+
+
+def worker(args) -> None:
+    db = open_db(args)  # Migrates once, before the workers start
+    if args.retry_dead:
+        print(f"Requeued {db.requeue_dead_jobs(args.kind, now=time.time())} dead {args.kind} job(s)")
+    db.disconnect()
+
+    if args.processes <= 1:
+        run_worker_process(args.db, args.kind, args.daemon, args.poll)
+        return
+
+    import multiprocessing
+
+    processes = [
+        multiprocessing.Process(target=run_worker_process, args=(args.db, args.kind, args.daemon, args.poll))
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+
+
+def status(args) -> None:
+    db = open_db(args)
+    summary = db.get_status()
+    jobs = db.get_job_counts()
+    db.disconnect()
+
+    print(f"{summary['books']} book(s): {summary['downloaded']} downloaded, {summary['edited']} tagged")
+    for chapter_status, (count, received_bytes) in sorted(summary["chapters"].items()):
+        print(f"  {chapter_status:9} {count:6} chapter(s) {received_bytes / 1e6:10.1f} MB")
+    for (kind, job_status), count in sorted(jobs.items()):
+        print(f"  {kind} jobs {job_status:7} {count:6}")
+
+
+def update_driver(args) -> None:
+    from audio_collector import check_chromedriver
+
+    check_chromedriver()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="podcatcher", description="Download and tag audiobooks.")
+    parser.add_argument("--db", help="database file (defaults to core/audio_downloads.sql)")
+    parser.add_argument("--metrics-dir", help="where run reports are written (defaults to METRICS_DIR)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = commands.add_parser("add", help="add a book to download")
+    add_parser.add_argument("title")
+    add_parser.add_argument("author")
+    add_parser.add_argument("url")
+    add_parser.add_argument("user", help="whose library the book goes in, e.g. Jackson")
+    add_parser.add_argument("--series", default=None)
+    add_parser.add_argument("--book-number", type=int, default=None)
+    add_parser.set_defaults(handler=add)
+
+    import_parser = commands.add_parser("import", help="add every book in a CSV or JSONL catalog")
+    import_parser.add_argument("catalog", help="columns: title, author, series_name, book_number, url, user")
+    import_parser.set_defaults(handler=import_catalog)
+
+    download_parser = commands.add_parser("download", help="download every book that isn't downloaded yet")
+    download_parser.add_argument("--skip-driver-update", action="store_true", help="don't check ChromeDriver first")
+    download_parser.set_defaults(handler=download)
+
+    commands.add_parser("tag", help="tag every downloaded book that isn't tagged yet").set_defaults(handler=tag)
+    verify_parser = commands.add_parser("verify", help="check downloaded chapters' audio and requeue bad ones")
+    verify_parser.add_argument("--book-id", type=int, default=None, help="only check this book")
+    verify_parser.add_argument("--workers", type=int, default=None, help="checking processes")
+    verify_parser.set_defaults(handler=verify)
+
+    join_parser = commands.add_parser("join", help="join each downloaded book into one chaptered MP3")
+    join_parser.add_argument("--output-dir", help="defaults to JOINED_BOOKS_DIR")
+    join_parser.add_argument("--force", action="store_true", help="rejoin books that were already joined")
+    join_parser.set_defaults(handler=join)
+
+    worker_parser = commands.add_parser("worker", help="work through the download or tag job queue")
+    worker_parser.add_argument("kind", choices=("download", "tag"))
+    worker_parser.add_argument("--processes", type=int, default=1, help="worker processes to start")
+    worker_parser.add_argument("--daemon", action="store_true", help="keep running and pick up new books")
+    worker_parser.add_argument("--poll", type=float, default=10.0, help="seconds between checks in daemon mode")
+    worker_parser.add_argument("--retry-dead", action="store_true", help="requeue jobs that ran out of attempts")
+    worker_parser.set_defaults(handler=worker)
+
+    commands.add_parser("status", help="show download and tagging progress").set_defaults(handler=status)
+    commands.add_parser("update-driver", help="update ChromeDriver to match Chrome").set_defaults(handler=update_driver)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,20 @@
+import os
+
+from core.content_store import ContentStore
+
+
+def test_chapters_are_only_stored_as_hard_links(tmp_path, monkeypatch):
+    chapter = tmp_path / "chapter.mp3"
+    chapter.write_bytes(b"audio")
+    store = ContentStore(str(tmp_path / "store"))
+
+    def other_drive(source, target):
+        raise OSError(18, "Invalid cross-device link")
+
+    monkeypatch.setattr(os, "link", other_drive)
+    assert store.add(str(chapter), "ab" * 32, "cd" * 32) is False
+    assert not store.has("ab" * 32)
+
+    monkeypatch.undo()
+    assert store.add(str(chapter), "ab" * 32, "cd" * 32) is False
+    assert os.path.samefile(store.path_for("ab" * 32), chapter)
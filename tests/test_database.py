@@ -0,0 +1,51 @@
+import sqlite3
+
+from core.database import MIGRATIONS, SQLiteDB
+
+
+def test_duplicate_removal_keeps_the_flags_of_finished_copies(tmp_path, capsys):
+    db_path = str(tmp_path / "old.sql")
+    conn = sqlite3.connect(db_path)
+    conn.executescript(MIGRATIONS[0] + MIGRATIONS[1] + "PRAGMA user_version = 2;")
+    conn.executemany(
+        "INSERT INTO audiobooks (title, author, url, user, downloaded, edited) VALUES (?, ?, 'u', 'Jackson', ?, ?)",
+        [("Dune", "Herbert", 0, 0), ("Dune", "Herbert", 1, 1), ("Dune", "Herbert", 1, 0), ("Emma", "Austen", 0, 0)],
+    )
+    conn.commit()
+    conn.close()
+
+    db = SQLiteDB(db_path=db_path)
+    db.migrate()
+
+    assert db.get_audiobooks("title", "Dune") == [(1, "Dune", "Herbert", None, None, "u", "Jackson", 1, 1)]
+    assert db.get_audiobooks("title", "Emma")[0].downloaded == 0
+    assert "Migration 3 removed 2 duplicate audiobook row(s)" in capsys.readouterr().out
+    db.disconnect()
+
+
+def test_shared_database_uses_the_rollback_journal(tmp_path):
+    for shared, mode in ((False, "wal"), (True, "delete")):
+        db = SQLiteDB(db_path=str(tmp_path / f"{mode}.sql"), shared=shared)
+        db.connect()
+        assert db.conn.execute("PRAGMA journal_mode").fetchone()[0] == mode
+        db.disconnect()
+
+
+def test_duplicate_removal_drops_the_duplicates_chapters_first(tmp_path):
+    db_path = str(tmp_path / "old.sql")
+    conn = sqlite3.connect(db_path)
+    conn.executescript(MIGRATIONS[0] + MIGRATIONS[1] + "PRAGMA user_version = 2;")
+    conn.executemany(
+        "INSERT INTO audiobooks (title, author, url, user, downloaded, edited) VALUES (?, ?, 'u', 'Jackson', 0, 0)",
+        [("Dune", "Herbert"), ("Dune", "Herbert")],
+    )
+    conn.executemany("INSERT INTO chapters (book_id, chapter_index, url) VALUES (?, 0, ?)", [(1, "kept"), (2, "dropped")])
+    conn.commit()
+    conn.close()
+
+    db = SQLiteDB(db_path=db_path)
+    assert db.migrate() == len(MIGRATIONS)
+
+    assert [chapter.url for chapter in db.get_chapters(1)] == ["kept"]
+    assert db.get_chapters(2) == []
+    db.disconnect()
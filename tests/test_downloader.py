@@ -0,0 +1,45 @@
+import pytest
+
+from benchmarks.stand_in_site import StandInSite
+from core.downloader import ChapterDownloader
+from core.id3_writer import render_tag
+
+TAGS = {"TIT2": "Chapter 1", "TALB": "Resumed Book", "TRCK": "1"}
+SOURCE_TAG = render_tag({"TIT2": "Source title", "TPE1": "Source artist"}, padding=512, version=3)
+
+
+@pytest.fixture(params=[False, True], ids=["no-source-tag", "source-tag"])
+def site(request):
+    with StandInSite(books=1, chapters=1, chapter_size=256 * 1024) as site:
+        if request.param:
+            site.chapter = SOURCE_TAG + site.chapter
+        yield site
+
+
+def download(site, file_path, tags, resume=True):
+    with ChapterDownloader() as downloader:
+        return downloader.download_file(f"{site.base_url}/audio/0/0.mp3", str(file_path), resume=resume, tags=tags)
+
+
+@pytest.mark.parametrize("tags", [None, TAGS], ids=["untagged", "tagged"])
+@pytest.mark.parametrize("cut", ["tag", "audio"])
+def test_resumed_download_matches_a_full_one(site, tmp_path, tags, cut):
+    whole = tmp_path / "whole.mp3"
+    result = download(site, whole, tags, resume=False)
+    data = whole.read_bytes()
+    tag_end = len(data) - len(site.chapter.removeprefix(SOURCE_TAG))  # The tag the file starts with, if any
+
+    resumed = tmp_path / "resumed.mp3"
+    offset = 20 if cut == "tag" else tag_end + 5000
+    (tmp_path / "resumed.mp3.part").write_bytes(data[:offset])
+
+    assert download(site, resumed, tags) == result
+    assert resumed.read_bytes() == data
+
+
+def test_audio_checksum_ignores_the_tag(site, tmp_path):
+    untagged = download(site, tmp_path / "untagged.mp3", None)
+    tagged = download(site, tmp_path / "tagged.mp3", TAGS)
+
+    assert untagged[2] != tagged[2]
+    assert untagged[3] == tagged[3]
@@ -0,0 +1,24 @@
+from core.driver_pool import DriverPool
+
+
+class FakeDriver:
+    window_handles = ["main"]
+
+    def reset(self) -> None:
+        pass
+
+    def quit(self) -> None:
+        pass
+
+
+def test_stats_hook_gets_the_pool_reuse_count_and_the_lease_flag():
+    leases = []
+    with DriverPool(factory=FakeDriver, size=1, stats_hook=leases.append) as pool:
+        for _ in range(3):
+            with pool.lease():
+                pass
+
+    assert [lease["reused"] for lease in leases] == [0, 1, 2]
+    assert [lease["session_reused"] for lease in leases] == [False, True, True]
+    assert [lease["session_uses"] for lease in leases] == [1, 2, 3]
+    assert pool.stats.created == 1
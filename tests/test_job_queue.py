@@ -0,0 +1,134 @@
+import threading
+
+import pytest
+
+from core.database import SQLiteDB
+from core.job_queue import JobFailed, JobWorker
+
+
+class FakeClock:
+    def __init__(self, now=1000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    db = SQLiteDB(db_path=str(tmp_path / "queue.sql"))
+    db.migrate()
+    db.add_audiobooks([(f"Book {index}", "Author", None, None, f"https://example.com/{index}", "Jackson") for index in range(20)])
+    db.disconnect()
+    return str(tmp_path / "queue.sql")
+
+
+@pytest.fixture
+def db(db_path):
+    db = SQLiteDB(db_path=db_path)
+    yield db
+    db.disconnect()
+
+
+def job_statuses(db):
+    with db._cursor("test") as cursor:
+        return dict(cursor.execute("SELECT book_id, status FROM jobs"))
+
+
+def test_two_workers_never_claim_the_same_job(db_path):
+    handled, lock = [], threading.Lock()
+
+    def handler(audiobook, lease_lost):
+        with lock:
+            handled.append(audiobook.id)
+
+    def work(owner):
+        db = SQLiteDB(db_path=db_path)  # A connection of its own, like another process
+        JobWorker(db, "download", handler, owner=owner).run()
+        db.disconnect()
+
+    workers = [threading.Thread(target=work, args=(owner,)) for owner in ("a", "b")]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert sorted(handled) == list(range(1, 21))
+
+
+def test_an_expired_lease_is_reclaimed(db):
+    clock = FakeClock()
+    db.enqueue_jobs("download", now=clock())
+    job_id, book_id, _ = db.claim_job("download", "crashed", lease_seconds=60, now=clock())
+
+    handled = []
+    worker = JobWorker(db, "download", lambda audiobook, lease_lost: handled.append(audiobook.id),
+                       lease_seconds=60, owner="b", clock=clock)
+    while worker.run_once():  # Runs every other job, but not the leased one
+        pass
+    assert book_id not in handled
+
+    clock.now += 61
+    assert worker.run_once()
+    assert handled[-1] == book_id
+    assert job_statuses(db)[book_id] == "done"
+    assert db.get_audiobooks("id", book_id)[0].downloaded == 1
+
+
+def test_failed_jobs_back_off_then_go_dead(db):
+    clock = FakeClock()
+    db.enqueue_jobs("download", now=clock())
+    with db._cursor("test") as cursor:
+        cursor.execute("DELETE FROM jobs WHERE book_id != 1")
+
+    def handler(audiobook, lease_lost):
+        raise JobFailed("server down")
+
+    worker = JobWorker(db, "download", handler, max_attempts=3, backoff_seconds=30, owner="a", clock=clock)
+    assert worker.run_once()
+    assert not worker.run_once()  # Not due until the backoff has passed
+
+    clock.now += 34  # 30s plus at most 10% jitter
+    assert worker.run_once()
+    clock.now += 30
+    assert not worker.run_once()  # The second delay is doubled
+    clock.now += 37
+    assert worker.run_once()
+
+    assert worker.counts == {"done": 0, "retried": 2, "dead": 1}
+    assert job_statuses(db) == {1: "dead"}
+    assert db.get_audiobooks("id", 1)[0].downloaded == 0
+
+
+def test_requeue_dead_jobs_leaves_finished_jobs_alone(db):
+    clock = FakeClock()
+    db.enqueue_jobs("download", now=clock())
+    done = db.claim_job("download", "a", lease_seconds=60, now=clock())
+    dead = db.claim_job("download", "a", lease_seconds=60, now=clock())
+    db.finish_job(done[0], "a", "done", now=clock())
+    db.finish_job(dead[0], "a", "dead", now=clock(), error="gave up")
+
+    assert db.requeue_dead_jobs("download", now=clock()) == 1
+    statuses = job_statuses(db)
+    assert statuses[done[1]] == "done"
+    assert statuses[dead[1]] == "queued"
+
+
+def test_a_lost_lease_stops_the_handler_and_drops_its_result(db_path, db):
+    clock = FakeClock()
+    other = SQLiteDB(db_path=db_path)
+
+    def handler(audiobook, lease_lost):
+        clock.now += 61  # The lease runs out and another worker takes the job over
+        assert other.claim_job("download", "b", lease_seconds=60, now=clock()) is not None
+        assert lease_lost.wait(5)
+
+    worker = JobWorker(db, "download", handler, lease_seconds=60, heartbeat_seconds=0.01, owner="a", clock=clock)
+    db.enqueue_jobs("download", now=clock())
+    assert worker.run_once()
+
+    assert worker.counts == {"done": 0, "retried": 0, "dead": 0}
+    assert db.get_audiobooks("id", 1)[0].downloaded == 0
+    with db._cursor("test") as cursor:
+        assert cursor.execute("SELECT status, lease_owner FROM jobs WHERE book_id = 1").fetchone() == ("leased", "b")
+    other.disconnect()
@@ -0,0 +1,38 @@
+import os
+
+from benchmarks.synthetic_mp3 import write_mp3
+from core import library_index
+from core.database import SQLiteDB
+from core.library_index import LibraryIndex
+from core.metadata_editor import apply_tags, build_tags
+
+
+def test_validate_only_parses_files_whose_tag_changed(tmp_path, monkeypatch):
+    db = SQLiteDB(db_path=str(tmp_path / "library.sql"))
+    db.migrate()
+    db.add_audiobooks([("Book", "Author", None, None, "https://example.com", "Jackson")])
+    audiobook = db.get_audiobooks("title", "Book")[0]
+
+    folder = tmp_path / "library" / "Book"
+    folder.mkdir(parents=True)
+    for index in range(3):
+        file_path = str(folder / f"Chapter {index} - Book.mp3")
+        write_mp3(file_path, size=20_000)
+        apply_tags(file_path, build_tags(os.path.basename(file_path), audiobook))
+
+    index = LibraryIndex(db)
+    assert index.validate(str(tmp_path / "library")) == {}
+
+    # Touch the audio of one file and retitle another
+    with open(folder / "Chapter 0 - Book.mp3", "ab") as file:
+        file.write(b"\x00" * 10)
+    apply_tags(str(folder / "Chapter 1 - Book.mp3"), {"TIT2": "Renamed"})
+
+    parsed = []
+    real_id3 = library_index.ID3
+    monkeypatch.setattr(library_index, "ID3", lambda path: parsed.append(os.path.basename(path)) or real_id3(path))
+    invalid = index.validate(str(tmp_path / "library"))
+
+    assert parsed == ["Chapter 1 - Book.mp3"]
+    assert invalid == {str(folder): [str(folder / "Chapter 1 - Book.mp3")]}
+    db.disconnect()
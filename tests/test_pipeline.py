@@ -0,0 +1,104 @@
+import os
+
+import pytest
+
+from benchmarks.stand_in_site import StandInSite
+from mutagen.id3 import ID3
+
+from core.content_store import ContentStore
+from core.database import SQLiteDB
+from core.downloader import ChapterDownloader, chapter_filename
+from core.pipeline import DownloadPipeline
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = SQLiteDB(db_path=str(tmp_path / "test.sql"))
+    db.migrate()
+    yield db
+    db.disconnect()
+
+
+@pytest.fixture
+def site():
+    with StandInSite(books=1, chapters=3, chapter_size=64 * 1024) as site:
+        yield site
+
+
+def add_book(db, site):
+    db.add_audiobooks([("Signed Book", "Author", None, None, site.book_url(0), "Jackson")])
+    return db.get_audiobooks("title", "Signed Book")[0]
+
+
+def test_expired_links_are_scraped_again(db, site, tmp_path):
+    audiobook = add_book(db, site)
+    site.signature = "old"
+    db.add_chapters(audiobook.id, [f"{site.base_url}/audio/0/{index}.mp3?sig=old" for index in range(3)])
+    site.signature = "new"  # Every recorded link is refused from now on
+
+    DownloadPipeline(db, driver_pool=None, chapter_concurrency=2).run([(audiobook, str(tmp_path))])
+
+    chapters = db.get_chapters(audiobook.id)
+    assert [chapter.url for chapter in chapters] == [f"{site.base_url}/audio/0/{index}.mp3?sig=new" for index in range(3)]
+    assert all(chapter.status == "complete" for chapter in chapters)
+    assert db.get_audiobooks("id", audiobook.id)[0].downloaded == 1
+    assert os.path.exists(tmp_path / "Signed Book" / chapter_filename(2, "Signed Book"))
+
+
+def test_refused_links_without_new_ones_stay_expired(db, site, tmp_path, capsys):
+    audiobook = add_book(db, site)
+    site.signature = "new"
+    db.add_chapters(audiobook.id, [f"{site.base_url}/audio/0/{index}.mp3?sig=new" for index in range(3)])
+    site.signature = "newer"
+    site.page = lambda book: "<html><body>Maintenance</body></html>"  # No playlist to scrape
+
+    pipeline = DownloadPipeline(db, driver_pool=None)
+    pipeline.scrape_book_with_browser = lambda audiobook, user_path: ([], ChapterDownloader(), "chrome-dom")
+    pipeline.run([(audiobook, str(tmp_path))])
+
+    assert "gave no new links" in capsys.readouterr().out
+    assert [chapter.status for chapter in db.get_chapters(audiobook.id)] == ["expired"] * 3
+    assert db.get_audiobooks("id", audiobook.id)[0].downloaded == 0
+
+
+def test_books_are_pulled_as_the_pipeline_has_room(db, tmp_path):
+    pulled, finished, backlog = [], [], []
+
+    def books():
+        for audiobook in db.iter_audiobooks():
+            pulled.append(audiobook.id)
+            yield audiobook, str(tmp_path)
+
+    db.add_audiobooks([(f"Book {index}", "Author", None, None, f"https://example.com/{index}", "Jackson") for index in range(10)])
+    pipeline = DownloadPipeline(db, driver_pool=None, books_in_flight=2)
+    pipeline.scrape_book = lambda audiobook, user_path: backlog.append(len(pulled) - len(finished))
+    pipeline.download_book = lambda audiobook, user_path, scraped, stop: finished.append(audiobook.id) or 1
+    pipeline.run(books())
+
+    assert len(finished) == 10
+    assert max(backlog) <= 2 * pipeline.books_in_flight
+
+
+def test_stored_chapters_keep_their_links_and_other_books_get_their_own_tags(db, tmp_path):
+    db.add_audiobooks([("First Book", "Author", None, None, "u1", "Jackson"), ("Second Book", "Author", None, None, "u2", "Jackson")])
+    first, second = db.get_audiobooks("title", "First Book")[0], db.get_audiobooks("title", "Second Book")[0]
+    pipeline = DownloadPipeline(db, driver_pool=None, content_store=ContentStore(str(tmp_path / "store")), tag_on_download=True)
+
+    # One chapter, since every chapter the stand-in site serves has the same audio
+    with StandInSite(books=1, chapters=1, chapter_size=64 * 1024) as site:
+        db.add_chapters(first.id, [f"{site.base_url}/audio/0/0.mp3"])
+        db.add_chapters(second.id, [f"{site.base_url}/audio/0/0.mp3"])
+        pipeline.run([(first, str(tmp_path / "one"))])
+
+    # The site is gone, so everything after this has to come from the store
+    pipeline.run([(second, str(tmp_path / "one"))])
+    db.mark_chapters_for_redownload([chapter.id for chapter in db.get_chapters(first.id)])
+    pipeline.run([(first, str(tmp_path / "two"))])
+
+    copied = tmp_path / "one" / "Second Book" / chapter_filename(0, "Second Book")
+    linked = tmp_path / "two" / "First Book" / chapter_filename(0, "First Book")
+    assert str(ID3(copied)["TALB"]) == "Second Book" and copied.stat().st_nlink == 1
+    assert str(ID3(linked)["TALB"]) == "First Book" and linked.stat().st_nlink == 3  # The store and both runs
+    assert all(book.downloaded and book.edited for book in db.iter_audiobooks())
+    first_chapter, second_chapter = db.get_chapters(first.id)[0], db.get_chapters(second.id)[0]
+    assert first_chapter.checksum != second_chapter.checksum
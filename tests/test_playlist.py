@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+from core.playlist import PlaylistNotFound, extract_playlist, normalize_url
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "player_pages")
+
+
+def read_page(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as file:
+        return file.read()
+
+
+def test_plList_items_with_data_src():
+    urls = extract_playlist(read_page("plList_data_src.html"), "https://books.example.com/book/the-long-road")
+
+    assert urls == [
+        "https://books.example.com/media/long-road/01.mp3",
+        "https://books.example.com/media/long-road/02.mp3",
+        "https://books.example.com/shared/03.mp3?token=abc&expires=1700000000",
+        "https://cdn.example.com/long-road/04.mp3",
+    ]
+
+
+def test_inline_tracks_with_escaped_slashes():
+    urls = extract_playlist(read_page("inline_tracks.html"), "https://books.example.com/book/winter-tales")
+
+    assert urls == [
+        "https://cdn.example.com/winter-tales/01.mp3",
+        "https://cdn.example.com/winter-tales/02.mp3",
+        "https://books.example.com/winter-tales/03.mp3",
+    ]
+
+
+def test_relative_urls_resolve_against_the_page():
+    html = '<ul id="plList"><li data-src="ch1.mp3">1</li><li data-src="/audio/ch2.mp3">2</li></ul>'
+
+    urls = extract_playlist(html, "http://books.example.com:80/book/7/")
+
+    assert urls == ["http://books.example.com/book/7/ch1.mp3", "http://books.example.com/audio/ch2.mp3"]
+
+
+def test_count_mismatch_raises():
+    with pytest.raises(PlaylistNotFound, match="2 chapter URL"):
+        extract_playlist(read_page("count_mismatch.html"), "https://books.example.com/book/half-loaded")
+
+
+def test_page_without_playlist_raises():
+    with pytest.raises(PlaylistNotFound):
+        extract_playlist(read_page("no_playlist.html"), "https://books.example.com/book/blocked")
+
+
+def test_repeated_urls_count_against_the_playlist():
+    html = '<ul id="plList"><li data-src="/a.mp3">1</li><li data-src="HTTPS://Example.com/a.mp3#x">2</li></ul>'
+
+    with pytest.raises(PlaylistNotFound, match="Found 1 chapter URL"):
+        extract_playlist(html, "https://example.com/")
+
+
+def test_paths_that_differ_in_case_are_different_chapters():
+    html = '<ul id="plList"><li data-src="/a.mp3">1</li><li data-src="/A.mp3#x">2</li></ul>'
+
+    assert extract_playlist(html, "https://example.com/") == ["https://example.com/a.mp3", "https://example.com/A.mp3"]
+
+
+def test_normalize_url_keeps_signed_queries():
+    url = " HTTPS://Cdn.Example.com:443/Book/01.mp3?Signature=AbC%2F&Expires=1#frag "
+
+    assert normalize_url(url) == "https://cdn.example.com/Book/01.mp3?Signature=AbC%2F&Expires=1"
@@ -0,0 +1,11 @@
+import pytest
+
+from benchmarks.bench_startup import DEFAULT_BUDGET, LIGHT_COMMANDS, run_command
+
+
+@pytest.mark.parametrize("command", sorted(LIGHT_COMMANDS))
+def test_light_commands_start_fast_without_heavy_modules(command, tmp_path):
+    wall, import_seconds, modules = run_command(command, str(tmp_path / "startup.sql"), str(tmp_path / "metrics"))
+
+    assert not [name for name in LIGHT_COMMANDS[command] if name in modules]
+    assert wall < DEFAULT_BUDGET, f"{command} took {wall:.3f}s ({import_seconds:.3f}s importing)"
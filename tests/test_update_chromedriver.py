@@ -0,0 +1,66 @@
+import pytest
+
+from benchmarks.stand_in_manifest import MANIFEST_PATH, StandInManifest
+from core import update_chromedriver
+from core.update_chromedriver import ChromeDriverUpdater
+
+CHROME = "124.0.6367.118"
+DRIVER = "124.0.6367.91"
+
+
+@pytest.fixture
+def manifest():
+    with StandInManifest(versions=["123.0.6312.122", DRIVER, "125.0.6422.60"]) as manifest:
+        yield manifest
+
+
+@pytest.fixture
+def updater(manifest, tmp_path):
+    return ChromeDriverUpdater(str(tmp_path), str(tmp_path / "chromedriver.exe"), base_url=manifest.manifest_url)
+
+
+def test_cached_manifest_is_revalidated_instead_of_downloaded_again(manifest, updater):
+    first = updater.get_latest_chromedriver_info()
+    assert updater.get_latest_chromedriver_info() == first and len(first) == 3  # If-None-Match
+
+    cache_info = updater.load_cache_info()
+    del cache_info["etag"]
+    updater.save_cache_info(cache_info)
+    assert updater.get_latest_chromedriver_info() == first  # If-Modified-Since
+
+    assert manifest.requests[MANIFEST_PATH] == 3
+    assert manifest.not_modified == 2
+
+
+def test_update_is_skipped_when_the_installed_driver_matches(manifest, updater, monkeypatch, capsys):
+    monkeypatch.setattr(update_chromedriver, "get_chrome_version", lambda: CHROME)
+    monkeypatch.setattr(updater, "get_installed_driver_version", lambda: DRIVER)
+
+    updater.update_chromedriver()
+
+    assert "already matches" in capsys.readouterr().out
+    assert not manifest.requests
+
+
+def test_a_verified_zip_is_reused(manifest, updater, tmp_path, capsys):
+    url = f"{manifest.base_url}{manifest.zip_path(DRIVER)}"
+
+    updater.download_latest_driver(DRIVER, url)
+    updater.download_latest_driver(DRIVER, url)
+
+    assert manifest.requests[manifest.zip_path(DRIVER)] == 1
+    assert "Reusing verified ChromeDriver" in capsys.readouterr().out
+    assert (tmp_path / "chromedriver.exe").read_text() == f"ChromeDriver {DRIVER}\n"
+
+    (tmp_path / "chromedriver.zip").write_bytes(b"damaged")  # A changed zip is fetched again
+    updater.download_latest_driver(DRIVER, url)
+    assert manifest.requests[manifest.zip_path(DRIVER)] == 2
+
+
+def test_a_mismatched_driver_is_replaced_with_the_closest_one(manifest, updater, tmp_path, monkeypatch):
+    monkeypatch.setattr(update_chromedriver, "get_chrome_version", lambda: CHROME)
+    monkeypatch.setattr(updater, "get_installed_driver_version", lambda: "123.0.6312.122")
+
+    updater.update_chromedriver()
+
+    assert (tmp_path / "chromedriver.exe").read_text() == f"ChromeDriver {DRIVER}\n"
@@ -0,0 +1,106 @@
+import shutil
+
+import pytest
+
+from selenium.common.exceptions import WebDriverException
+
+from benchmarks.stand_in_site import StandInSite
+from core.website_driver import WebsiteDriver
+
+
+class FakeScraper(WebsiteDriver):
+    """Runs scrape_website without starting Chrome."""
+
+    def __init__(self, network_result) -> None:
+        self.scrape_mode = "network"
+        self.network_result = network_result
+        self.mp3_urls = []
+        self.scrape_method = None
+
+    def scrape_website_network(self, url):
+        if isinstance(self.network_result, Exception):
+            raise self.network_result
+        return self.network_result
+
+    def scrape_website_dom(self, url):
+        self.mp3_urls = ["https://cdn.example.com/1.mp3"]
+
+
+def test_network_errors_fall_back_to_the_player(capsys):
+    driver = FakeScraper(WebDriverException("log type 'performance' not found"))
+    driver.scrape_website("https://example.com/book")
+
+    assert driver.scrape_method == "dom"
+    assert driver.mp3_urls == ["https://cdn.example.com/1.mp3"]
+    assert "Network capture failed" in capsys.readouterr().out
+
+
+def test_missed_chapters_fall_back_to_the_player():
+    driver = FakeScraper(False)
+    driver.scrape_website("https://example.com/book")
+
+    assert driver.scrape_method == "dom"
+
+
+class FakeSession(WebsiteDriver):
+    """Records the browser commands reset sends, without starting Chrome."""
+
+    window_handles = ["main"]
+    switch_to = property(lambda self: self)
+
+    def __init__(self) -> None:
+        self.scrape_mode = "dom"
+        self.calls = []
+
+    def window(self, handle) -> None:
+        pass
+
+    def execute_script(self, script, *args):
+        self.calls.append("storage")
+
+    def get(self, url) -> None:
+        self.calls.append(url)
+
+    def execute_cdp_cmd(self, cmd, cmd_args):
+        self.calls.append(cmd)
+
+    def delete_all_cookies(self) -> None:
+        self.calls.append("delete_all_cookies")
+
+    def get_log(self, log_type):
+        raise WebDriverException(f"log type '{log_type}' not found")
+
+
+def test_reset_clears_storage_before_leaving_and_every_cookie_after():
+    driver = FakeSession()
+    driver.reset()
+
+    assert driver.calls == ["storage", "about:blank", "Network.clearBrowserCookies"]
+
+
+def test_reset_survives_a_chrome_without_a_performance_log():
+    driver = FakeSession()
+    driver.scrape_mode = "network"
+    driver.reset()
+
+    assert driver.mp3_urls == [] and driver.scrape_method is None
+
+
+@pytest.fixture
+def chrome():
+    driver_path = shutil.which("chromedriver")
+    if driver_path is None:
+        pytest.skip("chromedriver isn't installed")
+    driver = WebsiteDriver(driver_path=driver_path, headless=True, scrape_mode="dom")
+    yield driver
+    driver.quit()
+
+
+def test_reset_removes_the_site_cookies(chrome):
+    with StandInSite(books=1, chapters=1, chapter_size=1024) as site:
+        chrome.get(site.book_url(0))
+        chrome.add_cookie({"name": "session", "value": "previous-book"})
+        chrome.reset()
+        chrome.get(site.book_url(0))
+
+        assert chrome.get_cookie("session") is None